@@ -0,0 +1,174 @@
+# adaptive_vad.py - Perfil de VAD escolhido pelo ruído ambiente medido na sessão
+#
+# Em vez de pagar sempre o perfil "noisy" (0.8 s de endpointing), cada sessão
+# estima o piso de ruído a partir dos frames que chegam (via audio_io) e
+# alterna entre quiet/moderate/noisy do VADConfig, com histerese em dB e tempo
+# mínimo em cada perfil para não ficar oscilando.
+#
+# O piso é medido no áudio que o VAD realmente recebe (depois do BVC), por
+# isso os limiares padrão são mais baixos que os de um microfone cru.
+#
+#   VAD_PROFILE=adaptive|quiet|moderate|noisy   (padrão: adaptive)
+#   VAD_QUIET_MAX_DB=-60   piso abaixo disto → quiet
+#   VAD_NOISY_MIN_DB=-45   piso acima disto → noisy
+#   VAD_HYSTERESIS_DB=3    margem para sair do perfil atual
+#   VAD_MIN_DWELL=5        segundos mínimos entre trocas
+
+import os
+import time
+import logging
+from typing import Any
+
+import numpy as np
+
+from vad_config import VADConfig, VAD_PROFILES as PROFILES
+from turn_metrics import registry
+
+log = logging.getLogger("adaptive-vad")
+
+
+class NoiseFloorEstimator:
+    """
+    Piso de ruído em dBFS a partir de janelas de áudio PCM16.
+
+    Cada janela (padrão 1 s) é dividida em blocos de 10 ms; o piso da janela é
+    o percentil baixo da energia dos blocos, o que ignora a fala (as pausas
+    entre palavras bastam). As janelas são suavizadas por média exponencial.
+    """
+
+    def __init__(self, window_s: float = 1.0, block_ms: int = 10,
+                 percentile: float = 10.0, smoothing: float = 0.3) -> None:
+        self.window_s = window_s
+        self.block_ms = block_ms
+        self.percentile = percentile
+        self.smoothing = smoothing
+        self.floor_db: float | None = None
+        self._chunks: list[np.ndarray] = []
+        self._samples = 0
+        self._sample_rate = 0
+
+    def push(self, pcm: np.ndarray, sample_rate: int) -> float | None:
+        """Acumula amostras mono int16; devolve o piso atualizado ao fechar uma janela."""
+        if sample_rate != self._sample_rate:
+            self._chunks, self._samples, self._sample_rate = [], 0, sample_rate
+        self._chunks.append(pcm)
+        self._samples += len(pcm)
+        if self._samples < self.window_s * sample_rate:
+            return None
+        window = np.concatenate(self._chunks)
+        self._chunks, self._samples = [], 0
+        return self._update(window, sample_rate)
+
+    def _update(self, window: np.ndarray, sample_rate: int) -> float | None:
+        block = max(1, sample_rate * self.block_ms // 1000)
+        n_blocks = len(window) // block
+        if n_blocks == 0:
+            return self.floor_db
+        blocks = window[: n_blocks * block].reshape(n_blocks, block).astype(np.float32) / 32768.0
+        energy = np.mean(blocks * blocks, axis=1)
+        floor = 10.0 * np.log10(np.percentile(energy, self.percentile) + 1e-10)
+        if self.floor_db is None:
+            self.floor_db = float(floor)
+        else:
+            self.floor_db += self.smoothing * (float(floor) - self.floor_db)
+        return self.floor_db
+
+
+def apply_vad_profile(session: Any, params: dict) -> None:
+    """
+    Aplica os parâmetros de endpointing/interrupção a uma sessão em andamento.
+
+    Os atrasos de endpointing passam por `AgentSession.update_options`, que
+    também os repassa à atividade corrente; as opções de interrupção são lidas
+    de `session.options` a cada decisão.
+    """
+    delays = {k: params[k] for k in ("min_endpointing_delay", "max_endpointing_delay") if k in params}
+    if delays:
+        session.update_options(**delays)
+    opts = session.options
+    for key, value in params.items():
+        if key not in delays and hasattr(opts, key):
+            setattr(opts, key, value)
+
+
+class AdaptiveVAD:
+    """Liga o estimador ao áudio da sessão e troca de perfil com histerese."""
+
+    def __init__(self, session: Any, tracker: Any, persona: str, profile: str = "noisy",
+                 estimator: NoiseFloorEstimator | None = None, room: str = "") -> None:
+        self.session = session
+        self.tracker = tracker
+        self.persona = persona
+        self.room = room  # várias salas da mesma persona no mesmo processo: gauges por sala
+        self.profile = profile
+        self.estimator = estimator or NoiseFloorEstimator()
+        self.quiet_max_db = float(os.getenv("VAD_QUIET_MAX_DB", "-60"))
+        self.noisy_min_db = float(os.getenv("VAD_NOISY_MIN_DB", "-45"))
+        self.hysteresis_db = float(os.getenv("VAD_HYSTERESIS_DB", "3"))
+        self.min_dwell = float(os.getenv("VAD_MIN_DWELL", "5"))
+        self._last_switch = time.monotonic()
+        self._set_active_gauge()
+
+    def on_frame(self, frame: Any) -> None:
+        pcm = np.frombuffer(frame.data, dtype=np.int16)
+        if frame.num_channels > 1:
+            pcm = pcm.reshape(-1, frame.num_channels).mean(axis=1).astype(np.int16)
+        floor = self.estimator.push(pcm, frame.sample_rate)
+        if floor is not None:
+            registry.set_gauge("agrinho_noise_floor_dbfs", round(floor, 1), persona=self.persona, room=self.room)
+            self._maybe_switch(floor)
+
+    def _target(self, floor: float) -> str:
+        """Perfil para o piso atual; só sai do perfil corrente passando a margem de histerese."""
+        h = self.hysteresis_db
+        idx = PROFILES.index(self.profile)
+        # Limites do perfil atual, alargados pela histerese
+        lower = -np.inf if idx == 0 else (self.quiet_max_db if idx == 1 else self.noisy_min_db) - h
+        upper = np.inf if idx == 2 else (self.quiet_max_db if idx == 0 else self.noisy_min_db) + h
+        if lower <= floor <= upper:
+            return self.profile
+        if floor < self.quiet_max_db:
+            return "quiet"
+        if floor > self.noisy_min_db:
+            return "noisy"
+        return "moderate"
+
+    def _maybe_switch(self, floor: float) -> None:
+        target = self._target(floor)
+        now = time.monotonic()
+        if target == self.profile or now - self._last_switch < self.min_dwell:
+            return
+        previous, self.profile = self.profile, target
+        self._last_switch = now
+        apply_vad_profile(self.session, VADConfig.get_config(target))
+        self.tracker.vad_profile = target
+        registry.inc("agrinho_vad_profile_switches_total", persona=self.persona,
+                     from_profile=previous, to_profile=target)
+        self._set_active_gauge()
+        log.info("🎚️ Perfil de VAD: %s → %s (piso de ruído %.1f dBFS)", previous, target, floor)
+
+    def _set_active_gauge(self) -> None:
+        for name in PROFILES:
+            registry.set_gauge("agrinho_vad_profile_active", 1.0 if name == self.profile else 0.0,
+                               persona=self.persona, room=self.room, profile=name)
+
+    def close(self) -> None:
+        """Sala saiu: tira as séries dela do /metrics."""
+        for name in ("agrinho_noise_floor_dbfs", "agrinho_vad_profile_active"):
+            registry.remove_gauges(name, persona=self.persona, room=self.room)
+
+
+def attach_adaptive_vad(session: Any, tracker: Any, persona: str, profile: str,
+                        room: str = "") -> AdaptiveVAD | None:
+    """Instala o perfil adaptativo numa sessão já iniciada (None se não há áudio)."""
+    from audio_io import tap_session_audio
+
+    tapped = tap_session_audio(session)
+    if tapped is None:
+        log.warning("⚠️ Sessão sem entrada de áudio; perfil de VAD fica fixo em %s", profile)
+        return None
+    adaptive = AdaptiveVAD(session, tracker, persona, profile, room=room)
+    tapped.add_tap(adaptive.on_frame)
+    session.on("close", lambda _ev: adaptive.close())
+    log.info("🎚️ Perfil de VAD adaptativo ativo (inicial: %s)", profile)
+    return adaptive
@@ -1,80 +1,177 @@
 # agent.py - VERSÃO ATUALIZADA
-import logging
-from livekit import agents, rtc
-from livekit.agents import Agent, AgentSession, RoomInputOptions, FunctionTool
-from livekit.plugins import openai
-
-try:
-    from livekit.plugins import noise_cancellation
-except ImportError:
-    noise_cancellation = None  # type: ignore[assignment]
-
-from settings import setup_logging, Env
-from prompts import get_prompt
-import tools as agent_tools
-from mcp_bridge import build_livekit_tools_from_mcp
-from vad_config import get_vad_for_noisy_environment, VADConfig
+from startup_profile import profile
+
+with profile.phase("imports"):
+    import asyncio
+    import logging
+    from livekit import agents
+    from livekit.agents import Agent, AgentSession, RoomInputOptions, FunctionTool, StopResponse
+
+    from settings import setup_logging, Env
+    from log_pipeline import bind as bind_log_context
+    from prompts import get_prompt
+    from mcp_bridge import build_livekit_tools_from_mcp, aclose_mcp, add_tools_listener, remove_tools_listener
+    from vad_config import load_vad, share_vad, vad_silence_duration, vad_mode, initial_profile, VADConfig
+    from turn_metrics import TurnTracker
+    from init_graph import Step, run_graph
+    from answer_cache import AnswerCache, TurnTranscripts, load_answer_cache
+    from chat_context import ContextWindow
+    from audio_ring import attach_capture
+    from noise_gate import attach_noise_gate, noise_cancellation_options, use_noise_gate
+    from greeting_cache import get_greeting_audio, speak_greeting
 
 class Assistant(Agent):
-    def __init__(self, instructions: str, tools: list[FunctionTool] | None = None) -> None:
+    def __init__(self, instructions: str, tools: list[FunctionTool] | None = None,
+                 answers: AnswerCache | None = None) -> None:
         super().__init__(instructions=instructions, tools=tools or [])
+        self.answers = answers
+        # Sem STT, a pergunta vem da transcrição do modelo realtime (ver answer_cache)
+        self.transcripts = TurnTranscripts(self._on_transcript) if answers is not None else None
+
+    async def on_enter(self) -> None:
+        if self.transcripts is not None:
+            self.transcripts.attach(self.session)
+
+    async def on_user_turn_completed(self, turn_ctx, new_message) -> None:
+        if self.answers is None:
+            return
+        text = new_message.text_content or ""
+        if not text:
+            # Sem transcrição ainda: o modelo responde já; um acerto depois troca a resposta
+            self.transcripts.turn_ended()
+            return
+        # Pergunta frequente com resposta pronta: fala o áudio do cache e pula o modelo
+        if await self.answers.respond(self, text):
+            raise StopResponse()
+
+    async def _on_transcript(self, text: str, turn_end: float) -> None:
+        await self.answers.respond(self, text, turn_end, replace=True)
+
+def _track_first_audio(session: AgentSession) -> None:
+    """Marca no perfil o instante em que o agente começa a falar pela primeira vez."""
+    def _on_state(ev) -> None:
+        if ev.new_state == "speaking":
+            session.off("agent_state_changed", _on_state)
+            profile.mark("first_audio")
+            profile.report()
+    session.on("agent_state_changed", _on_state)
+
+def prewarm(proc: agents.JobProcess):
+    """Roda uma vez por processo do worker, antes dos jobs: carrega o Silero VAD."""
+    # A instância fica em vad_config (compartilhada); o entrypoint a pega com share_vad()
+    with profile.phase("vad_load"):
+        load_vad()
+    # O plugin realtime é usado em toda sessão; importá-lo aqui tira o custo do job
+    with profile.phase("import_openai"):
+        from livekit.plugins import openai  # noqa: F401
 
 async def entrypoint(ctx: agents.JobContext):
     try:
+        bind_log_context(room=ctx.room.name, session=ctx.job.id)
         env = Env.load()
         logging.info("🚀 Iniciando agente Agrinho...")
         logging.info("📝 Persona: %s | 🗣️ Voz: %s | 🎙️ Interrupções: %s",
                      env.assistant_prompt, env.voice, env.allow_interruptions)
+        ctx.add_shutdown_callback(aclose_mcp)
 
-        # Carrega tools do MCP
-        mcp_tools = await build_livekit_tools_from_mcp()
-        logging.info("🔧 MCP tools carregadas: %d", len(mcp_tools))
+        async def _vad():
+            # Já carregado no prewarm; share_vad() só devolve a instância compartilhada
+            return await asyncio.to_thread(share_vad)
 
-        # Carrega VAD otimizado para ambientes ruidosos
-        logging.info("🎤 Carregando VAD (Voice Activity Detection) para detecção robusta de fala...")
-        vad_instance = await get_vad_for_noisy_environment()
-        if vad_instance:
-            logging.info("✅ VAD carregado com sucesso - pronto para detectar fala em ambiente ruidoso")
-        else:
-            logging.warning("⚠️ VAD não foi carregado - usando configuração padrão do OpenAI")
+        async def _session(room_connect, mcp_discovery, vad_load):
+            # Se ALLOW_INTERRUPTIONS=false e não há VAD local, falhar explicitamente
+            if not env.allow_interruptions and not vad_load:
+                raise RuntimeError(
+                    "ALLOW_INTERRUPTIONS=false requer VAD local; Silero VAD não disponível"
+                )
 
-        vad_config = VADConfig.get_config("noisy")
+            from livekit.plugins import openai
 
-        # Se ALLOW_INTERRUPTIONS=false e não há VAD local, falhar explicitamente
-        if not env.allow_interruptions and not vad_instance:
-            raise RuntimeError(
-                "ALLOW_INTERRUPTIONS=false requer VAD local; Silero VAD não disponível"
+            mode = vad_mode()
+            vad_profile = initial_profile(mode) if vad_load else "noisy"
+            # Cria sessão com VAD local e turn_detection desabilitado no servidor
+            session = AgentSession(
+                llm=openai.realtime.RealtimeModel(voice=env.voice, turn_detection=None),
+                vad=vad_load,
+                allow_interruptions=env.allow_interruptions,
+                turn_detection="vad" if vad_load else "server",
+                **VADConfig.get_config(vad_profile),
+            )
+            tracker = TurnTracker(
+                session,
+                persona=env.assistant_prompt or "ASSISTANT",
+                vad_profile=vad_profile,
+                eos_offset=vad_silence_duration(vad_load),
             )
 
-        # Cria sessão com VAD local e turn_detection desabilitado no servidor
-        session = AgentSession(
-            llm=openai.realtime.RealtimeModel(voice=env.voice, turn_detection=None),
-            vad=vad_instance,
-            allow_interruptions=env.allow_interruptions,
-            turn_detection="vad" if vad_instance else "server",
-            **vad_config,
-        )
-
-        # Configura áudio da sala (ativa BVC quando disponível)
-        room_input_kwargs: dict[str, object] = {}
-        if noise_cancellation:
-            try:
-                room_input_kwargs["noise_cancellation"] = noise_cancellation.BVC()
-                logging.info("🔇 Noise cancellation (BVC) ativado.")
-            except Exception as err:
-                logging.warning("⚠️ Falha ao iniciar noise cancellation: %s", err)
-        else:
-            logging.info("ℹ️ Plugin 'livekit-plugins-noise-cancellation' não encontrado; seguindo sem BVC.")
+            answers = load_answer_cache(env.assistant_prompt)
+            if answers is not None:
+                answers.start_prerender(env.voice)
+            agent = Assistant(get_prompt(env.assistant_prompt), tools=mcp_discovery, answers=answers)
+
+            # Catálogo MCP atualizado em background → tools novas nesta sessão
+            async def _on_tools_changed(tools) -> None:
+                await agent.update_tools(tools)
+                logging.info("🔧 Tools MCP atualizadas: %d", len(tools))
+            add_tools_listener(_on_tools_changed)
+
+            # Contexto limitado e zerado a cada visitante novo (sessões longas)
+            context = ContextWindow(session, agent, tracker.persona, room=ctx.room.name)
+            capture = None
+
+            async def _on_shutdown() -> None:
+                remove_tools_listener(_on_tools_changed)
+                await context.aclose()
+                if capture is not None:
+                    capture.close()
+                tracker.log_summary()
+                if answers is not None:
+                    logging.info("💬 Cache de respostas: %s", answers.stats())
+            ctx.add_shutdown_callback(_on_shutdown)
+            if profile.enabled:
+                _track_first_audio(session)
+
+            logging.info("🎬 Iniciando sessão...")
+            nc_options = noise_cancellation_options()
+            await session.start(
+                room=ctx.room,
+                agent=agent,
+                # Configura áudio da sala (ativa BVC quando disponível)
+                room_input_options=RoomInputOptions(**nc_options),
+            )
+            # Sem BVC, o filtro local (NumPy) protege o VAD do ruído; antes dos taps abaixo
+            if use_noise_gate(nc_options):
+                attach_noise_gate(session)
+            context.start()
+            if vad_load and mode == "adaptive":
+                from adaptive_vad import attach_adaptive_vad
+                attach_adaptive_vad(session, tracker, tracker.persona, vad_profile, room=ctx.room.name)
+            # AUDIO_CAPTURE=true: entrada/saída/VAD num anel em disco para reproduzir depois
+            capture = attach_capture(session, ctx.room.name)
+            return session, agent
+
+        async def _greeting():
+            # Do cache em disco; só sintetiza na primeira vez para esta voz/texto/persona
+            return await get_greeting_audio(env.voice, env.greeting, env.assistant_prompt or "ASSISTANT")
 
-        logging.info("🎬 Iniciando sessão...")
-        await session.start(
-            room=ctx.room,
-            agent=Assistant(get_prompt(env.assistant_prompt), tools=mcp_tools),
-            room_input_options=RoomInputOptions(**room_input_kwargs),
-        )
+        # MCP, conexão com a sala e VAD são independentes: rodam em paralelo.
+        # Sem MCP seguimos sem tools; sem VAD, com turn detection do servidor.
+        results = await run_graph([
+            Step("mcp_discovery", build_livekit_tools_from_mcp, fallback=[]),
+            Step("room_connect", ctx.connect),
+            Step("vad_load", _vad, fallback=None),
+            Step("session_start", _session, deps=("room_connect", "mcp_discovery", "vad_load")),
+            Step("greeting_audio", _greeting, fallback=None),
+        ], label="entrypoint")
+        session, agent = results["session_start"]
+        logging.info("🔧 MCP tools carregadas: %d", len(results["mcp_discovery"]))
+        if results["vad_load"]:
+            logging.info("✅ VAD carregado com sucesso - pronto para detectar fala em ambiente ruidoso")
+        else:
+            logging.warning("⚠️ VAD não foi carregado - usando configuração padrão do OpenAI")
 
         logging.info("👋 Enviando saudação: %s", env.greeting)
-        await session.generate_reply(instructions=env.greeting)
+        await speak_greeting(session, agent, env.greeting, results["greeting_audio"])
         logging.info("✅ Agente pronto e aguardando interação...")
 
     except Exception as e:
@@ -82,11 +179,12 @@ async def entrypoint(ctx: agents.JobContext):
 
 if __name__ == "__main__":
     try:
+        profile.enable_from_argv()
         setup_logging()
         env = Env.load()
         env.validate(require_openai=True, require_livekit=True)
         logging.info("🎯 Iniciando worker LiveKit...")
-        agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+        agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
     except SystemExit:
         raise
     except Exception as e:
@@ -1,63 +1,218 @@
 # agent_direct.py - Conecta DIRETAMENTE à sala sem esperar dispatch
-import asyncio
-import logging
-from livekit import agents, rtc
-from livekit.agents import Agent, AgentSession, RoomInputOptions, FunctionTool
-from livekit.plugins import openai, noise_cancellation
-
-from settings import setup_logging, Env
-from prompts import get_prompt
-import tools as agent_tools
-from mcp_bridge import build_livekit_tools_from_mcp
-from vad_config import get_vad_for_noisy_environment, VADConfig
+from startup_profile import profile
+
+with profile.phase("imports"):
+    import os
+    import sys
+    import json
+    import uuid
+    import asyncio
+    import logging
+    from dataclasses import dataclass
+    from typing import Callable
+    from livekit import rtc
+    from livekit.agents import Agent, AgentSession, RoomInputOptions, FunctionTool, StopResponse
+
+    from settings import setup_logging, Env
+    from log_pipeline import bind as bind_log_context
+    from prompts import get_prompt
+    from mcp_bridge import (build_livekit_tools_from_mcp, aclose_mcp, current_mcp_tools,
+                            add_tools_listener, remove_tools_listener)
+    from vad_config import load_vad, share_vad, vad_silence_duration, vad_mode, initial_profile, VADConfig
+    from turn_metrics import TurnTracker, registry as metrics_registry
+    from init_graph import Step, run_graph
+    from answer_cache import AnswerCache, TurnTranscripts, load_answer_cache
+    from chat_context import ContextWindow
+    from audio_ring import SessionCapture, attach_capture
+    from session_usage import MeteredVAD, ProcessUsage, open_session, close_session
+    from noise_gate import attach_noise_gate, noise_cancellation_options, use_noise_gate
+    from greeting_cache import GreetingAudio, get_greeting_audio, speak_greeting
+
+# Sala/identidade usadas quando o comando não informa outra
+DEFAULT_ROOM = os.getenv("LIVEKIT_ROOM", "agrinho-demo")
+DEFAULT_IDENTITY = os.getenv("AGENT_IDENTITY", "agrinho-agent")
 
 class Assistant(Agent):
-    def __init__(self, instructions: str, tools: list[FunctionTool] | None = None) -> None:
+    def __init__(self, instructions: str, tools: list[FunctionTool] | None = None,
+                 answers: AnswerCache | None = None) -> None:
         super().__init__(instructions=instructions, tools=tools or [])
+        self.answers = answers
+        # Sem STT, a pergunta vem da transcrição do modelo realtime (ver answer_cache)
+        self.transcripts = TurnTranscripts(self._on_transcript) if answers is not None else None
 
-async def run_agent():
-    """Conecta o agente diretamente à sala 'agrinho-demo'"""
+    async def on_enter(self) -> None:
+        if self.transcripts is not None:
+            self.transcripts.attach(self.session)
+
+    async def on_user_turn_completed(self, turn_ctx, new_message) -> None:
+        if self.answers is None:
+            return
+        text = new_message.text_content or ""
+        if not text:
+            # Sem transcrição ainda: o modelo responde já; um acerto depois troca a resposta
+            self.transcripts.turn_ended()
+            return
+        # Pergunta frequente com resposta pronta: fala o áudio do cache e pula o modelo
+        if await self.answers.respond(self, text):
+            raise StopResponse()
+
+    async def _on_transcript(self, text: str, turn_end: float) -> None:
+        await self.answers.respond(self, text, turn_end, replace=True)
+
+
+@dataclass
+class Prepared:
+    """Tudo o que pode ser carregado antes de saber em qual sala entrar."""
+    env: Env
+    instructions: str
+    mcp_tools: list[FunctionTool]
+    vad_instance: object | None
+    greeting_audio: GreetingAudio | None = None
+
+
+def _import_plugins() -> None:
+    """
+    Plugins usados por toda sala: importados no primeiro uso, não no topo.
+
+    Precisa rodar na thread principal (o LiveKit registra plugins no import),
+    por isso o VAD só é carregado em thread depois desta etapa.
+    """
+    from livekit.plugins import openai  # noqa: F401
     try:
-        env = Env.load()
-        logging.info("🚀 Iniciando agente Agrinho (MODO DIRETO)...")
+        from livekit.plugins import noise_cancellation  # noqa: F401
+    except ImportError:
+        pass  # sem BVC: noise_cancellation_options() devolve {} e o filtro local entra
+    try:
+        from livekit.plugins import silero  # noqa: F401
+    except ImportError:
+        pass
 
-        # Carrega tools do MCP
-        mcp_tools = await build_livekit_tools_from_mcp()
-        logging.info("🔧 MCP tools carregadas: %d", len(mcp_tools))
-
-        # Conecta à sala usando RTC
-        room = rtc.Room()
-
-        # Gera token para o agente
-        from livekit import api
-        token = api.AccessToken(env.livekit_api_key, env.livekit_api_secret)
-        token.with_identity("agrinho-agent")
-        token.with_name("Agrinho")
-        token.with_grants(api.VideoGrants(
-            room_join=True,
-            room="agrinho-demo",
-        ))
-        jwt_token = token.to_jwt()
-
-        logging.info("🔗 Conectando à sala 'agrinho-demo'...")
-        await room.connect(env.livekit_url, jwt_token)
-        logging.info("✅ Conectado à sala!")
-
-        # Carregar VAD otimizado para ambientes ruidosos
-        logging.info("🎤 Carregando VAD (Voice Activity Detection) para detecção robusta de fala...")
-        vad_instance = await get_vad_for_noisy_environment()
-        if vad_instance:
-            logging.info("✅ VAD carregado com sucesso - pronto para detectar fala em ambiente ruidoso")
-        else:
-            logging.warning("⚠️ VAD não foi carregado - usando configuração padrão do OpenAI")
 
-        vad_config = VADConfig.get_config("noisy")
+async def prepare() -> Prepared:
+    """
+    Carrega persona, tools do MCP, plugins e VAD (a parte cara do cold start).
 
-        # Se ALLOW_INTERRUPTIONS=false e não há VAD local, falhar explicitamente
-        if not env.allow_interruptions and not vad_instance:
-            raise RuntimeError(
-                "ALLOW_INTERRUPTIONS=false requer VAD local; Silero VAD não disponível"
-            )
+    MCP e VAD não dependem um do outro e rodam em paralelo; sem MCP seguimos
+    sem tools, sem VAD seguimos com turn detection do servidor.
+    """
+    async def _env():
+        return Env.load()
+
+    async def _plugins():
+        _import_plugins()
+
+    async def _vad(plugins):
+        # Carga do ONNX é CPU/disco: vai para uma thread e não trava o loop
+        return await asyncio.to_thread(load_vad)  # uma vez por processo; as salas compartilham
+
+    async def _greeting(env_load, import_plugins):
+        # Do cache em disco; só sintetiza na primeira vez para esta voz/texto/persona
+        return await get_greeting_audio(env_load.voice, env_load.greeting, env_load.assistant_prompt or "ASSISTANT")
+
+    logging.info("🎤 Carregando VAD, plugins e tools do MCP em paralelo...")
+    results = await run_graph([
+        Step("env_load", _env),
+        Step("mcp_discovery", build_livekit_tools_from_mcp, fallback=[]),
+        Step("import_plugins", _plugins),
+        Step("vad_load", _vad, deps=("import_plugins",), fallback=None),
+        Step("greeting_audio", _greeting, deps=("env_load", "import_plugins"), fallback=None),
+    ], label="prepare")
+    env = results["env_load"]
+    mcp_tools = results["mcp_discovery"]
+    vad_instance = results["vad_load"]
+
+    logging.info("🔧 MCP tools carregadas: %d", len(mcp_tools))
+    if vad_instance:
+        logging.info("✅ VAD carregado com sucesso - pronto para detectar fala em ambiente ruidoso")
+    else:
+        logging.warning("⚠️ VAD não foi carregado - usando configuração padrão do OpenAI")
+
+    # Se ALLOW_INTERRUPTIONS=false e não há VAD local, falhar explicitamente
+    if not env.allow_interruptions and not vad_instance:
+        raise RuntimeError(
+            "ALLOW_INTERRUPTIONS=false requer VAD local; Silero VAD não disponível"
+        )
+
+    return Prepared(
+        env=env,
+        instructions=get_prompt(env.assistant_prompt),
+        mcp_tools=mcp_tools,
+        vad_instance=vad_instance,
+        greeting_audio=results["greeting_audio"],
+    )
+
+
+def _track_first_audio(session: AgentSession) -> None:
+    """Marca no perfil o instante em que o agente começa a falar pela primeira vez."""
+    def _on_state(ev) -> None:
+        if ev.new_state == "speaking":
+            session.off("agent_state_changed", _on_state)
+            profile.mark("first_audio")
+            profile.report()
+    session.on("agent_state_changed", _on_state)
+
+
+async def _connect_room(room: rtc.Room, env: Env, room_name: str, identity: str) -> rtc.Room:
+    # Gera token para o agente
+    from livekit import api
+    token = api.AccessToken(env.livekit_api_key, env.livekit_api_secret)
+    token.with_identity(identity)
+    token.with_name("Agrinho")
+    token.with_grants(api.VideoGrants(
+        room_join=True,
+        room=room_name,
+    ))
+    jwt_token = token.to_jwt()
+
+    logging.info("🔗 Conectando à sala '%s' como '%s'...", room_name, identity)
+    await room.connect(env.livekit_url, jwt_token)
+    logging.info("✅ Conectado à sala '%s'!", room_name)
+    return room
+
+
+async def run_room(prepared: "asyncio.Future[Prepared]", room_name: str, identity: str, stop: asyncio.Event):
+    """
+    Roda uma sessão isolada do agente na sala `room_name` até `stop` ser sinalizado.
+
+    A conexão com a sala só precisa das credenciais, então corre em paralelo
+    com a preparação (MCP/VAD) quando ela ainda não terminou (modo direto).
+    """
+    # Logs desta sala (e das tasks da sessão, criadas depois) saem com sala/sessão
+    bind_log_context(room=room_name, session=uuid.uuid4().hex[:12])
+    # Conta de recursos da sala (CPU do VAD, áudio, tools, contexto), vigente nas tasks da sessão
+    usage = open_session(room_name)
+    # Conecta à sala usando RTC
+    room = rtc.Room()
+    session: AgentSession | None = None
+    tracker: TurnTracker | None = None
+    agent: Assistant | None = None
+    context: ContextWindow | None = None
+    capture: SessionCapture | None = None
+
+    async def _on_tools_changed(tools) -> None:
+        if agent is not None:
+            await agent.update_tools(tools)
+            logging.info("🔧 [%s] Tools MCP atualizadas: %d", room_name, len(tools))
+
+    try:
+        async def _prepared():
+            # shield: uma falha na conexão não cancela a preparação compartilhada
+            return await asyncio.shield(prepared)
+
+        results = await run_graph([
+            Step("prepare", _prepared),
+            Step("room_connect", lambda: _connect_room(room, Env.load(), room_name, identity)),
+        ], label=room_name)
+        prepared_value: Prepared = results["prepare"]
+
+        from livekit.plugins import openai
+
+        env = prepared_value.env
+        vad_instance = share_vad() if prepared_value.vad_instance else None
+
+        mode = vad_mode()
+        vad_profile = initial_profile(mode) if vad_instance else "noisy"
+        vad_config = VADConfig.get_config(vad_profile)
 
         # Cria sessão do agente com VAD local e desabilita turn detection no servidor
         session = AgentSession(
@@ -65,50 +220,296 @@ async def run_agent():
                 voice=env.voice,
                 turn_detection=None,  # Desabilitar detecção de turnos no servidor
             ),
-            vad=vad_instance,                    # Usar VAD local (Silero)
+            # VAD local (Silero), compartilhado entre salas; o wrapper só cobra a inferência desta sala
+            vad=MeteredVAD(vad_instance, usage) if vad_instance else None,
             allow_interruptions=env.allow_interruptions,  # Respeitar configuração
             turn_detection="vad" if vad_instance else "server",  # Preferir VAD local
             **vad_config                         # Aplicar configurações customizadas para ambiente ruidoso
         )
-
-        logging.info("🎬 Iniciando sessão do agente...")
-        await session.start(
-            room=room,
-            agent=Assistant(get_prompt(env.assistant_prompt), tools=mcp_tools),
-            room_input_options=RoomInputOptions(
-                noise_cancellation=noise_cancellation.BVC(),  # Cancelamento de ruído BVC
-                close_on_disconnect=False,                    # Não fechar quando participante desconectar
-            ),
+        tracker = TurnTracker(
+            session,
+            persona=env.assistant_prompt or "ASSISTANT",
+            vad_profile=vad_profile,
+            eos_offset=vad_silence_duration(vad_instance),
         )
+        if profile.enabled:
+            _track_first_audio(session)
 
-        logging.info("👋 Enviando saudação: %s", env.greeting)
-        await session.generate_reply(instructions=env.greeting)
-        logging.info("✅ Agente pronto e aguardando interação em ambiente ruidoso!")
+        # Tools vigentes: o catálogo pode ter sido atualizado em background desde o prepare
+        answers = load_answer_cache(env.assistant_prompt)
+        if answers is not None:
+            answers.start_prerender(env.voice)
+        agent = Assistant(prepared_value.instructions, tools=current_mcp_tools() or prepared_value.mcp_tools,
+                          answers=answers)
+        add_tools_listener(_on_tools_changed)
+
+        logging.info("🎬 Iniciando sessão do agente na sala '%s'...", room_name)
+        nc_options = noise_cancellation_options()
+        with profile.phase("session_start"):
+            await session.start(
+                room=room,
+                agent=agent,
+                room_input_options=RoomInputOptions(
+                    close_on_disconnect=False,  # Não fechar quando participante desconectar
+                    **nc_options,               # Cancelamento de ruído BVC, quando disponível
+                ),
+            )
+        # Sem BVC (ou NOISE_GATE=on), filtro local antes do VAD (CPU cobrada na conta da sala)
+        if use_noise_gate(nc_options):
+            attach_noise_gate(session, usage=usage)
+        # Sessão longa (quiosque): contexto limitado e zerado a cada visitante novo
+        context = ContextWindow(session, agent, tracker.persona, room=room_name)
+        context.start()
+        usage.attach(session, agent)
+        if vad_instance and mode == "adaptive":
+            from adaptive_vad import attach_adaptive_vad
+            attach_adaptive_vad(session, tracker, tracker.persona, vad_profile, room=room_name)
+        # AUDIO_CAPTURE=true: entrada/saída/VAD num anel em disco para reproduzir depois
+        capture = attach_capture(session, room_name)
+
+        logging.info("👋 [%s] Enviando saudação: %s", room_name, env.greeting)
+        await speak_greeting(session, agent, env.greeting, prepared_value.greeting_audio)
+        logging.info("✅ [%s] Agente pronto e aguardando interação em ambiente ruidoso!", room_name)
         logging.info("📢 Configurações ativas:")
-        logging.info("   - Cancelamento de ruído (BVC): Ativado")
+        logging.info("   - Cancelamento de ruído (BVC): %s", "Ativado" if nc_options else "Desativado")
+        logging.info("   - Supressão de ruído local: %s", "Ativada" if use_noise_gate(nc_options) else "Desativada")
         logging.info("   - VAD (Silero) para detecção robusta: %s", "Ativado" if vad_instance else "Desativado")
         if vad_instance:
             logging.info("   - Threshold de ativação: 0.6 (robusto contra ruído)")
             logging.info("   - Duração mínima de silêncio: 0.8s (aguarda confirmação)")
-        logging.info("   - Ambiente: RUIDOSO")
+        logging.info("   - Perfil de VAD: %s", "ADAPTATIVO" if mode == "adaptive" and vad_instance else vad_profile.upper())
+
+        # Mantém a sessão rodando até o pedido de saída
+        await stop.wait()
+        logging.info("🚪 [%s] Encerrando sessão...", room_name)
+        await _finish_speech(session, room_name)
+    finally:
+        remove_tools_listener(_on_tools_changed)
+        close_session(usage)
+        if context is not None:
+            await context.aclose()
+        if capture is not None:
+            capture.close()
+        if tracker is not None:
+            tracker.log_summary()
+        if agent is not None and agent.answers is not None:
+            logging.info("💬 [%s] Cache de respostas: %s", room_name, agent.answers.stats())
+        if session is not None:
+            try:
+                await session.aclose()
+            except Exception as e:
+                logging.warning("⚠️ [%s] Falha ao fechar sessão: %s", room_name, e)
+        await room.disconnect()
+        logging.info("👋 [%s] Desconectado da sala.", room_name)
+
+
+async def _finish_speech(session: AgentSession, room_name: str) -> None:
+    """Drenagem: deixa a fala em andamento terminar antes de fechar a sessão."""
+    speech = getattr(session, "current_speech", None)
+    if speech is None or speech.done():
+        return
+    timeout = float(os.getenv("ROOM_DRAIN_TIMEOUT", "8"))
+    logging.info("⏳ [%s] Aguardando a fala atual terminar (até %.0fs)...", room_name, timeout)
+    try:
+        await asyncio.wait_for(speech.wait_for_playout(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logging.warning("⚠️ [%s] Fala não terminou em %.0fs; encerrando assim mesmo.", room_name, timeout)
+    except Exception as e:
+        logging.warning("⚠️ [%s] Falha ao aguardar a fala atual: %s", room_name, e)
+
+
+class RoomHost:
+    """
+    Hospeda várias salas no mesmo processo, uma AgentSession isolada por sala.
+
+    VAD, conexões MCP e persona vêm de `Prepared` e são compartilhados; cada
+    sala tem seu próprio Room, AgentSession e Assistant (contexto de conversa).
+    """
+
+    def __init__(self, prepared: "asyncio.Future[Prepared]", on_event: Callable[..., None] | None = None):
+        self.prepared = prepared
+        self._on_event = on_event or (lambda *_a, **_k: None)
+        self._rooms: dict[str, tuple[asyncio.Task, asyncio.Event]] = {}
+        self._leaving: set[asyncio.Task] = set()  # leaves em background (referência até terminar)
+
+    @property
+    def rooms(self) -> list[str]:
+        return list(self._rooms)
+
+    def join(self, room_name: str, identity: str = DEFAULT_IDENTITY) -> bool:
+        """Inicia a sessão na sala em background. False se a sala já está ativa."""
+        if room_name in self._rooms:
+            return False
+        stop = asyncio.Event()
+        task = asyncio.create_task(self._run(room_name, identity, stop), name=f"room-{room_name}")
+        self._rooms[room_name] = (task, stop)
+        return True
+
+    async def _run(self, room_name: str, identity: str, stop: asyncio.Event) -> None:
+        error = None
+        try:
+            await run_room(self.prepared, room_name, identity, stop)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.exception("❌ [%s] Falha na sessão: %s", room_name, e)
+            error = str(e)
+        finally:
+            self._rooms.pop(room_name, None)
+            self._on_event("left", room=room_name, error=error, rooms=self.rooms)
+
+    async def leave(self, room_name: str) -> bool:
+        """Encerra só a sessão desta sala; as demais continuam. False se não existia."""
+        entry = self._rooms.get(room_name)
+        if entry is None:
+            return False
+        task, stop = entry
+        stop.set()
+        try:
+            # Tempo para a fala atual terminar (ROOM_DRAIN_TIMEOUT) + fechar a sessão
+            await asyncio.wait_for(asyncio.shield(task), timeout=float(os.getenv("ROOM_DRAIN_TIMEOUT", "8")) + 10)
+        except asyncio.TimeoutError:
+            logging.warning("⚠️ [%s] Sessão não encerrou a tempo; cancelando.", room_name)
+            task.cancel()
+        except Exception:
+            pass
+        return True
+
+    def leave_soon(self, room_name: str) -> None:
+        """`leave` em background, sem bloquear quem pediu (ex.: leitura de comandos)."""
+        task = asyncio.create_task(self.leave(room_name), name=f"leave-{room_name}")
+        self._leaving.add(task)
+        task.add_done_callback(self._left)
+
+    def _left(self, task: asyncio.Task) -> None:
+        self._leaving.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("❌ Falha ao encerrar sala: %s", task.exception())
+
+    async def wait(self) -> None:
+        """Espera todas as salas terminarem."""
+        while self._rooms:
+            await asyncio.gather(*(t for t, _ in list(self._rooms.values())), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(self.leave(r) for r in self.rooms), *self._leaving, return_exceptions=True)
+
 
+async def run_agent():
+    """Conecta o agente diretamente à sala LIVEKIT_ROOM (padrão 'agrinho-demo')"""
+    try:
+        logging.info("🚀 Iniciando agente Agrinho (MODO DIRETO)...")
+        # Preparação e conexão com a sala correm em paralelo (ver run_room)
+        prepared = asyncio.ensure_future(prepare())
+        host = RoomHost(prepared)
+        host.join(DEFAULT_ROOM, DEFAULT_IDENTITY)
         # Mantém o agente rodando
-        while True:
-            await asyncio.sleep(1)
+        await host.wait()
+        prepared.result()  # propaga falha da preparação, se houve
 
     except KeyboardInterrupt:
         logging.info("⚠️  Interrompido pelo usuário")
     except Exception as e:
         logging.exception("❌ Falha ao executar agente: %s", e)
         raise
+    finally:
+        await aclose_mcp()
+
+
+# --- Modo standby (processo pré-aquecido controlado pelo server.py) ---
+# Protocolo: uma linha JSON por mensagem. O agente escreve eventos no stdout
+# (ex.: {"event": "ready"}) e lê comandos do stdin:
+#   {"cmd": "join", "room": "sala-1", "identity": "agrinho-agent"}
+#   {"cmd": "leave", "room": "sala-1"}
+#   {"cmd": "drain"}   encerra todas as salas (deixando a fala atual terminar) e sai
+# Os logs vão para o stderr, então não se misturam com o protocolo.
+
+def emit_event(event: str, **data) -> None:
+    sys.stdout.write(json.dumps({"event": event, **data}) + "\n")
+    sys.stdout.flush()
+
+
+async def publish_metrics(interval: float) -> None:
+    """Envia periodicamente as métricas de turno e o uso de recursos por sala para o server.py."""
+    usage = ProcessUsage()
+    usage.start()
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            emit_event("metrics", data=metrics_registry.snapshot())
+            emit_event("usage", data=usage.snapshot())
+    finally:
+        usage.stop()
+
+
+async def read_command() -> dict | None:
+    """Lê o próximo comando do stdin sem bloquear o event loop (None = EOF)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            logging.warning("⚠️ Comando inválido ignorado: %s", line)
+
+
+async def run_standby():
+    """Pré-carrega tudo, avisa o server.py e atende comandos de join/leave por sala."""
+    prepared = asyncio.ensure_future(prepare())
+    try:
+        await prepared
+    except Exception:
+        await aclose_mcp()
+        raise
+    host = RoomHost(prepared, on_event=emit_event)
+    emit_event("ready")
+    logging.info("🅿️ Agente em standby, aguardando salas...")
+    metrics_task = asyncio.create_task(publish_metrics(float(os.getenv("METRICS_INTERVAL", "10"))))
+    try:
+        while True:
+            cmd = await read_command()
+            if cmd is None:
+                logging.info("👋 stdin fechado; encerrando agente.")
+                return
+            name = cmd.get("cmd")
+            room_name = cmd.get("room") or DEFAULT_ROOM
+            if name in ("join", "start"):
+                joined = host.join(room_name, cmd.get("identity") or DEFAULT_IDENTITY)
+                emit_event("joined" if joined else "already_joined", room=room_name, rooms=host.rooms)
+            elif name == "leave":
+                # Não bloqueia a leitura de comandos enquanto a sala fecha
+                host.leave_soon(room_name)
+            elif name == "drain":
+                # Nenhum join é lido enquanto drena; o processo sai em seguida
+                logging.info("🚰 Drenando %d sala(s) antes de sair...", len(host.rooms))
+                await host.aclose()
+                emit_event("drained")
+                return
+            else:
+                logging.warning("⚠️ Comando desconhecido: %s", cmd)
+    finally:
+        metrics_task.cancel()
+        await host.aclose()
+        await aclose_mcp()
+
 
 if __name__ == "__main__":
     try:
+        profile.enable_from_argv()
         setup_logging()
         env = Env.load()
         env.validate(require_openai=True, require_livekit=True)
-        logging.info("🎯 Modo DIRETO - Conectando à sala...")
-        asyncio.run(run_agent())
+        if "--standby" in sys.argv[1:]:
+            logging.info("🎯 Modo STANDBY - pré-aquecendo agente...")
+            asyncio.run(run_standby())
+        else:
+            logging.info("🎯 Modo DIRETO - Conectando à sala...")
+            asyncio.run(run_agent())
     except SystemExit:
         raise
     except KeyboardInterrupt:
@@ -0,0 +1,280 @@
+# answer_cache.py - Respostas prontas para as perguntas frequentes da persona
+#
+# Em evento, poucas perguntas ("o que é o Agrinho?", "onde é o evento?") são a
+# maior parte do tráfego, e cada uma custava um turno inteiro do modelo
+# realtime. Cada persona pode ter um arquivo de perguntas e respostas
+# curadas em answers/<PERSONA>.json:
+#
+#   [{"id": "o-que-e", "questions": ["o que é o agrinho", "me fala do agrinho"],
+#     "answer": "O Agrinho é ..."}]
+#
+# A transcrição do usuário é normalizada (minúsculas, sem acento/pontuação) e
+# comparada por similaridade de cosseno TF-IDF (palavras + bigramas) com as
+# perguntas. Acima de ANSWER_CACHE_THRESHOLD (padrão 0.75) a resposta sai do
+# áudio pré-renderizado (greeting_cache) e o modelo não é chamado.
+#
+# A sessão usa o modelo realtime sem STT: no fim do turno a mensagem do
+# usuário chega vazia, e a transcrição vem do próprio modelo (evento
+# user_input_transcribed) logo depois do commit do áudio. O turno não espera
+# por ela: o modelo começa a responder na hora e, se a transcrição final bater
+# com o cache até ANSWER_CACHE_REPLACE_WINDOW depois do fim do turno, a
+# resposta do modelo é interrompida e trocada pelo áudio pronto. Erros de cache
+# não custam nada; acertos contam a economia líquida (mediana do modelo menos o
+# tempo do fim do turno até o áudio pronto sair).
+#
+#   ANSWER_CACHE=true            desliga com false
+#   ANSWER_CACHE_THRESHOLD=0.75
+#   ANSWER_CACHE_REPLACE_WINDOW=1.0   segundos após o fim do turno em que um acerto ainda troca a resposta
+#   ANSWER_CACHE_DIR=            padrão: voice_agent/answers
+
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from turn_metrics import registry
+
+log = logging.getLogger("answer-cache")
+
+# Só palavras que não mudam o sentido da pergunta; interrogativos ficam
+STOPWORDS = {
+    "o", "a", "os", "as", "um", "uma", "de", "do", "da", "dos", "das", "no", "na", "nos", "nas",
+    "em", "pra", "para", "por", "pro", "me", "eu", "voce", "ce", "ai", "ne", "ola", "oi", "entao",
+    "tipo", "assim", "la", "aqui", "sabe",
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos nem pontuação, espaços simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(text.split())
+
+
+def _terms(text: str) -> list[str]:
+    words = [w for w in normalize(text).split() if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class TfidfIndex:
+    """Índice TF-IDF em Python puro; poucas centenas de perguntas cabem com folga."""
+
+    def __init__(self, docs: list[str]):
+        counts = [Counter(_terms(d)) for d in docs]
+        df = Counter(t for c in counts for t in c)
+        n = len(docs)
+        self.idf = {t: math.log((1 + n) / (1 + f)) + 1.0 for t, f in df.items()}
+        self.vectors = [self._vector(c) for c in counts]
+
+    def _vector(self, counts: Counter) -> dict[str, float]:
+        vec = {t: c * self.idf.get(t, 0.0) for t, c in counts.items() if t in self.idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {t: v / norm for t, v in vec.items()} if norm else {}
+
+    def query(self, text: str) -> tuple[int, float] | None:
+        """(índice do documento mais parecido, cosseno) ou None se nada em comum."""
+        q = self._vector(Counter(_terms(text)))
+        if not q:
+            return None
+        best, best_score = -1, 0.0
+        for i, vec in enumerate(self.vectors):
+            score = sum(w * vec.get(t, 0.0) for t, w in q.items())
+            if score > best_score:
+                best, best_score = i, score
+        return (best, best_score) if best >= 0 else None
+
+
+class TurnTranscripts:
+    """
+    Liga a transcrição final do modelo realtime ao turno que acabou (uma por sessão).
+
+    `turn_ended()` abre a janela do turno; só a primeira transcrição final que
+    chega dentro dela é entregue a `on_final(texto, fim_do_turno)`. Transcrição
+    fora da janela (atrasada, ou depois de o usuário voltar a falar) é
+    descartada: nunca vale para o turno seguinte.
+    """
+
+    def __init__(self, on_final: Callable[[str, float], Awaitable[Any]], window: float | None = None) -> None:
+        self.on_final = on_final
+        self.window = window if window is not None else float(os.getenv("ANSWER_CACHE_REPLACE_WINDOW", "1.0"))
+        self._session: Any = None
+        self._turn_end: float | None = None  # fim do turno aguardando transcrição
+        self._tasks: set[asyncio.Task] = set()
+
+    def attach(self, session: Any) -> None:
+        if self._session is session:
+            return
+        self.detach()
+        session.on("user_input_transcribed", self._on_transcribed)
+        session.on("user_state_changed", self._on_user_state)
+        self._session = session
+
+    def detach(self) -> None:
+        if self._session is not None:
+            self._session.off("user_input_transcribed", self._on_transcribed)
+            self._session.off("user_state_changed", self._on_user_state)
+            self._session = None
+        self._turn_end = None
+
+    def turn_ended(self) -> None:
+        self._turn_end = time.perf_counter()
+
+    def _on_user_state(self, ev: Any) -> None:
+        if ev.new_state == "speaking":
+            self._turn_end = None  # turno novo: a transcrição do anterior não vale mais
+
+    def _on_transcribed(self, ev: Any) -> None:
+        text = (ev.transcript or "").strip()
+        if not ev.is_final or not text or self._turn_end is None:
+            return
+        turn_end, self._turn_end = self._turn_end, None
+        late = time.perf_counter() - turn_end
+        if late > self.window:
+            log.debug("Transcrição chegou %.0f ms após o fim do turno; fora da janela.", late * 1000)
+            return
+        task = asyncio.create_task(self.on_final(text, turn_end), name="answer-cache-final")
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("⚠️ Falha ao responder do cache: %s", task.exception())
+
+
+@dataclass
+class Answer:
+    id: str
+    questions: list[str]
+    answer: str
+    audio: Any = None  # GreetingAudio quando já renderizado
+
+
+class AnswerCache:
+    def __init__(self, persona: str, answers: list[Answer], threshold: float = 0.75):
+        self.persona = persona
+        self.answers = answers
+        self.threshold = threshold
+        self._owner = [i for i, a in enumerate(answers) for _ in a.questions]
+        self.index = TfidfIndex([q for a in answers for q in a.questions])
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._prerender_task: asyncio.Task | None = None
+
+    def match(self, text: str) -> tuple[Answer, float] | None:
+        found = self.index.query(text)
+        if found is None or found[1] < self.threshold:
+            return None
+        return self.answers[self._owner[found[0]]], found[1]
+
+    def start_prerender(self, voice: str) -> None:
+        """Renderiza em background o áudio das respostas que ainda não têm (uma vez por processo)."""
+        if self._prerender_task is None:
+            self._prerender_task = asyncio.create_task(self._prerender(voice), name="answer-prerender")
+
+    async def _prerender(self, voice: str) -> None:
+        from greeting_cache import get_greeting_audio
+
+        for a in self.answers:
+            a.audio = await get_greeting_audio(voice, a.answer, self.persona, slot=f"answer:{a.id}")
+        ready = sum(1 for a in self.answers if a.audio is not None)
+        log.info("💬 Respostas prontas com áudio: %d/%d (%s)", ready, len(self.answers), self.persona)
+
+    async def respond(self, agent: Any, text: str, turn_end: float | None = None,
+                      replace: bool = False) -> bool:
+        """
+        Responde do cache se a transcrição bater com uma pergunta conhecida.
+
+        True = respondido. Com `replace`, a resposta do modelo já em andamento é
+        interrompida; senão o chamador é que pula o turno do modelo (StopResponse).
+        `turn_end` (perf_counter do fim do turno) entra na conta da economia.
+        """
+        t0 = turn_end if turn_end is not None else time.perf_counter()
+        hit = self.match(text) if text else None
+        if hit is None or hit[0].audio is None:
+            self.misses += 1
+            registry.inc("agrinho_answer_cache_lookups_total", persona=self.persona, result="miss")
+            return False
+        answer, score = hit
+        from greeting_cache import say_prerendered
+
+        if replace:
+            # force: troca a resposta mesmo com interrupções desligadas para o visitante
+            await agent.session.interrupt(force=True)
+        await say_prerendered(agent.session, agent, answer.answer, answer.audio)
+        self.hits += 1
+        registry.inc("agrinho_answer_cache_lookups_total", persona=self.persona, result="hit")
+        saved = _model_turn_latency(self.persona)
+        if saved is not None:
+            # Líquido: inclui a espera pela transcrição; pode ser negativo se ela atrasou
+            saved -= time.perf_counter() - t0
+            self.saved_seconds += saved
+            registry.inc("agrinho_answer_cache_saved_seconds_total", max(0.0, saved), persona=self.persona)
+        log.info("💬 Resposta do cache '%s' (similaridade %.2f, %s ms líquidos economizados%s)", answer.id, score,
+                 f"{saved * 1000:.0f}" if saved is not None else "?", "; resposta do modelo trocada" if replace else "")
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
+
+
+def _model_turn_latency(persona: str) -> float | None:
+    """Mediana atual do modelo (decisão → primeiro áudio) para a persona: o que um acerto evita."""
+    from turn_metrics import Histogram
+
+    merged = None
+    for (name, labels), h in registry.histograms.items():
+        lab = dict(labels)
+        if name == "agrinho_turn_latency_seconds" and str(lab.get("persona", "")).upper() == persona \
+                and lab.get("stage") == "endpoint_to_first_audio":
+            if merged is None:
+                merged = Histogram(h.bounds)
+            merged.merge(h)
+    return merged.quantile(0.5) if merged is not None else None
+
+
+def answers_path(persona: str) -> Path:
+    base = Path(os.getenv("ANSWER_CACHE_DIR") or Path(__file__).resolve().parent / "answers")
+    return base / f"{persona.upper()}.json"
+
+
+_caches: dict[str, AnswerCache | None] = {}
+
+
+def load_answer_cache(persona: str | None) -> AnswerCache | None:
+    """Cache de respostas da persona (memoizado por processo); None se desativado ou sem arquivo."""
+    persona = (persona or "ASSISTANT").upper()
+    if persona in _caches:
+        return _caches[persona]
+    cache = None
+    path = answers_path(persona)
+    if os.getenv("ANSWER_CACHE", "true").strip().lower() in {"1", "true", "yes", "y"} and path.exists():
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+            answers = [
+                Answer(id=str(e.get("id") or normalize(e["questions"][0])), questions=list(e["questions"]),
+                       answer=e["answer"])
+                for e in entries
+            ]
+            cache = AnswerCache(persona, answers, float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.75")))
+            log.info("💬 Cache de respostas: %d respostas / %d perguntas (%s)",
+                     len(answers), sum(len(a.questions) for a in answers), persona)
+        except Exception as e:
+            log.warning("⚠️ Arquivo de respostas inválido (%s): %s", path, e)
+    _caches[persona] = cache
+    return cache
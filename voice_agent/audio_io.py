@@ -0,0 +1,109 @@
+# audio_io.py - Derivação ("tap") do áudio que entra e sai da AgentSession
+#
+# A sessão lê o microfone do visitante de `session.input.audio` (já com BVC).
+# `TappedAudioInput` envolve essa entrada e repassa cada frame, sem copiar,
+# para callbacks síncronos (estimativa de ruído, captura etc.) antes de
+# entregá-lo ao VAD/modelo. `TappedAudioOutput` faz o mesmo com a fala do
+# agente a caminho da sala. Os callbacks rodam no caminho do áudio: devem ser
+# baratos e nunca bloquear.
+
+import logging
+from typing import Any, Callable
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+log = logging.getLogger("audio-io")
+
+FrameTap = Callable[[rtc.AudioFrame], None]
+
+
+def _run_taps(taps: list[FrameTap], frame: rtc.AudioFrame) -> None:
+    for tap in list(taps):
+        try:
+            tap(frame)
+        except Exception:
+            # Um tap com defeito não pode derrubar o áudio da sessão
+            log.exception("❌ Tap de áudio falhou; removendo %r", tap)
+            if tap in taps:
+                taps.remove(tap)
+
+
+class TappedAudioInput(io.AudioInput):
+    """Entrada de áudio que repassa os frames da `source` e avisa os taps."""
+
+    def __init__(self, source: io.AudioInput, label: str = "Tapped") -> None:
+        super().__init__(label=label, source=source)
+        self._taps: list[FrameTap] = []
+
+    def add_tap(self, tap: FrameTap) -> None:
+        self._taps.append(tap)
+
+    def remove_tap(self, tap: FrameTap) -> None:
+        if tap in self._taps:
+            self._taps.remove(tap)
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self.source.__anext__()
+        _run_taps(self._taps, frame)
+        return frame
+
+
+class TappedAudioOutput(io.AudioOutput):
+    """Saída de áudio que avisa os taps e repassa cada frame para a saída seguinte."""
+
+    def __init__(self, next_in_chain: io.AudioOutput, label: str = "Tapped") -> None:
+        super().__init__(
+            label=label,
+            capabilities=io.AudioOutputCapabilities(pause=True),  # pausa real é da saída seguinte
+            next_in_chain=next_in_chain,
+            sample_rate=next_in_chain.sample_rate,
+        )
+        self._taps: list[FrameTap] = []
+
+    def add_tap(self, tap: FrameTap) -> None:
+        self._taps.append(tap)
+
+    def remove_tap(self, tap: FrameTap) -> None:
+        if tap in self._taps:
+            self._taps.remove(tap)
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        _run_taps(self._taps, frame)
+        await self.next_in_chain.capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        self.next_in_chain.flush()
+
+    def clear_buffer(self) -> None:
+        self.next_in_chain.clear_buffer()
+
+
+def tap_session_audio(session: Any) -> TappedAudioInput | None:
+    """
+    Garante que a entrada de áudio da sessão (já iniciada) passe por um TappedAudioInput.
+
+    Chamadas seguintes devolvem o mesmo wrapper; None se a sessão não tem áudio.
+    """
+    current = session.input.audio
+    if current is None:
+        return None
+    if isinstance(current, TappedAudioInput):
+        return current
+    tapped = TappedAudioInput(current)
+    session.input.audio = tapped
+    return tapped
+
+
+def tap_session_output(session: Any) -> TappedAudioOutput | None:
+    """Como `tap_session_audio`, para a saída de áudio (fala do agente)."""
+    current = session.output.audio
+    if current is None:
+        return None
+    if isinstance(current, TappedAudioOutput):
+        return current
+    tapped = TappedAudioOutput(current)
+    session.output.audio = tapped
+    return tapped
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+audio_ring.py - Captura do áudio da sessão num ring buffer mapeado em memória
+
+Quando um turno dá errado no evento, não havia áudio para reproduzir. Com
+AUDIO_CAPTURE=true cada sala grava, num arquivo de tamanho fixo (mmap):
+
+  - frames PCM de entrada (visitante, depois do BVC) e de saída (agente)
+  - decisões do VAD (início/fim de fala do usuário)
+
+O arquivo é um anel de slots de tamanho fixo: o mais antigo é sobrescrito,
+nenhum frame aloca buffer e a escrita é só uma cópia para a memória
+mapeada (o kernel leva ao disco). A captura anterior da mesma sala é
+mantida como <sala>.prev.ring.
+
+    AUDIO_CAPTURE=false        liga com true
+    AUDIO_CAPTURE_MB=32        tamanho do anel por sala (~20 min de entrada + saída a 24 kHz)
+    AUDIO_CAPTURE_DIR=         padrão: voice_agent/.cache/capture
+
+Reprodução offline (vira caso de regressão do vad_bench):
+
+    python audio_ring.py info .cache/capture/agrinho-demo.ring
+    python audio_ring.py replay .cache/capture/agrinho-demo.ring --profiles quiet noisy
+    python audio_ring.py replay sala.ring --corpus corpus/ --name feira-0412
+"""
+
+import os
+import sys
+import mmap
+import json
+import time
+import struct
+import logging
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator
+
+log = logging.getLogger("audio-ring")
+
+MAGIC = b"AGRRING1"
+VERSION = 1
+
+KIND_IN = 0     # áudio do visitante
+KIND_OUT = 1    # fala do agente
+KIND_VAD = 2    # decisão do VAD: value 1.0 = começou a falar, 0.0 = parou
+
+# Cabeçalho do arquivo: magic, versão, tamanho do slot, slots, próximo seq, criado em, sala
+_HEADER = struct.Struct("<8sHIIQd32s")
+HEADER_SIZE = 128
+_SEQ_OFFSET = 8 + 2 + 4 + 4
+_SEQ = struct.Struct("<Q")
+
+# Cabeçalho do slot: seq (1-based), timestamp, tipo, canais, amostras, taxa, valor, bytes de PCM
+_SLOT = struct.Struct("<QdBBHIfI")
+MAX_PAYLOAD = 1920  # 20 ms mono a 48 kHz em int16; frames maiores ocupam vários slots
+SLOT_SIZE = _SLOT.size + MAX_PAYLOAD
+
+
+def enabled() -> bool:
+    return os.getenv("AUDIO_CAPTURE", "false").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def capture_dir() -> Path:
+    return Path(os.getenv("AUDIO_CAPTURE_DIR") or Path(__file__).resolve().parent / ".cache" / "capture")
+
+
+def ring_path(room: str) -> Path:
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in room) or "sala"
+    return capture_dir() / f"{safe}.ring"
+
+
+class AudioRing:
+    """Escritor do anel. Todas as escritas são síncronas e baratas (cópia para o mmap)."""
+
+    def __init__(self, path: Path, size_bytes: int, room: str):
+        self.path = path
+        self.slots = max(16, (size_bytes - HEADER_SIZE) // SLOT_SIZE)
+        total = HEADER_SIZE + self.slots * SLOT_SIZE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            # Guarda a captura anterior (ex.: do processo que caiu)
+            os.replace(path, path.with_suffix(".prev.ring"))
+        self._file = open(path, "w+b")
+        self._file.truncate(total)
+        self._mm = mmap.mmap(self._file.fileno(), total)
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, SLOT_SIZE, self.slots, 0, time.time(),
+                          room.encode("utf-8")[:32])
+        self._seq = 0
+
+    def _write(self, kind: int, ts: float, channels: int, samples: int, rate: int, value: float,
+               data: memoryview | None) -> None:
+        off = HEADER_SIZE + (self._seq % self.slots) * SLOT_SIZE
+        n = len(data) if data is not None else 0
+        if n:
+            self._mm[off + _SLOT.size: off + _SLOT.size + n] = data
+        # O cabeçalho do slot (com o seq) vai por último: slot meio escrito não vale
+        self._seq += 1
+        _SLOT.pack_into(self._mm, off, self._seq, ts, kind, channels, samples, rate, value, n)
+        _SEQ.pack_into(self._mm, _SEQ_OFFSET, self._seq)
+
+    def write_frame(self, kind: int, frame: Any) -> None:
+        if self._mm is None:
+            return
+        data = memoryview(frame.data).cast("B")
+        ts = time.time()
+        step = MAX_PAYLOAD - MAX_PAYLOAD % (2 * frame.num_channels)
+        for i in range(0, len(data), step):
+            chunk = data[i: i + step]
+            self._write(kind, ts, frame.num_channels, len(chunk) // (2 * frame.num_channels),
+                        frame.sample_rate, 0.0, chunk)
+
+    def write_vad(self, speaking: bool) -> None:
+        if self._mm is not None:
+            self._write(KIND_VAD, time.time(), 0, 0, 0, 1.0 if speaking else 0.0, None)
+
+    def close(self) -> None:
+        if self._mm is None:
+            return
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+        self._mm = None
+
+
+class SessionCapture:
+    """Liga um AudioRing à entrada, à saída e às decisões de VAD de uma AgentSession."""
+
+    def __init__(self, session: Any, room: str):
+        self.session = session
+        self.room = room
+        size = int(float(os.getenv("AUDIO_CAPTURE_MB", "32")) * 1024 * 1024)
+        self.ring = AudioRing(ring_path(room), size, room)
+        self._input = None
+        self._output = None
+
+    def _on_in(self, frame: Any) -> None:
+        self.ring.write_frame(KIND_IN, frame)
+
+    def _on_out(self, frame: Any) -> None:
+        self.ring.write_frame(KIND_OUT, frame)
+
+    def _on_user_state(self, ev: Any) -> None:
+        if ev.new_state == "speaking":
+            self.ring.write_vad(True)
+        elif ev.old_state == "speaking":
+            self.ring.write_vad(False)
+
+    def start(self) -> None:
+        from audio_io import tap_session_audio, tap_session_output
+
+        self._input = tap_session_audio(self.session)
+        self._output = tap_session_output(self.session)
+        if self._input is not None:
+            self._input.add_tap(self._on_in)
+        if self._output is not None:
+            self._output.add_tap(self._on_out)
+        self.session.on("user_state_changed", self._on_user_state)
+        log.info("⏺️ [%s] Captura de áudio em %s (%d slots, %.0f MB)", self.room, self.ring.path,
+                 self.ring.slots, self.ring.slots * SLOT_SIZE / 1024 / 1024)
+
+    def close(self) -> None:
+        if self._input is not None:
+            self._input.remove_tap(self._on_in)
+        if self._output is not None:
+            self._output.remove_tap(self._on_out)
+        self.session.off("user_state_changed", self._on_user_state)
+        self.ring.close()
+
+
+def attach_capture(session: Any, room: str) -> SessionCapture | None:
+    """Inicia a captura da sala se AUDIO_CAPTURE=true; None se desligada ou se falhar."""
+    if not enabled():
+        return None
+    try:
+        capture = SessionCapture(session, room)
+        capture.start()
+        return capture
+    except Exception as e:
+        log.warning("⚠️ [%s] Captura de áudio indisponível: %s", room, e)
+        return None
+
+
+# --- Leitura / reprodução ---
+
+@dataclass
+class Record:
+    seq: int
+    ts: float
+    kind: int
+    channels: int
+    samples: int
+    sample_rate: int
+    value: float
+    data: bytes
+
+
+def read_ring(path: Path) -> tuple[dict, Iterator[Record]]:
+    """(metadados, registros em ordem de escrita) de um arquivo de captura."""
+    raw = path.read_bytes()
+    magic, version, slot_size, slots, seq, created, room = _HEADER.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: não é uma captura do audio_ring")
+    meta = {"version": version, "slots": slots, "written": seq, "created": created,
+            "room": room.rstrip(b"\0").decode("utf-8", errors="replace")}
+
+    def _records() -> Iterator[Record]:
+        for s in range(max(0, seq - slots), seq):
+            off = HEADER_SIZE + (s % slots) * slot_size
+            rec_seq, ts, kind, ch, samples, rate, value, n = _SLOT.unpack_from(raw, off)
+            if rec_seq != s + 1:
+                continue  # sobrescrito/incompleto
+            yield Record(rec_seq, ts, kind, ch, samples, rate, value, raw[off + _SLOT.size: off + _SLOT.size + n])
+
+    return meta, _records()
+
+
+def extract(records: Iterator[Record], target_rate: int = 16000):
+    """
+    Áudio de entrada (float32 mono em `target_rate`) e as decisões do VAD em
+    segundos desse áudio: [(início, fim declarado), ...].
+    """
+    import numpy as np
+
+    chunks: list[np.ndarray] = []
+    position = 0.0
+    turns: list[list[float]] = []
+    for rec in records:
+        if rec.kind == KIND_IN and rec.samples:
+            pcm = np.frombuffer(rec.data, dtype=np.int16).reshape(-1, rec.channels).mean(axis=1) / 32768.0
+            if rec.sample_rate != target_rate:
+                n_out = int(round(len(pcm) * target_rate / rec.sample_rate))
+                pcm = np.interp(np.linspace(0, len(pcm) - 1, n_out), np.arange(len(pcm)), pcm)
+            chunks.append(pcm.astype(np.float32))
+            position += len(pcm) / target_rate
+        elif rec.kind == KIND_VAD:
+            if rec.value >= 0.5:
+                turns.append([position, position])
+            elif turns and turns[-1][0] == turns[-1][1]:
+                turns[-1][1] = position
+    audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    # Fala ainda em andamento quando a captura parou
+    if turns and turns[-1][0] == turns[-1][1]:
+        turns[-1][1] = position
+    return audio, [(round(a, 3), round(b, 3)) for a, b in turns]
+
+
+async def replay(path: Path, profiles: list[str]) -> tuple[dict, Any, list[tuple[float, float]]]:
+    """Passa o áudio capturado pelo VAD/endpointing de cada perfil e compara com o que aconteceu."""
+    from vad_bench import SAMPLE_RATE, detect_speech, simulate_endpointing
+    from vad_config import VADConfig, load_vad
+
+    meta, records = read_ring(path)
+    audio, recorded = extract(records, SAMPLE_RATE)
+    vad = load_vad()
+    if vad is None:
+        raise RuntimeError("Silero VAD indisponível")
+    t0 = time.perf_counter()
+    segments = await detect_speech(vad, audio)
+    vad_seconds = time.perf_counter() - t0
+    result = {
+        **meta,
+        "audio_seconds": round(len(audio) / SAMPLE_RATE, 2),
+        "recorded_turns": recorded,
+        "vad_real_time_factor": round(vad_seconds / max(len(audio) / SAMPLE_RATE, 1e-9), 4),
+        "profiles": {},
+    }
+    for name in profiles:
+        ends = simulate_endpointing(segments, VADConfig.get_config(name))
+        result["profiles"][name] = {
+            "speech_segments": [(round(s.start, 3), round(s.end, 3)) for s in segments],
+            "turn_ends": [round(e, 3) for e in ends],
+        }
+    return result, audio, recorded
+
+
+def write_case(corpus: Path, name: str, audio, turns: list[tuple[float, float]], source: Path) -> Path:
+    """Grava o áudio e as decisões registradas no formato de corpus do vad_bench."""
+    import wave
+    import numpy as np
+    from vad_bench import SAMPLE_RATE
+
+    corpus.mkdir(parents=True, exist_ok=True)
+    wav = corpus / f"{name}.wav"
+    with wave.open(str(wav), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+    # Rótulos = o que o VAD decidiu em campo; revise antes de usar como gabarito
+    wav.with_suffix(".json").write_text(json.dumps(
+        {"turns": turns, "source": str(source), "reviewed": False}, indent=2), encoding="utf-8")
+    return wav
+
+
+def main(argv: list[str] | None = None) -> int:
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Capturas de áudio das salas (ring buffer)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_info = sub.add_parser("info", help="resumo de uma captura")
+    p_info.add_argument("ring", type=Path)
+    p_replay = sub.add_parser("replay", help="reproduz a captura pelo VAD/endpointing offline")
+    p_replay.add_argument("ring", type=Path)
+    p_replay.add_argument("--profiles", nargs="+", default=["quiet", "moderate", "noisy"])
+    p_replay.add_argument("--out", type=Path, help="grava o resultado em JSON")
+    p_replay.add_argument("--corpus", type=Path, help="salva como caso do vad_bench nesta pasta")
+    p_replay.add_argument("--name", help="nome do caso (padrão: sala + data)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    if args.cmd == "info":
+        meta, records = read_ring(args.ring)
+        counts = {KIND_IN: 0, KIND_OUT: 0, KIND_VAD: 0}
+        seconds = {KIND_IN: 0.0, KIND_OUT: 0.0}
+        first = last = None
+        for rec in records:
+            counts[rec.kind] = counts.get(rec.kind, 0) + 1
+            if rec.kind in seconds and rec.sample_rate:
+                seconds[rec.kind] += rec.samples / rec.sample_rate
+            first = rec.ts if first is None else first
+            last = rec.ts
+        print(json.dumps({
+            **meta,
+            "span_seconds": round((last or 0) - (first or 0), 1),
+            "input_seconds": round(seconds[KIND_IN], 1),
+            "output_seconds": round(seconds[KIND_OUT], 1),
+            "vad_decisions": counts[KIND_VAD],
+        }, indent=2, ensure_ascii=False))
+        return 0
+
+    result, audio, recorded = asyncio.run(replay(args.ring, args.profiles))
+    print(f"Sala {result['room']}: {result['audio_seconds']} s de entrada, "
+          f"{len(recorded)} falas registradas pelo VAD em campo")
+    for name, r in result["profiles"].items():
+        print(f"  {name:<10} falas detectadas: {len(r['speech_segments']):>3}  fins de turno: {len(r['turn_ends']):>3}")
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"Resultado gravado em {args.out}")
+    if args.corpus:
+        name = args.name or f"{result['room']}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(result['created']))}"
+        wav = write_case(args.corpus, name, audio, recorded, args.ring)
+        print(f"Caso de regressão gravado em {wav} (revise os turnos em {wav.with_suffix('.json').name})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
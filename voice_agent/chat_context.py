@@ -0,0 +1,198 @@
+# chat_context.py - Contexto de conversa limitado para sessões longas
+#
+# No quiosque a sessão fica de pé o dia inteiro (close_on_disconnect=False) e
+# o chat_ctx do Assistant crescia sem limite de visitante em visitante: mais
+# tokens de entrada a cada turno, mais latência e mais memória. O
+# ContextWindow mantém só os últimos N turnos literais; os mais antigos viram
+# um resumo corrido (mensagem de sistema). Depois de um tempo sem ninguém
+# falar, o contexto volta ao zero: é outro visitante.
+#
+#   CONTEXT_MAX_TURNS=8            turnos do usuário mantidos na íntegra
+#   CONTEXT_IDLE_RESET=120         segundos de silêncio até zerar (0 desliga)
+#   CONTEXT_SUMMARY_MODEL=gpt-4o-mini   modelo de texto do resumo ("" = só extrativo)
+#   CONTEXT_SUMMARY_MAX_CHARS=1200
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any
+
+from turn_metrics import registry
+
+log = logging.getLogger("chat-context")
+
+SUMMARY_ID = "agrinho_context_summary"
+SUMMARY_PREFIX = "Resumo da conversa anterior com este visitante: "
+SUMMARY_INSTRUCTIONS = (
+    "Resuma a conversa abaixo entre um visitante e o assistente de voz em português, em até "
+    "{chars} caracteres. Guarde nome, interesses, perguntas feitas e o que já foi respondido. "
+    "Sem introdução, só o resumo."
+)
+
+
+def _is_message(item: Any, *roles: str) -> bool:
+    return getattr(item, "type", "message") == "message" and getattr(item, "role", None) in roles
+
+
+def _text(item: Any) -> str:
+    return (getattr(item, "text_content", None) or "").strip()
+
+
+class ContextWindow:
+    def __init__(self, session: Any, agent: Any, persona: str, room: str = "") -> None:
+        self.session = session
+        self.agent = agent
+        self.persona = persona
+        self.room = room  # gauges por sala: várias salas da mesma persona no mesmo processo
+        self.max_turns = int(os.getenv("CONTEXT_MAX_TURNS", "8"))
+        self.idle_reset = float(os.getenv("CONTEXT_IDLE_RESET", "120"))
+        self.summary_model = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+        self.summary_max_chars = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "1200"))
+        self.summary = ""
+        self._last_activity = time.monotonic()
+        self._dirty = False  # houve conversa desde o último reset
+        self._tokens = 0  # tokens do texto do contexto, somados item a item
+        self._compact_task: asyncio.Task | None = None
+        self._idle_task: asyncio.Task | None = None
+        self._llm = None
+
+    def start(self) -> None:
+        self.session.on("conversation_item_added", self._on_item)
+        self.session.on("user_state_changed", self._on_user_state)
+        if self.idle_reset > 0:
+            self._idle_task = asyncio.create_task(self._idle_loop(), name="context-idle")
+        self._recount()
+
+    async def aclose(self) -> None:
+        self.session.off("conversation_item_added", self._on_item)
+        self.session.off("user_state_changed", self._on_user_state)
+        for task in (self._idle_task, self._compact_task):
+            if task is not None and not task.done():
+                task.cancel()
+        for name in ("agrinho_chat_context_items", "agrinho_chat_context_tokens"):
+            registry.remove_gauges(name, persona=self.persona, room=self.room)
+
+    # --- eventos ---
+
+    def _on_user_state(self, ev: Any) -> None:
+        self._last_activity = time.monotonic()
+
+    def _on_item(self, ev: Any) -> None:
+        self._last_activity = time.monotonic()
+        self._dirty = True
+        if getattr(ev.item, "type", "message") == "message":
+            from prompts import count_tokens
+
+            self._tokens += count_tokens(_text(ev.item))  # só o item novo, não o contexto todo
+        self._publish_size()
+        # Compacta depois da resposta do agente, fora do caminho do turno
+        if _is_message(ev.item, "assistant") and self._user_turns() > self.max_turns:
+            if self._compact_task is None or self._compact_task.done():
+                self._compact_task = asyncio.create_task(self._compact(), name="context-compact")
+
+    # --- tamanho ---
+
+    def _user_turns(self) -> int:
+        return sum(1 for item in self.agent.chat_ctx.items if _is_message(item, "user"))
+
+    def _recount(self) -> None:
+        """Recontagem completa: só quando o contexto é trocado (compactação, reset)."""
+        from prompts import count_tokens
+
+        self._tokens = sum(count_tokens(_text(i)) for i in self.agent.chat_ctx.items
+                           if getattr(i, "type", "message") == "message")
+        self._publish_size()
+
+    def _publish_size(self) -> None:
+        registry.set_gauge("agrinho_chat_context_items", len(self.agent.chat_ctx.items),
+                           persona=self.persona, room=self.room)
+        registry.set_gauge("agrinho_chat_context_tokens", self._tokens, persona=self.persona, room=self.room)
+
+    # --- compactação ---
+
+    async def _compact(self) -> None:
+        items = list(self.agent.chat_ctx.items)
+        user_idx = [i for i, item in enumerate(items) if _is_message(item, "user")]
+        if len(user_idx) <= self.max_turns:
+            return
+        cut = user_idx[-self.max_turns]
+        # Instruções ficam; nosso resumo anterior é refeito junto com os turnos antigos
+        system = [it for it in items if _is_message(it, "system", "developer") and it.id != SUMMARY_ID]
+        old = [it for it in items[:cut] if _is_message(it, "user", "assistant")]
+        kept_ids = {it.id for it in items[cut:]}
+
+        t0 = time.perf_counter()
+        summary = await self._summarize(old)
+        # A conversa pode ter andado enquanto o resumo era gerado: recorta sobre o contexto atual
+        seen_ids = {it.id for it in items}
+        recent = [it for it in self.agent.chat_ctx.items if it.id in kept_ids or
+                  (it.id not in seen_ids and not _is_message(it, "system", "developer"))]
+        await self._replace(system, summary, recent)
+        registry.inc("agrinho_context_summaries_total", persona=self.persona)
+        log.info("🗜️ Contexto compactado: %d mensagens antigas → resumo de %d caracteres (%.0f ms)",
+                 len(old), len(summary), (time.perf_counter() - t0) * 1000)
+
+    async def _summarize(self, old: list[Any]) -> str:
+        transcript = "\n".join(f"{'Visitante' if it.role == 'user' else 'Assistente'}: {_text(it)}"
+                               for it in old if _text(it))
+        if self.summary:
+            transcript = f"{SUMMARY_PREFIX}{self.summary}\n{transcript}"
+        if self.summary_model:
+            try:
+                self.summary = await self._llm_summary(transcript)
+                return self.summary
+            except Exception as e:
+                log.warning("⚠️ Resumo via %s falhou (%s); usando resumo extrativo.", self.summary_model, e)
+        # Extrativo: as últimas falas cabem no limite
+        self.summary = transcript[-self.summary_max_chars:]
+        return self.summary
+
+    async def _llm_summary(self, transcript: str) -> str:
+        from livekit.agents.llm import ChatContext
+        from livekit.plugins import openai
+
+        if self._llm is None:
+            self._llm = openai.LLM(model=self.summary_model)
+        ctx = ChatContext.empty()
+        ctx.add_message(role="system", content=SUMMARY_INSTRUCTIONS.format(chars=self.summary_max_chars))
+        ctx.add_message(role="user", content=transcript)
+        parts: list[str] = []
+        async with self._llm.chat(chat_ctx=ctx) as stream:
+            async for chunk in stream:
+                if chunk.delta and chunk.delta.content:
+                    parts.append(chunk.delta.content)
+        return "".join(parts).strip()[: self.summary_max_chars]
+
+    async def _replace(self, system: list[Any], summary: str, recent: list[Any]) -> None:
+        from livekit.agents.llm import ChatContext
+
+        ctx = ChatContext.empty()
+        ctx.items.extend(system)
+        if summary:
+            ctx.add_message(role="system", content=SUMMARY_PREFIX + summary, id=SUMMARY_ID)
+        ctx.items.extend(recent)
+        await self.agent.update_chat_ctx(ctx)
+        self._recount()
+
+    # --- visitante novo ---
+
+    async def _idle_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(10.0, self.idle_reset))
+            idle = time.monotonic() - self._last_activity
+            if (self._dirty and idle >= self.idle_reset
+                    and getattr(self.session, "agent_state", "listening") == "listening"):
+                await self.reset(reason=f"{idle:.0f}s sem conversa")
+
+    async def reset(self, reason: str = "") -> None:
+        """Volta o contexto às instruções da persona (novo visitante)."""
+        if self._compact_task is not None and not self._compact_task.done():
+            self._compact_task.cancel()
+        system = [it for it in self.agent.chat_ctx.items
+                  if _is_message(it, "system", "developer") and it.id != SUMMARY_ID]
+        self.summary = ""
+        self._dirty = False
+        await self._replace(system, "", [])
+        registry.inc("agrinho_context_resets_total", persona=self.persona)
+        log.info("🧹 Contexto zerado para um novo visitante (%s)", reason)
@@ -0,0 +1,193 @@
+# greeting_cache.py - Saudação pré-renderizada (áudio em cache local)
+#
+# A saudação é sempre a mesma frase, mas passava pelo modelo realtime a cada
+# sessão — e é a primeira coisa que o visitante espera ouvir. Aqui ela é
+# sintetizada uma vez por combinação (VOICE, GREETING, persona) com o TTS da
+# OpenAI, gravada como PCM 16-bit em .cache/greetings/ e publicada direto na
+# sala com `session.say(..., audio=...)`. O texto entra no contexto do
+# Assistant para o modelo saber que já cumprimentou.
+#
+# A chave é um hash de voz + texto + persona + modelo de TTS: trocar qualquer
+# um deles gera outro arquivo, e o anterior do mesmo "slot" (a saudação, ou
+# cada resposta do answer_cache) daquela persona é apagado.
+#
+#   GREETING_AUDIO_CACHE=true        desliga com false (volta ao generate_reply)
+#   GREETING_TTS_MODEL=gpt-4o-mini-tts
+#   GREETING_CACHE_DIR=              padrão: voice_agent/.cache/greetings
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+log = logging.getLogger("greeting-cache")
+
+_FORMAT_VERSION = 1
+
+
+def enabled() -> bool:
+    return os.getenv("GREETING_AUDIO_CACHE", "true").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _cache_dir() -> Path:
+    return Path(os.getenv("GREETING_CACHE_DIR") or Path(__file__).resolve().parent / ".cache" / "greetings")
+
+
+def _tts_model() -> str:
+    return os.getenv("GREETING_TTS_MODEL", "gpt-4o-mini-tts")
+
+
+def greeting_key(voice: str, greeting: str, persona: str) -> str:
+    raw = json.dumps([_FORMAT_VERSION, _tts_model(), voice, greeting, persona], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+@dataclass
+class GreetingAudio:
+    text: str
+    pcm: bytes
+    sample_rate: int
+    num_channels: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (2 * self.num_channels * self.sample_rate)
+
+    async def frames(self, frame_ms: int = 20) -> AsyncIterator[Any]:
+        """Frames de áudio prontos para `session.say(audio=...)`."""
+        from livekit import rtc
+
+        samples = self.sample_rate * frame_ms // 1000
+        step = samples * self.num_channels * 2
+        for i in range(0, len(self.pcm), step):
+            chunk = self.pcm[i: i + step]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+
+def load_cached(voice: str, greeting: str, persona: str) -> GreetingAudio | None:
+    key = greeting_key(voice, greeting, persona)
+    base = _cache_dir()
+    try:
+        meta = json.loads((base / f"{key}.json").read_text(encoding="utf-8"))
+        pcm = (base / f"{key}.pcm").read_bytes()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("⚠️ Saudação em cache ilegível (%s): %s", key, e)
+        return None
+    if meta.get("bytes", len(pcm)) != len(pcm):
+        log.warning("⚠️ Saudação em cache incompleta (%s); renderizando de novo.", key)
+        return None
+    return GreetingAudio(greeting, pcm, meta["sample_rate"], meta["num_channels"])
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Grava num temporário único (vários workers renderizam ao mesmo tempo) e renomeia."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False) as f:
+        tmp = Path(f.name)
+        try:
+            f.write(data)
+        except BaseException:
+            f.close()
+            tmp.unlink(missing_ok=True)
+            raise
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _save(voice: str, greeting: str, persona: str, audio: GreetingAudio, slot: str) -> None:
+    key = greeting_key(voice, greeting, persona)
+    base = _cache_dir()
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        # Versões antigas deste slot/persona (voz/texto anteriores) deixam de valer
+        for old in base.glob("*.json"):
+            if old.stem == key:
+                continue
+            try:
+                meta = json.loads(old.read_text(encoding="utf-8"))
+                if meta.get("persona") == persona and meta.get("slot", "greeting") == slot:
+                    old.unlink(missing_ok=True)
+                    old.with_suffix(".pcm").unlink(missing_ok=True)
+            except Exception:
+                pass
+        # PCM primeiro; o JSON (com o tamanho do PCM) por último é o que torna a entrada válida
+        _write_atomic(base / f"{key}.pcm", audio.pcm)
+        _write_atomic(base / f"{key}.json", json.dumps({
+            "voice": voice, "greeting": greeting, "persona": persona, "slot": slot, "model": _tts_model(),
+            "sample_rate": audio.sample_rate, "num_channels": audio.num_channels,
+            "bytes": len(audio.pcm), "rendered_at": time.time(),
+        }, ensure_ascii=False, indent=2).encode("utf-8"))
+    except OSError as e:
+        log.warning("⚠️ Não foi possível gravar a saudação em %s: %s", base, e)
+
+
+async def render(voice: str, greeting: str, persona: str, slot: str = "greeting") -> GreetingAudio:
+    """Sintetiza o texto com o TTS da OpenAI e grava no cache."""
+    from livekit.plugins import openai
+
+    t0 = time.perf_counter()
+    tts = openai.TTS(model=_tts_model(), voice=voice)
+    chunks: list[bytes] = []
+    sample_rate, num_channels = tts.sample_rate, tts.num_channels
+    try:
+        async for ev in tts.synthesize(greeting):
+            chunks.append(bytes(ev.frame.data))
+            sample_rate, num_channels = ev.frame.sample_rate, ev.frame.num_channels
+    finally:
+        await tts.aclose()
+    audio = GreetingAudio(greeting, b"".join(chunks), sample_rate, num_channels)
+    _save(voice, greeting, persona, audio, slot)
+    log.info("🎙️ Áudio '%s' renderizado em %.0f ms (%.1f s de áudio, voz %s)",
+             slot, (time.perf_counter() - t0) * 1000, audio.duration, voice)
+    return audio
+
+
+async def get_greeting_audio(voice: str, greeting: str, persona: str, slot: str = "greeting") -> GreetingAudio | None:
+    """Áudio do cache; renderiza se faltar. None se desativado ou se a síntese falhou."""
+    if not enabled() or not greeting:
+        return None
+    audio = load_cached(voice, greeting, persona)
+    if audio is not None:
+        log.debug("♻️ Áudio '%s' em cache (%.1f s)", slot, audio.duration)
+        return audio
+    try:
+        return await render(voice, greeting, persona, slot)
+    except Exception as e:
+        log.warning("⚠️ Falha ao renderizar o áudio '%s' (%s); usando o modelo realtime.", slot, e)
+        return None
+
+
+async def speak_greeting(session: Any, agent: Any, greeting: str, audio: GreetingAudio | None) -> None:
+    """
+    Toca a saudação pré-renderizada e registra o texto no contexto do agente.
+
+    Sem áudio em cache, cai no caminho antigo: o modelo realtime gera a fala.
+    """
+    if audio is None:
+        await session.generate_reply(instructions=greeting)
+        return
+    await say_prerendered(session, agent, greeting, audio)
+
+
+async def say_prerendered(session: Any, agent: Any, text: str, audio: GreetingAudio) -> Any:
+    """Publica o áudio pronto na sala e registra o texto como fala do agente."""
+    handle = session.say(text, audio=audio.frames(), add_to_chat_ctx=False)
+    # O modelo realtime não ouviu essa fala: injeta o texto no contexto
+    chat_ctx = agent.chat_ctx.copy()
+    chat_ctx.add_message(role="assistant", content=text)
+    await agent.update_chat_ctx(chat_ctx)
+    return handle
@@ -0,0 +1,106 @@
+# init_graph.py - Inicialização do agente como um pequeno grafo de dependências
+#
+# Cada etapa declara de quais outras depende; etapas independentes (ex.:
+# descoberta do MCP, conexão com a sala e carga do VAD) rodam em paralelo.
+# Uma etapa com `fallback` que falha não derruba a inicialização: o valor de
+# fallback é usado no lugar (ex.: sem MCP → lista vazia de tools).
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from startup_profile import profile
+
+log = logging.getLogger("init")
+
+_REQUIRED = object()
+
+
+@dataclass
+class Step:
+    """
+    Uma etapa da inicialização.
+
+    `fn` recebe como argumentos nomeados os resultados das etapas em `deps`
+    e devolve um awaitable. Sem `fallback`, uma falha aborta o grafo inteiro.
+    """
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    deps: tuple[str, ...] = ()
+    fallback: Any = field(default=_REQUIRED, repr=False)
+
+
+class InitError(RuntimeError):
+    def __init__(self, step: str, cause: BaseException):
+        super().__init__(f"etapa '{step}' falhou: {cause}")
+        self.step = step
+        self.cause = cause
+
+
+async def run_graph(steps: list[Step], label: str = "init") -> dict[str, Any]:
+    """Executa as etapas respeitando as dependências; devolve {nome: resultado}."""
+    by_name = {s.name: s for s in steps}
+    for s in steps:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"etapa '{s.name}' depende de etapas inexistentes: {missing}")
+
+    t0 = time.perf_counter()
+    spans: dict[str, tuple[float, float]] = {}
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def _run(step: Step) -> Any:
+        deps = {d: await tasks[d] for d in step.deps}
+        start = time.perf_counter()
+        try:
+            return await step.fn(**deps)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if step.fallback is _REQUIRED:
+                raise InitError(step.name, e) from e
+            log.warning("⚠️ [%s] %s falhou (%s); seguindo com fallback.", label, step.name, e)
+            return step.fallback
+        finally:
+            end = time.perf_counter()
+            spans[step.name] = (start, end)
+            profile.record(step.name, start, end - start)
+            log.info("⏱️ [%s] %s: %.0f ms", label, step.name, (end - start) * 1000)
+
+    # Cria as tasks em ordem topológica para que as dependências já existam
+    pending = list(steps)
+    while pending:
+        ready = [s for s in pending if all(d in tasks for d in s.deps)]
+        if not ready:
+            raise ValueError(f"dependência circular entre: {[s.name for s in pending]}")
+        for s in ready:
+            tasks[s.name] = asyncio.create_task(_run(s), name=f"{label}-{s.name}")
+            pending.remove(s)
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    log.info("⏱️ [%s] total: %.0f ms | caminho crítico: %s",
+             label, (time.perf_counter() - t0) * 1000, _critical_path(by_name, spans))
+    return {name: t.result() for name, t in tasks.items()}
+
+
+def _critical_path(steps: dict[str, Step], spans: dict[str, tuple[float, float]]) -> str:
+    """Da etapa que terminou por último, volta sempre pela dependência mais lenta."""
+    if not spans:
+        return "-"
+    current: str | None = max(spans, key=lambda n: spans[n][1])
+    path: list[str] = []
+    while current is not None:
+        start, end = spans[current]
+        path.append(f"{current} ({(end - start) * 1000:.0f} ms)")
+        deps = [d for d in steps[current].deps if d in spans]
+        current = max(deps, key=lambda d: spans[d][1]) if deps else None
+    return " → ".join(reversed(path))
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+loadtest.py - Quantas sessões do Agrinho um core aguenta?
+
+Sobe N sessões com a mesma montagem do agent.py (Assistant + AgentSession
+com Silero VAD local, TurnTracker, ContextWindow, VAD adaptativo e tools do
+MCP), cada uma com um participante sintético falando um WAV gravado em tempo
+real. Nada sai da máquina:
+
+  - o modelo realtime é um fake local que responde com áudio enlatado depois
+    de uma latência configurável (e chama uma tool a cada --tool-every turnos)
+  - o servidor MCP é um stand-in stdio (este mesmo arquivo, `mcp-stub`)
+  - a saída de áudio "toca" em tempo real, como a sala faria
+
+Para cada N reporta CPU por sessão, RSS, atraso do event loop e percentis
+da latência de turno (fim da fala → primeiro áudio), para dimensionar hosts.
+
+Uso:
+    python loadtest.py fala.wav --sessions 1 2 4 8 16 --duration 60
+    python loadtest.py fala.wav --sessions 4 8 --model-latency 0.8 --pin-cpu 0 --out carga.json
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+STUB_TOOL = "consulta_safra"
+
+
+# --- Stand-in do servidor MCP (processo filho, stdio) ---
+
+def run_mcp_stub(latency: float) -> None:
+    from mcp.server.fastmcp import FastMCP
+
+    server = FastMCP("agrinho-loadtest")
+
+    @server.tool(name=STUB_TOOL, description="Consulta a previsão de safra de uma cultura (stand-in de carga).")
+    async def consulta_safra(cultura: str = "milho") -> str:
+        await asyncio.sleep(latency)
+        return f"Previsão de safra para {cultura}: dentro da média da região."
+
+    server.run("stdio")
+
+
+# --- Modelo realtime fake, participante sintético e saída em tempo real ---
+# (definidos numa função: só importam o livekit quando o teste roda)
+
+def _build_fakes():
+    from livekit import rtc
+    from livekit.agents import llm, utils
+    from livekit.agents.types import NOT_GIVEN
+    from livekit.agents.voice import io
+
+    class FakeRealtimeModel(llm.RealtimeModel):
+        """Responde cada turno com o mesmo áudio, depois de `latency` ± `jitter` segundos."""
+
+        def __init__(self, reply: np.ndarray, reply_rate: int, latency: float, jitter: float, tool_every: int):
+            super().__init__(capabilities=llm.RealtimeCapabilities(
+                message_truncation=True, turn_detection=False, user_transcription=True,
+                auto_tool_reply_generation=False, audio_output=True, manual_function_calls=True,
+            ))
+            step = reply_rate * FRAME_MS // 1000
+            self.frames = [
+                rtc.AudioFrame(data=reply[i: i + step].tobytes(), sample_rate=reply_rate,
+                               num_channels=1, samples_per_channel=step)
+                for i in range(0, len(reply) - step + 1, step)
+            ]
+            self.latency = latency
+            self.jitter = jitter
+            self.tool_every = tool_every
+
+        @property
+        def model(self) -> str:
+            return "fake-realtime"
+
+        def session(self) -> "FakeRealtimeSession":
+            return FakeRealtimeSession(self)
+
+        async def aclose(self) -> None:
+            pass
+
+    class FakeRealtimeSession(llm.RealtimeSession):
+        def __init__(self, model: FakeRealtimeModel):
+            super().__init__(model)
+            self._model = model
+            self._chat_ctx = llm.ChatContext.empty()
+            self._tools: list = []
+            self._gen_task: asyncio.Task | None = None
+            self._replies = 0
+            self.bytes_in = 0
+
+        @property
+        def chat_ctx(self):
+            return self._chat_ctx.copy()
+
+        @property
+        def tools(self):
+            return llm.ToolContext(self._tools)
+
+        async def update_instructions(self, instructions: str) -> None:
+            pass
+
+        async def update_chat_ctx(self, chat_ctx) -> None:
+            self._chat_ctx = chat_ctx.copy()
+
+        async def update_tools(self, tools) -> None:
+            self._tools = list(tools)
+
+        def update_options(self, *, tool_choice=NOT_GIVEN) -> None:
+            pass
+
+        def push_audio(self, frame) -> None:
+            self.bytes_in += len(frame.data) * 2
+
+        def push_video(self, frame) -> None:
+            pass
+
+        def commit_audio(self) -> None:
+            pass
+
+        def clear_audio(self) -> None:
+            pass
+
+        def generate_reply(self, *, instructions=NOT_GIVEN) -> asyncio.Future:
+            fut = asyncio.get_running_loop().create_future()
+            self._gen_task = asyncio.create_task(self._generate(fut))
+            return fut
+
+        def _wants_tool(self) -> bool:
+            items = self._chat_ctx.items
+            answering_tool = bool(items) and items[-1].type == "function_call_output"
+            has_tool = any(getattr(t, "info", None) and t.info.name == STUB_TOOL for t in self._tools)
+            return (not answering_tool and has_tool and self._model.tool_every > 0
+                    and self._replies % self._model.tool_every == 0)
+
+        async def _generate(self, fut: asyncio.Future) -> None:
+            message_ch = utils.aio.Chan()
+            function_ch = utils.aio.Chan()
+            text_ch = utils.aio.Chan()
+            audio_ch = utils.aio.Chan()
+            fut.set_result(llm.GenerationCreatedEvent(
+                message_stream=message_ch, function_stream=function_ch, user_initiated=True,
+                response_id=utils.shortuuid("resp_"),
+            ))
+            self._replies += 1
+            try:
+                await asyncio.sleep(max(0.0, self._model.latency + random.uniform(-1, 1) * self._model.jitter))
+                if self._wants_tool():
+                    function_ch.send_nowait(llm.FunctionCall(
+                        call_id=utils.shortuuid("call_"), name=STUB_TOOL, arguments=json.dumps({"cultura": "milho"}),
+                    ))
+                    return
+                modalities = asyncio.get_running_loop().create_future()
+                modalities.set_result(["audio", "text"])
+                message_ch.send_nowait(llm.MessageGeneration(
+                    message_id=utils.shortuuid("msg_"), text_stream=text_ch, audio_stream=audio_ch,
+                    modalities=modalities,
+                ))
+                text_ch.send_nowait("Resposta de teste de carga.")
+                # Como o modelo real: o áudio chega mais rápido que o tempo real
+                for frame in self._model.frames:
+                    audio_ch.send_nowait(frame)
+                    await asyncio.sleep(0)
+            finally:
+                for ch in (text_ch, audio_ch, message_ch, function_ch):
+                    ch.close()
+
+        def interrupt(self) -> None:
+            if self._gen_task is not None and not self._gen_task.done():
+                self._gen_task.cancel()
+
+        def truncate(self, *, message_id, modalities, audio_end_ms, audio_transcript=NOT_GIVEN) -> None:
+            pass
+
+        async def aclose(self) -> None:
+            self.interrupt()
+
+    class SyntheticParticipant(io.AudioInput):
+        """
+        Visitante sintético: fala o WAV, espera o agente responder (ou desistir)
+        e pensa `think` segundos antes de falar de novo. Frames no ritmo do relógio.
+        """
+
+        def __init__(self, speech: np.ndarray, session, think: float, max_wait: float):
+            super().__init__(label="LoadTest")
+            self._speech = [speech[i: i + FRAME_SAMPLES].tobytes()
+                            for i in range(0, len(speech) - FRAME_SAMPLES + 1, FRAME_SAMPLES)]
+            self._silence = bytes(FRAME_SAMPLES * 2)
+            self._session = session
+            self._think = think
+            self._max_wait = max_wait
+            self._script = self._frames()
+            self._t0: float | None = None
+            self._n = 0
+            self.bytes_out = 0
+
+        def _frames(self):
+            frame_s = FRAME_MS / 1000
+            # Começo desencontrado: as sessões não falam todas ao mesmo tempo
+            for _ in range(int(random.uniform(0, self._think + 1) / frame_s)):
+                yield self._silence
+            while True:
+                yield from self._speech
+                spoke, waited = False, 0.0
+                while waited < self._max_wait:
+                    state = self._session.agent_state
+                    if state == "speaking":
+                        spoke = True
+                    elif spoke and state == "listening":
+                        break
+                    yield self._silence
+                    waited += frame_s
+                for _ in range(int(self._think / frame_s)):
+                    yield self._silence
+
+        async def __anext__(self):
+            if self._t0 is None:
+                self._t0 = time.monotonic()
+            self._n += 1
+            delay = self._t0 + self._n * FRAME_MS / 1000 - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            data = next(self._script)
+            self.bytes_out += len(data)
+            return rtc.AudioFrame(data=data, sample_rate=SAMPLE_RATE, num_channels=1,
+                                  samples_per_channel=FRAME_SAMPLES)
+
+    class PacedAudioOutput(io.AudioOutput):
+        """Saída que 'toca' em tempo real: playback_finished quando o áudio terminaria na sala."""
+
+        def __init__(self):
+            super().__init__(label="LoadTest", capabilities=io.AudioOutputCapabilities(pause=False))
+            self._play_until = 0.0
+            self._segment = 0.0      # duração do segmento aberto
+            self._open = False
+            self._pending: list[tuple[asyncio.Task, float]] = []
+            self.bytes_in = 0
+
+        async def capture_frame(self, frame) -> None:
+            await super().capture_frame(frame)
+            self._play_until = max(self._play_until, time.monotonic()) + frame.duration
+            self._segment += frame.duration
+            self._open = True
+            self.bytes_in += len(frame.data) * 2
+
+        def flush(self) -> None:
+            super().flush()
+            if not self._open:
+                return
+            duration, self._segment, self._open = self._segment, 0.0, False
+            task = asyncio.create_task(self._finish(self._play_until, duration))
+            self._pending.append((task, duration))
+
+        async def _finish(self, until: float, duration: float) -> None:
+            await asyncio.sleep(max(0.0, until - time.monotonic()))
+            self._pending = [(t, d) for t, d in self._pending if t is not asyncio.current_task()]
+            self.on_playback_finished(playback_position=duration, interrupted=False)
+
+        def clear_buffer(self) -> None:
+            now = time.monotonic()
+            for task, duration in self._pending:
+                task.cancel()
+                self.on_playback_finished(playback_position=0.0, interrupted=True)
+            self._pending = []
+            if self._open:
+                self._open, self._segment = False, 0.0
+                self.on_playback_finished(playback_position=0.0, interrupted=True)
+            self._play_until = now
+
+    return FakeRealtimeModel, SyntheticParticipant, PacedAudioOutput
+
+
+# --- Medição ---
+
+def _pcts(values: list[float], scale: float = 1000.0) -> dict:
+    if not values:
+        return {"n": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    arr = np.asarray(values) * scale
+    return {"n": len(values), "p50": round(float(np.percentile(arr, 50)), 1),
+            "p95": round(float(np.percentile(arr, 95)), 1), "p99": round(float(np.percentile(arr, 99)), 1),
+            "max": round(float(arr.max()), 1)}
+
+
+def _raw_registry():
+    from turn_metrics import MetricsRegistry
+
+    class RawRegistry(MetricsRegistry):
+        """Registry que também guarda as latências brutas (percentis exatos no relatório)."""
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.raw: dict[str, list[float]] = {}
+
+        def observe(self, name: str, value: float, **labels: str) -> None:
+            super().observe(name, value, **labels)
+            if name == "agrinho_turn_latency_seconds":
+                self.raw.setdefault(labels.get("stage", ""), []).append(value)
+
+    return RawRegistry()
+
+
+# --- Execução ---
+
+async def run_step(n: int, speech: np.ndarray, args: argparse.Namespace, fakes, vad, mcp_tools) -> dict:
+    """N sessões simultâneas por `args.duration` segundos."""
+    from livekit.agents import AgentSession
+    from agent import Assistant
+    from prompts import get_prompt
+    from vad_config import VADConfig, vad_silence_duration
+    from turn_metrics import TurnTracker
+    from chat_context import ContextWindow
+    from session_usage import LoopLag, rss_mb
+
+    FakeRealtimeModel, SyntheticParticipant, PacedAudioOutput = fakes
+    reply = (np.clip(speech[: int(args.reply_seconds * SAMPLE_RATE)], -1, 1) * 0.5 * 32767).astype(np.int16)
+    metrics = _raw_registry()
+    sessions = []
+    lag = LoopLag(interval=0.05)
+
+    for i in range(n):
+        model = FakeRealtimeModel(reply, SAMPLE_RATE, args.model_latency, args.model_jitter, args.tool_every)
+        session = AgentSession(
+            llm=model, vad=vad, allow_interruptions=True, turn_detection="vad",
+            **VADConfig.get_config(args.profile),
+        )
+        tracker = TurnTracker(session, persona="LOADTEST", vad_profile=args.profile,
+                              eos_offset=vad_silence_duration(vad), metrics=metrics)
+        agent = Assistant(get_prompt(args.persona), tools=mcp_tools)
+        participant = SyntheticParticipant((speech * 32767).astype(np.int16), session, args.think, args.max_wait)
+        output = PacedAudioOutput()
+        session.input.audio = participant
+        session.output.audio = output
+        await session.start(agent=agent)
+        context = ContextWindow(session, agent, "LOADTEST", room=f"loadtest-{i}")
+        context.start()
+        sessions.append((session, tracker, context, participant, output))
+
+    lag.start()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    rss0 = rss_mb()
+    await asyncio.sleep(args.duration)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    rss = rss_mb()
+    lag.stop()
+
+    bytes_in = sum(p.bytes_out for *_, p, _ in sessions)
+    bytes_out = sum(o.bytes_in for *_, o in sessions)
+    for session, _, context, *_ in sessions:
+        await context.aclose()
+        await session.aclose()
+
+    eot = metrics.raw.get("eos_to_first_audio", [])
+    return {
+        "sessions": n,
+        "seconds": round(wall, 1),
+        "cpu_percent": round(100 * cpu / wall, 1),
+        "cpu_percent_per_session": round(100 * cpu / wall / n, 2),
+        "rss_mb": round(rss, 1),
+        "rss_mb_delta": round(rss - rss0, 1),
+        "loop_lag_ms": _pcts(lag.samples),
+        "eos_to_first_audio_ms": _pcts(eot),
+        "eos_to_endpoint_ms": _pcts(metrics.raw.get("eos_to_endpoint", [])),
+        "turns": len(eot),
+        "turns_per_session_minute": round(len(eot) / n / (wall / 60), 2) if wall else 0.0,
+        "audio_in_kbps": round(bytes_in * 8 / 1000 / wall, 1),
+        "audio_out_kbps": round(bytes_out * 8 / 1000 / wall, 1),
+    }
+
+
+def print_table(steps: list[dict]) -> None:
+    def fmt(v):
+        return "-" if v is None else f"{v:.0f}"
+
+    header = (f"{'N':>4} {'CPU%':>6} {'CPU%/s':>7} {'RSS MB':>7} {'lag p95':>8} {'lag max':>8} "
+              f"{'turnos':>7} {'EoT p50':>8} {'EoT p95':>8} {'EoT p99':>8}")
+    print(header)
+    print("-" * len(header))
+    for s in steps:
+        lag, eot = s["loop_lag_ms"], s["eos_to_first_audio_ms"]
+        print(f"{s['sessions']:>4} {s['cpu_percent']:>6.1f} {s['cpu_percent_per_session']:>7.2f} {s['rss_mb']:>7.0f} "
+              f"{fmt(lag['p95']):>8} {fmt(lag['max']):>8} {s['turns']:>7} {fmt(eot['p50']):>8} "
+              f"{fmt(eot['p95']):>8} {fmt(eot['p99']):>8}")
+    print("\nEoT = fim da fala do visitante → primeiro áudio do agente (ms); lag = atraso do event loop (ms).")
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    from vad_bench import read_wav
+    from vad_config import load_vad
+    from mcp_bridge import build_livekit_tools_from_mcp, aclose_mcp
+
+    speech = read_wav(args.speech)
+    vad = await asyncio.to_thread(load_vad)
+    if vad is None:
+        raise RuntimeError("Silero VAD indisponível")
+    fakes = _build_fakes()
+    mcp_tools = await build_livekit_tools_from_mcp() if args.tool_every > 0 else []
+    logging.info("🔧 Tools do stand-in MCP: %d", len(mcp_tools))
+    steps = []
+    try:
+        for n in args.sessions:
+            logging.info("🏋️ %d sessão(ões) por %.0f s...", n, args.duration)
+            step = await run_step(n, speech, args, fakes, vad, mcp_tools)
+            logging.info("   CPU %.1f%% | lag p95 %s ms | EoT p95 %s ms", step["cpu_percent"],
+                         step["loop_lag_ms"]["p95"], step["eos_to_first_audio_ms"]["p95"])
+            steps.append(step)
+            await asyncio.sleep(2)  # deixa as sessões fecharem antes do próximo degrau
+    finally:
+        await aclose_mcp()
+    return steps
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["mcp-stub"]:
+        stub = argparse.ArgumentParser()
+        stub.add_argument("--latency", type=float, default=0.3)
+        run_mcp_stub(stub.parse_args(argv[1:]).latency)
+        return 0
+
+    parser = argparse.ArgumentParser(description="Teste de carga: N sessões do Agrinho com modelo e MCP locais")
+    parser.add_argument("speech", type=Path, help="WAV com a fala do participante sintético")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=60.0, help="segundos por degrau")
+    parser.add_argument("--profile", default="noisy", help="perfil do VADConfig")
+    parser.add_argument("--persona", default="PROMPT_AGRINHO")
+    parser.add_argument("--model-latency", type=float, default=0.6, help="segundos até o primeiro áudio do fake")
+    parser.add_argument("--model-jitter", type=float, default=0.15)
+    parser.add_argument("--reply-seconds", type=float, default=3.0, help="duração do áudio enlatado")
+    parser.add_argument("--tool-every", type=int, default=3, help="chama a tool do MCP a cada N turnos (0 = nunca)")
+    parser.add_argument("--mcp-latency", type=float, default=0.3)
+    parser.add_argument("--think", type=float, default=2.0, help="pausa do visitante após a resposta")
+    parser.add_argument("--max-wait", type=float, default=10.0, help="espera máxima pela resposta")
+    parser.add_argument("--pin-cpu", type=int, help="fixa o processo neste core (Linux)")
+    parser.add_argument("--out", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    # Ambiente isolado: MCP local, sem cache de catálogo e resumo de contexto extrativo (sem rede)
+    os.environ.pop("MCP_SERVERS", None)
+    os.environ.pop("MCP_SERVER_URL", None)
+    # O mcp_bridge separa o comando por espaço
+    # Caminhos com espaço: o mcp_bridge separa o comando com shlex.split
+    os.environ["MCP_STDIO_CMD"] = shlex.join(
+        (sys.executable, str(Path(__file__).resolve()), "mcp-stub", "--latency", str(args.mcp_latency)))
+    os.environ["MCP_CATALOG_CACHE"] = "false"
+    os.environ["CONTEXT_SUMMARY_MODEL"] = ""
+    if args.pin_cpu is not None:
+        os.sched_setaffinity(0, {args.pin_cpu})
+
+    from settings import setup_logging
+    setup_logging()
+    steps = asyncio.run(run(args))
+    print_table(steps)
+    if args.out:
+        args.out.write_text(json.dumps(steps, indent=2, ensure_ascii=False))
+        print(f"Resultados gravados em {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
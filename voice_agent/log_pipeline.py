@@ -0,0 +1,207 @@
+# log_pipeline.py - Logging sem I/O no event loop
+#
+# O loop que bombeia áudio também emitia os logs, e um console lento (terminal,
+# docker logs, pipe cheio) travava o turno inteiro. Aqui o handler do root só
+# coloca o registro numa fila; uma thread (QueueListener) formata e escreve.
+# Fila cheia descarta e conta, em vez de bloquear.
+#
+# Cada registro carrega os IDs de contexto (sala, sessão, turno) vinculados com
+# `bind(...)`: o valor vive numa ContextVar, então tasks criadas depois do bind
+# (as da AgentSession, por exemplo) herdam o mesmo contexto.
+#
+#   LOG_FORMAT=text              ou json (uma linha JSON por registro)
+#   LOG_QUEUE_SIZE=10000         registros na fila antes de descartar
+#   LOG_RATE_LIMIT=50            por mensagem (template) a cada LOG_RATE_WINDOW; 0 desliga
+#   LOG_RATE_WINDOW=10           segundos; WARNING ou acima nunca é limitado
+#   LOG_DEBUG_SAMPLE=1.0         fração dos registros DEBUG mantidos
+#
+# Só stdlib: o server.py e o turn_metrics também importam este módulo.
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+from typing import Any
+
+_context: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar("log_context", default=None)
+
+CONTEXT_FIELDS = ("room", "session", "turn")
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def bind(**ids: Any) -> dict[str, Any]:
+    """
+    Vincula IDs (room=, session=, turn=...) ao contexto atual e devolve o dict.
+
+    O dict é compartilhado com as tasks criadas depois: quem atualiza
+    `ctx["turn"]` muda o turno nos logs de toda a sessão.
+    """
+    ctx = {**(_context.get() or {}), **ids}
+    _context.set(ctx)
+    return ctx
+
+
+def log_context() -> dict[str, Any]:
+    """Dict de contexto vigente (vazio e desvinculado se nada foi vinculado)."""
+    return _context.get() or {}
+
+
+class ContextFilter(logging.Filter):
+    """Copia os IDs de contexto para o registro (roda na thread de quem loga)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _context.get()
+        if ctx:
+            for key, value in ctx.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita mensagens repetidas por template (logger + msg sem argumentos).
+
+    Passado o limite na janela, as seguintes são descartadas; a primeira da
+    janela seguinte sai com a contagem do que foi suprimido.
+    """
+
+    def __init__(self, limit: int, window: float, debug_sample: float = 1.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.debug_sample = debug_sample
+        self._buckets: dict[tuple[str, Any], list] = {}  # chave -> [início da janela, enviados, suprimidos]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if record.levelno <= logging.DEBUG and self.debug_sample < 1.0 and random.random() >= self.debug_sample:
+            return False
+        if self.limit <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        bucket = self._buckets.get(key)
+        if bucket is None or now - bucket[0] >= self.window:
+            suppressed = bucket[2] if bucket else 0
+            self._buckets[key] = [now, 1, 0]
+            if len(self._buckets) > 4096:
+                self._expire(now)
+            if suppressed:
+                record.msg = f"{record.getMessage()} (+{suppressed} iguais suprimidas em {self.window:g}s)"
+                record.args = None
+            return True
+        if bucket[1] < self.limit:
+            bucket[1] += 1
+            return True
+        bucket[2] += 1
+        return False
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, b in self._buckets.items() if now - b[0] >= self.window]:
+            del self._buckets[key]
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloqueia: fila cheia → registro descartado e contado."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formata só a mensagem aqui; o resto (hora, JSON) fica para a thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped = self.dropped
+            self.dropped = 0
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if getattr(record, "dropped", 0):
+            entry["dropped"] = record.dropped
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato de sempre; avisa quando a fila descartou registros."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        dropped = getattr(record, "dropped", 0)
+        return f"{text} [+{dropped} registros descartados: fila cheia]" if dropped else text
+
+
+def start(level: int, json_output: bool = False, stream: Any = None) -> None:
+    """Instala fila + thread de escrita no root logger (idempotente)."""
+    global _listener
+    if _listener is not None:
+        logging.getLogger().setLevel(level)
+        return
+    sink = logging.StreamHandler(stream or sys.stderr)
+    if json_output:
+        sink.setFormatter(JsonFormatter())
+    else:
+        sink.setFormatter(TextFormatter("[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S"))
+
+    q: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    handler = NonBlockingQueueHandler(q)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RateLimitFilter(
+        limit=int(os.getenv("LOG_RATE_LIMIT", "50")),
+        window=float(os.getenv("LOG_RATE_WINDOW", "10")),
+        debug_sample=float(os.getenv("LOG_DEBUG_SAMPLE", "1.0")),
+    ))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(q, sink, respect_handler_level=False)
+    _listener.start()
+    atexit.register(stop)
+
+
+def stop() -> None:
+    """Esvazia a fila e para a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,86 +1,794 @@
 # mcp_bridge.py (substitua o arquivo por esta versão mais resiliente)
 import os
+import re
+import json
+import shlex
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Any, Callable
-from livekit.agents import FunctionTool, function_tool
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+from livekit.agents import FunctionTool, RunContext, StopResponse, function_tool
+from livekit.agents.llm import RawFunctionTool
 
-# SDK MCP (cliente)
-from mcp import ClientSession, types
-from mcp.client.streamable_http import streamablehttp_client
-from mcp.client.stdio import stdio_client, StdioServerParameters
+from turn_metrics import record_tool_call, record_tool_span, registry
+from session_usage import record_tool as record_session_tool
+
+# SDK MCP (cliente): importado só quando um servidor MCP está configurado, e
+# apenas o transporte em uso (HTTP ou stdio).
+if TYPE_CHECKING:
+    from mcp import ClientSession, types
 
 log = logging.getLogger("mcp-bridge")
 
+
+class ToolResultCache:
+    """
+    Cache LRU com TTL para resultados de tools MCP somente-leitura.
+
+    A chave é o nome da tool + argumentos canonicalizados (JSON com chaves
+    ordenadas), então `{"a": 1, "b": 2}` e `{"b": 2, "a": 1}` caem na mesma
+    entrada. Quando o limite de entradas é atingido, a menos usada sai.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.hits_by_tool: dict[str, int] = {}
+
+    @staticmethod
+    def key(tool_name: str, args: dict[str, Any]) -> str:
+        canon = json.dumps(args, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return f"{tool_name}:{canon}"
+
+    def get(self, tool_name: str, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.hits_by_tool[tool_name] = self.hits_by_tool.get(tool_name, 0) + 1
+        return value
+
+    def put(self, key: str, value: str, ttl: float | None = None) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hits_by_tool": dict(self.hits_by_tool),
+        }
+
+
+class _MCPConnection:
+    """
+    Uma conexão MCP de longa duração (transporte + ClientSession já inicializada).
+
+    O transporte é aberto e fechado dentro de uma task dedicada (`_runner`),
+    porque os context managers do SDK (anyio) precisam sair na mesma task em
+    que entraram. A ClientSession multiplexa requisições concorrentes por id,
+    então várias chamadas podem usar a mesma conexão ao mesmo tempo.
+    """
+
+    def __init__(self, client: "MCPClient", index: int):
+        self._client = client
+        self._index = index
+        self._session: "ClientSession | None" = None
+        self._runner_task: asyncio.Task | None = None
+        self._closing: asyncio.Event | None = None
+        self._lock = asyncio.Lock()
+        self.inflight = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._session is not None and self._runner_task is not None and not self._runner_task.done()
+
+    async def session(self) -> "ClientSession":
+        if self.connected:
+            return self._session  # type: ignore[return-value]
+        async with self._lock:
+            if self.connected:
+                return self._session  # type: ignore[return-value]
+            await self._stop_runner()
+            loop = asyncio.get_running_loop()
+            ready: "asyncio.Future[ClientSession]" = loop.create_future()
+            self._closing = asyncio.Event()
+            self._runner_task = asyncio.create_task(
+                self._runner(ready, self._closing), name=f"mcp-conn-{self._index}"
+            )
+            self._session = await ready
+            log.info("Conexão MCP #%d estabelecida.", self._index)
+            return self._session
+
+    async def _runner(self, ready: asyncio.Future, closing: asyncio.Event) -> None:
+        from mcp import ClientSession
+
+        try:
+            async with AsyncExitStack() as stack:
+                streams = await stack.enter_async_context(self._client._open())
+                # stdio devolve (read, write); streamable HTTP devolve (read, write, get_session_id)
+                read, write = streams[0], streams[1]
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                ready.set_result(session)
+                await closing.wait()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                if not ready.done():
+                    ready.cancel()
+                raise
+            if not ready.done():
+                ready.set_exception(e)
+            elif not closing.is_set():
+                log.warning("Conexão MCP #%d caiu: %s", self._index, e)
+        finally:
+            self._session = None
+
+    async def invalidate(self) -> None:
+        """Descarta a conexão atual; a próxima chamada reconecta."""
+        async with self._lock:
+            await self._stop_runner()
+
+    async def _stop_runner(self) -> None:
+        self._session = None
+        task, self._runner_task = self._runner_task, None
+        if task is None or task.done():
+            return
+        if self._closing:
+            self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=5)
+        except Exception as e:
+            log.warning("[%s] Conexão MCP não encerrou limpa; cancelando: %r", self._client.name, e)
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+
+    async def aclose(self) -> None:
+        await self.invalidate()
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por servidor MCP.
+
+    Depois de `failures` falhas seguidas (transporte ou prazo estourado) abre
+    e recusa chamadas na hora, sem gastar o prazo da tool, por `reset_after`
+    segundos. Então deixa passar uma chamada de teste (meio-aberto): sucesso
+    fecha de novo, falha reabre.
+    """
+
+    def __init__(self, name: str, failures: int = 3, reset_after: float = 30.0):
+        self.name = name
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe:
+            self._probe = True  # uma chamada de teste por vez
+            return True
+        return False
+
+    def release(self) -> None:
+        """Chamada de teste cancelada sem resultado (ex.: barge-in): libera outra."""
+        self._probe = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            log.info("Servidor MCP '%s' respondeu; circuito fechado.", self.name)
+            registry.set_gauge("agrinho_mcp_circuit_open", 0, server=self.name)
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+
+    def trip(self) -> None:
+        """Abre o circuito na hora (ex.: servidor travou na descoberta)."""
+        self.failures = max(self.failures, self.max_failures - 1)
+        self.record_failure()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            if self.opened_at is None:
+                log.warning("Servidor MCP '%s' falhou %d vezes; circuito aberto por %.0fs.",
+                            self.name, self.failures, self.reset_after)
+            self.opened_at = time.monotonic()
+            registry.set_gauge("agrinho_mcp_circuit_open", 1, server=self.name)
+
+
 class MCPClient:
-    def __init__(self, server_url: str | None = None, stdio_cmd: list[str] | None = None, bearer: str | None = None):
+    """
+    Cliente MCP com pool de sessões persistentes.
+
+    As conexões são abertas sob demanda na primeira chamada e reaproveitadas
+    nas seguintes. Se o transporte falhar, a conexão é descartada e a chamada
+    é repetida uma vez numa conexão nova.
+    """
+
+    def __init__(
+        self,
+        server_url: str | None = None,
+        stdio_cmd: list[str] | None = None,
+        bearer: str | None = None,
+        pool_size: int = 1,
+        cache: ToolResultCache | None = None,
+        name: str = "mcp",
+        breaker: CircuitBreaker | None = None,
+    ):
         self.server_url = server_url
         self.stdio_cmd = stdio_cmd
         self.bearer = bearer
+        self.cache = cache
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self._pool = [_MCPConnection(self, i) for i in range(max(1, pool_size))]
 
-    async def _open(self):
+    def _open(self):
         if self.stdio_cmd:
+            from mcp.client.stdio import stdio_client, StdioServerParameters
             params = StdioServerParameters(command=self.stdio_cmd[0], args=self.stdio_cmd[1:])
             return stdio_client(params)
         if not self.server_url:
             raise RuntimeError("MCP não configurado.")
+        from mcp.client.streamable_http import streamablehttp_client
         auth = {"Authorization": f"Bearer {self.bearer}"} if self.bearer else None
         return streamablehttp_client(self.server_url, headers=auth)
 
-    async def list_tools(self) -> list[types.Tool]:
-        async with (await self._open()) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools = await session.list_tools()
-                return tools.tools
+    def _pick(self) -> _MCPConnection:
+        # Prefere conexões já abertas e, entre elas, a menos ocupada
+        return min(self._pool, key=lambda c: (not c.connected, c.inflight))
 
-    async def call_tool(self, name: str, args: dict[str, Any]) -> str:
-        async with (await self._open()) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool(name, args)
-                texts = []
-                for c in result.content:
-                    if isinstance(c, types.TextContent):
-                        texts.append(c.text)
-                    elif isinstance(c, types.JsonContent):
-                        texts.append(str(c.json))
-                return "\n".join(texts) if texts else "(sem conteúdo)"
-
-def _mk_tool_wrapper(mcp_client: MCPClient, tool_name: str):
-    async def _tool(**kwargs) -> str:
-        return await mcp_client.call_tool(tool_name, kwargs)
+    async def _request(self, fn: Callable[["ClientSession"], Any]) -> Any:
+        from mcp.shared.exceptions import McpError
+
+        conn = self._pick()
+        conn.inflight += 1
+        try:
+            for attempt in (1, 2):
+                session = await conn.session()
+                try:
+                    return await fn(session)
+                except McpError:
+                    # Erro do servidor (JSON-RPC): a conexão continua válida
+                    raise
+                except Exception as e:
+                    if attempt == 2:
+                        raise
+                    log.warning("Falha de transporte MCP (%s); reconectando e tentando de novo.", e)
+                    await conn.invalidate()
+        finally:
+            conn.inflight -= 1
+
+    async def list_tools(self) -> list["types.Tool"]:
+        result = await self._request(lambda s: s.list_tools())
+        return result.tools
+
+    async def call_tool(self, name: str, args: dict[str, Any], cache_ttl: float | None = None) -> str:
+        """Chama a tool; com `cache_ttl`, consulta/preenche o cache de resultados."""
+        key = None
+        if cache_ttl is not None and self.cache is not None:
+            # O cache é compartilhado entre servidores: a chave inclui o servidor
+            key = self.cache.key(f"{self.name}/{name}", args)
+            cached = self.cache.get(name, key)
+            if cached is not None:
+                log.debug("Cache hit MCP: %s", name)
+                return cached
+        result = await self._request(lambda s: s.call_tool(name, args))
+        text = _result_to_text(result)
+        # Erros não vão para o cache: a próxima pergunta tenta de novo
+        if key is not None and not result.isError:
+            self.cache.put(key, text, ttl=cache_ttl)
+        return text
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(c.aclose() for c in self._pool), return_exceptions=True)
+
+
+def _result_to_text(result: "types.CallToolResult") -> str:
+    from mcp import types
+
+    texts = []
+    for c in result.content:
+        if isinstance(c, types.TextContent):
+            texts.append(c.text)
+    if not texts and getattr(result, "structuredContent", None):
+        texts.append(str(result.structuredContent))
+    return "\n".join(texts) if texts else "(sem conteúdo)"
+
+
+DEFAULT_TIMEOUT_MESSAGE = (
+    "A consulta '{tool}' demorou demais e foi cancelada. Diga ao usuário, em uma frase curta, "
+    "que não conseguiu essa informação agora e ofereça ajuda com outra coisa."
+)
+DEFAULT_UNAVAILABLE_MESSAGE = (
+    "A consulta '{tool}' está indisponível no momento e não foi feita. Diga ao usuário, em uma frase "
+    "curta, que essa informação não está disponível agora e ofereça ajuda com outra coisa."
+)
+
+
+def _mk_tool_wrapper(mcp_client: MCPClient, tool_name: str, cache_ttl: float | None = None,
+                     timeout: float | None = None, exposed_name: str | None = None):
+    """
+    Wrapper LiveKit de uma tool MCP.
+
+    A chamada corre numa task própria e termina de três jeitos: resultado,
+    prazo estourado (`timeout`) → mensagem para o modelo falar no lugar, ou
+    interrupção do turno pelo usuário → chamada cancelada e nada entra no
+    contexto (StopResponse). Várias tools do mesmo turno são executadas em
+    paralelo pelo AgentSession; cada uma registra seu intervalo para a
+    latência total do turno. Com o circuito do servidor aberto, sai na hora um
+    aviso de indisponível (MCP_UNAVAILABLE_MESSAGE), sem chamar o servidor.
+    """
+    label = exposed_name or tool_name
+
+    async def _tool(raw_arguments: dict[str, object], context: RunContext) -> str:
+        from mcp.shared.exceptions import McpError
+
+        breaker = mcp_client.breaker
+        if not breaker.allow():
+            record_tool_call(label, 0.0, status="circuit_open")
+            # Nenhuma chamada foi feita: não é "demorou demais"
+            return os.getenv("MCP_UNAVAILABLE_MESSAGE", DEFAULT_UNAVAILABLE_MESSAGE).format(tool=label)
+        fallback = os.getenv("MCP_TIMEOUT_MESSAGE", DEFAULT_TIMEOUT_MESSAGE).format(tool=label)
+
+        start = time.perf_counter()
+        status = "error"
+        settled = False  # o disjuntor já recebeu sucesso/falha/liberação desta chamada
+        call = asyncio.ensure_future(mcp_client.call_tool(tool_name, dict(raw_arguments), cache_ttl=cache_ttl))
+        handle = context.speech_handle
+        try:
+            try:
+                await asyncio.wait_for(handle.wait_if_not_interrupted([call]), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if call.done():
+                error = call.exception()
+                settled = True
+                if error is None:
+                    breaker.record_success()
+                    status = "ok"
+                    return call.result()
+                # Erro JSON-RPC = servidor vivo; só falhas de transporte abrem o circuito
+                if isinstance(error, McpError):
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                raise error
+            call.cancel()
+            if handle.interrupted:
+                status = "cancelled"
+                settled = True
+                breaker.release()
+                log.info("MCP tool %s cancelada: turno interrompido pelo usuário.", label)
+                raise StopResponse()
+            status = "timeout"
+            settled = True
+            breaker.record_failure()
+            log.warning("MCP tool %s excedeu %.1fs; respondendo com fallback.", label, timeout)
+            return fallback
+        finally:
+            if not call.done():
+                call.cancel()
+            if not settled:
+                # Task da tool cancelada por fora (fala interrompida, sessão fechando):
+                # sem isso a chamada de teste do meio-aberto ficaria presa para sempre
+                status = "cancelled"
+                breaker.release()
+            end = time.perf_counter()
+            record_tool_call(label, end - start, status=status)
+            record_session_tool(end - start)
+            call_id = getattr(getattr(context, "function_call", None), "call_id", None)
+            if call_id:
+                record_tool_span(call_id, start, end)
     return _tool
 
-async def build_livekit_tools_from_mcp() -> list[FunctionTool]:
-    server_url = os.getenv("MCP_SERVER_URL")
-    bearer = os.getenv("MCP_BEARER")
-    stdio_raw = os.getenv("MCP_STDIO_CMD")  # ex.: "python my_server.py stdio"
-    stdio_cmd = stdio_raw.split(" ") if stdio_raw else None
 
-    # Se nada configurado, não falhe — apenas retorne lista vazia.
-    if not server_url and not stdio_cmd:
-        log.info("MCP desabilitado (nenhum MCP_SERVER_URL/MCP_STDIO_CMD). Prosseguindo sem MCP.")
-        return []
+def _parse_tool_list(raw: str | None) -> dict[str, float | None]:
+    """Lê "tool_a:600,tool_b" → {"tool_a": 600.0, "tool_b": None} (None = TTL padrão)."""
+    out: dict[str, float | None] = {}
+    for item in (raw or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, ttl = item.partition(":")
+        out[name.strip()] = float(ttl) if ttl.strip() else None
+    return out
+
+
+def _cache_ttl_for(name: str, read_only: bool, default_ttl: float) -> float | None:
+    """
+    Decide se uma tool pode ir para o cache e com qual TTL.
+
+    Ordem: MCP_NO_CACHE_TOOLS (nunca) > MCP_CACHE_TOOLS (nome ou "*") >
+    anotação `readOnlyHint` do servidor (se MCP_CACHE_READONLY, padrão true).
+    Retorna None quando a tool não deve ser cacheada.
+    """
+    deny = _parse_tool_list(os.getenv("MCP_NO_CACHE_TOOLS"))
+    if name in deny:
+        return None
+    allow = _parse_tool_list(os.getenv("MCP_CACHE_TOOLS"))
+    if name in allow:
+        return allow[name] if allow[name] is not None else default_ttl
+    if "*" in allow:
+        return allow["*"] if allow["*"] is not None else default_ttl
+    use_annotations = os.getenv("MCP_CACHE_READONLY", "true").strip().lower() in {"1", "true", "yes", "y"}
+    if use_annotations and read_only:
+        return default_ttl
+    return None
+
 
+def _timeout_for(tool_name: str) -> float | None:
+    """Prazo da tool: MCP_TOOL_TIMEOUTS ("nome:segundos,...") > MCP_TOOL_TIMEOUT (padrão 8s; 0 = sem prazo)."""
+    per_tool = _parse_tool_list(os.getenv("MCP_TOOL_TIMEOUTS"))
+    value = per_tool.get(tool_name)
+    if value is None:
+        value = float(os.getenv("MCP_TOOL_TIMEOUT", "8"))
+    return value if value > 0 else None
+
+
+# --- Catálogo de tools em disco ---
+# O resultado do list_tools (nome, descrição, schema, readOnlyHint) é salvo por
+# servidor, identificado por um hash de URL/comando/credencial. Na partida as
+# tools vêm do disco na hora e o servidor é consultado em background.
+
+def _catalog_enabled() -> bool:
+    return os.getenv("MCP_CATALOG_CACHE", "true").strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _catalog_path(server_url: str | None, stdio_cmd: list[str] | None, bearer: str | None) -> Path:
+    identity = json.dumps({
+        "url": server_url,
+        "cmd": stdio_cmd,
+        # Credenciais diferentes podem expor tools diferentes; o token em si não vai para o disco
+        "auth": hashlib.sha256(bearer.encode()).hexdigest() if bearer else None,
+    }, sort_keys=True)
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:16]
+    base = Path(os.getenv("MCP_CATALOG_DIR") or Path(__file__).resolve().parent / ".cache" / "mcp")
+    return base / f"tools-{digest}.json"
+
+
+def _tool_to_dict(tool: "types.Tool") -> dict[str, Any]:
+    annotations = getattr(tool, "annotations", None)
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "inputSchema": tool.inputSchema,
+        "readOnly": bool(annotations is not None and getattr(annotations, "readOnlyHint", False)),
+    }
+
+
+def _load_catalog(path: Path) -> list[dict[str, Any]] | None:
     try:
-        mcp = MCPClient(server_url=server_url, stdio_cmd=stdio_cmd, bearer=bearer)
-        tools = await mcp.list_tools()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data["tools"]
+    except FileNotFoundError:
+        return None
     except Exception as e:
-        log.error("Falha ao conectar/listar MCP: %s", e)
-        # Siga sem MCP para não derrubar o agente
-        return []
+        log.warning("Catálogo MCP em disco ilegível (%s): %s", path, e)
+        return None
 
+
+def _save_catalog(path: Path, catalog: list[dict[str, Any]]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"saved_at": time.time(), "tools": catalog},
+                                  ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Não foi possível gravar o catálogo MCP em %s: %s", path, e)
+
+
+def _build_tools(mcp: MCPClient, catalog: list[dict[str, Any]], cache_ttl: float,
+                 prefix: str = "") -> list[FunctionTool | RawFunctionTool]:
+    """Wrappers LiveKit para o catálogo de um servidor; `prefix` cria o namespace (ex.: "clima__")."""
     allow = None
     if os.getenv("MCP_ALLOW_TOOLS"):
         allow = {t.strip() for t in os.getenv("MCP_ALLOW_TOOLS").split(",") if t.strip()}
 
-    livekit_tools: list[FunctionTool] = []
-    for t in tools:
-        name = t.name
-        if allow and name not in allow:
+    livekit_tools: list[FunctionTool | RawFunctionTool] = []
+    for t in catalog:
+        name = t["name"]
+        exposed = f"{prefix}{name}"
+        if allow and exposed not in allow:
             continue
-        fn = _mk_tool_wrapper(mcp, name)
-        livekit_tools.append(function_tool(fn, name=name, description=t.description or f"MCP tool: {name}"))
-        log.info("Registrada MCP tool: %s", name)
-
+        ttl = _cache_ttl_for(exposed, t.get("readOnly", False), cache_ttl) if mcp.cache else None
+        fn = _mk_tool_wrapper(mcp, name, cache_ttl=ttl, timeout=_timeout_for(exposed), exposed_name=exposed)
+        # Schema bruto: o modelo vê os parâmetros exatamente como o servidor MCP os declara
+        livekit_tools.append(function_tool(fn, raw_schema={
+            "name": exposed,
+            "description": t.get("description") or f"MCP tool: {name}",
+            "parameters": t.get("inputSchema") or {"type": "object", "properties": {}},
+        }))
+        if ttl is not None:
+            log.info("Registrada MCP tool: %s (cache TTL %.0fs)", exposed, ttl)
+        else:
+            log.info("Registrada MCP tool: %s", exposed)
     return livekit_tools
+
+
+# --- Servidores ---
+
+@dataclass
+class MCPServerConfig:
+    name: str
+    server_url: str | None = None
+    stdio_cmd: list[str] | None = None
+    bearer: str | None = None
+    pool_size: int = 1
+    breaker_failures: int = 3
+    breaker_reset: float = 30.0
+    namespace: bool = True
+
+
+def _server_configs() -> list[MCPServerConfig]:
+    """
+    Servidores MCP configurados.
+
+    MCP_SERVERS (JSON ou caminho de um arquivo .json) lista vários servidores:
+
+        [{"name": "clima", "url": "https://.../mcp", "bearer_env": "CLIMA_TOKEN"},
+         {"name": "escola", "stdio": "python escola_server.py stdio", "pool_size": 2}]
+
+    Cada tool é exposta como `<name>__<tool>`. Sem MCP_SERVERS vale a
+    configuração de um servidor só (MCP_SERVER_URL/MCP_STDIO_CMD), sem prefixo.
+    """
+    pool_size = int(os.getenv("MCP_POOL_SIZE", "1"))
+    failures = int(os.getenv("MCP_BREAKER_FAILURES", "3"))
+    reset = float(os.getenv("MCP_BREAKER_RESET", "30"))
+
+    raw = (os.getenv("MCP_SERVERS") or "").strip()
+    if not raw:
+        server_url = os.getenv("MCP_SERVER_URL")
+        stdio_raw = os.getenv("MCP_STDIO_CMD")  # ex.: "python my_server.py stdio"
+        if not server_url and not stdio_raw:
+            return []
+        return [MCPServerConfig(
+            name="mcp", server_url=server_url, stdio_cmd=shlex.split(stdio_raw) if stdio_raw else None,
+            bearer=os.getenv("MCP_BEARER"), pool_size=pool_size,
+            breaker_failures=failures, breaker_reset=reset, namespace=False,
+        )]
+
+    if not raw.startswith("["):
+        raw = Path(raw).read_text(encoding="utf-8")
+    configs = []
+    for entry in json.loads(raw):
+        name = entry["name"]
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            raise ValueError(f"nome de servidor MCP inválido: {name!r} (use letras, números, _ ou -)")
+        stdio = entry.get("stdio")
+        configs.append(MCPServerConfig(
+            name=name,
+            server_url=entry.get("url"),
+            stdio_cmd=(shlex.split(stdio) if isinstance(stdio, str) else stdio) or None,
+            bearer=entry.get("bearer") or (os.getenv(entry["bearer_env"]) if entry.get("bearer_env") else None),
+            pool_size=int(entry.get("pool_size", pool_size)),
+            breaker_failures=int(entry.get("breaker_failures", failures)),
+            breaker_reset=float(entry.get("breaker_reset", reset)),
+        ))
+    return configs
+
+
+@dataclass
+class _Server:
+    config: MCPServerConfig
+    client: MCPClient
+    tools: list[FunctionTool | RawFunctionTool] = field(default_factory=list)
+    refresh: asyncio.Task | None = None
+    stale: tuple[Path, list[dict[str, Any]]] | None = None  # catálogo do disco a conferir em background
+
+    @property
+    def prefix(self) -> str:
+        return f"{self.config.name}__" if self.config.namespace else ""
+
+
+# Servidores, cache e tools compartilhados por todas as sessões deste processo (worker)
+_servers: list[_Server] = []
+_shared_cache: ToolResultCache | None = None
+_shared_tools: list[FunctionTool | RawFunctionTool] | None = None
+_build_lock: asyncio.Lock | None = None
+_tools_listeners: list[Callable[[list[FunctionTool | RawFunctionTool]], Awaitable[None]]] = []
+
+
+def get_cache_stats() -> dict[str, Any]:
+    """Contadores do cache de resultados MCP deste processo (vazio se desativado)."""
+    if _shared_cache is None:
+        return {}
+    return _shared_cache.stats()
+
+
+def current_mcp_tools() -> list[FunctionTool | RawFunctionTool]:
+    """Tools MCP vigentes (já considerando a última atualização em background)."""
+    return list(_shared_tools or [])
+
+
+def add_tools_listener(callback: Callable[[list[FunctionTool | RawFunctionTool]], Awaitable[None]]) -> None:
+    """Registra um callback chamado com a nova lista quando o catálogo de um servidor muda."""
+    _tools_listeners.append(callback)
+
+
+def remove_tools_listener(callback: Callable[[list[FunctionTool | RawFunctionTool]], Awaitable[None]]) -> None:
+    if callback in _tools_listeners:
+        _tools_listeners.remove(callback)
+
+
+async def _refresh_catalog(server: _Server, path: Path, cached: list[dict[str, Any]], cache_ttl: float) -> None:
+    """Consulta o servidor em background; se o catálogo mudou, regrava e avisa as sessões."""
+    global _shared_tools
+    name = server.config.name
+    try:
+        fresh = [_tool_to_dict(t) for t in await server.client.list_tools()]
+    except Exception as e:
+        log.warning("[%s] Atualização do catálogo MCP falhou (%s); mantendo as tools do disco.", name, e)
+        return
+    if fresh == cached:
+        log.info("[%s] Catálogo MCP em disco está atualizado (%d tools).", name, len(fresh))
+        return
+    _save_catalog(path, fresh)
+    if server not in _servers:
+        return  # encerrado enquanto atualizava
+    server.tools = _build_tools(server.client, fresh, cache_ttl, server.prefix)
+    _shared_tools = [t for srv in _servers for t in srv.tools]
+    log.info("[%s] Catálogo MCP mudou; %d tools atualizadas em %d sessões.",
+             name, len(_shared_tools), len(_tools_listeners))
+    for callback in list(_tools_listeners):
+        try:
+            await callback(list(_shared_tools))
+        except Exception as e:
+            log.warning("Falha ao atualizar tools de uma sessão: %s", e)
+
+
+async def _discover(server: _Server, cache_ttl: float) -> bool:
+    """Carrega as tools de um servidor (do disco se houver); False se ficou sem tools."""
+    cfg = server.config
+    path = _catalog_path(cfg.server_url, cfg.stdio_cmd, cfg.bearer) if _catalog_enabled() else None
+    cached = _load_catalog(path) if path else None
+    if cached is not None:
+        log.info("[%s] Catálogo MCP carregado do disco (%d tools); atualizando em background.", cfg.name, len(cached))
+        server.tools = _build_tools(server.client, cached, cache_ttl, server.prefix)
+        server.stale = (path, cached)  # a atualização só começa depois do servidor entrar em _servers
+        return True
+    try:
+        catalog = [_tool_to_dict(t) for t in await server.client.list_tools()]
+    except Exception as e:
+        log.error("[%s] Falha ao conectar/listar MCP: %s", cfg.name, e)
+        return False
+    if path:
+        _save_catalog(path, catalog)
+    server.tools = _build_tools(server.client, catalog, cache_ttl, server.prefix)
+    return True
+
+
+async def _discover_with_timeout(server: _Server, cache_ttl: float, timeout: float) -> bool:
+    """`_discover` com prazo: servidor travado no connect/list_tools fica de fora e abre o circuito."""
+    if timeout <= 0:
+        return await _discover(server, cache_ttl)
+    try:
+        return await asyncio.wait_for(_discover(server, cache_ttl), timeout)
+    except asyncio.TimeoutError:
+        log.error("[%s] Descoberta MCP passou de %.0fs; servidor ignorado.", server.config.name, timeout)
+        server.client.breaker.trip()
+        return False
+
+
+async def build_livekit_tools_from_mcp() -> list[FunctionTool | RawFunctionTool]:
+    """
+    Descobre as tools de todos os servidores MCP e devolve wrappers LiveKit.
+
+    A descoberta roda em paralelo, com prazo por servidor (MCP_DISCOVERY_TIMEOUT),
+    e um servidor lento não atrasa os outros; cada servidor tem seu próprio pool
+    de conexões e disjuntor. Os clientes são
+    criados uma única vez por processo e chamadas seguintes reaproveitam as
+    mesmas tools. Com catálogo em disco, as tools saem na hora e são
+    atualizadas em background (ver `add_tools_listener`). Use `aclose_mcp()`
+    ao encerrar o worker.
+    """
+    global _shared_cache, _shared_tools, _build_lock
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    async with _build_lock:
+        if _shared_tools is not None:
+            return list(_shared_tools)
+
+        configs = _server_configs()
+        # Se nada configurado, não falhe — apenas retorne lista vazia.
+        if not configs:
+            log.info("MCP desabilitado (nenhum MCP_SERVERS/MCP_SERVER_URL/MCP_STDIO_CMD). Prosseguindo sem MCP.")
+            _shared_tools = []
+            return []
+
+        cache_size = int(os.getenv("MCP_CACHE_SIZE", "256"))
+        cache_ttl = float(os.getenv("MCP_CACHE_TTL", "300"))
+        discovery_timeout = float(os.getenv("MCP_DISCOVERY_TIMEOUT", "10"))
+        cache = ToolResultCache(max_entries=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+        servers = [
+            _Server(cfg, MCPClient(
+                server_url=cfg.server_url, stdio_cmd=cfg.stdio_cmd, bearer=cfg.bearer,
+                pool_size=cfg.pool_size, cache=cache, name=cfg.name,
+                breaker=CircuitBreaker(cfg.name, cfg.breaker_failures, cfg.breaker_reset),
+            ))
+            for cfg in configs
+        ]
+        results = await asyncio.gather(*(_discover_with_timeout(srv, cache_ttl, discovery_timeout)
+                                         for srv in servers))
+
+        # Servidor que falhou sem catálogo em disco fica de fora; os outros seguem
+        for srv, ok in zip(servers, results):
+            if not ok:
+                await srv.client.aclose()
+        _servers[:] = [srv for srv, ok in zip(servers, results) if ok]
+        if not _servers:
+            # Siga sem MCP para não derrubar o agente
+            return []
+        _shared_cache = cache
+        _shared_tools = [t for srv in _servers for t in srv.tools]
+        # Só agora, com _servers preenchido: uma atualização rápida não é descartada
+        for srv in _servers:
+            if srv.stale is not None:
+                path, cached = srv.stale
+                srv.stale = None
+                srv.refresh = asyncio.create_task(_refresh_catalog(srv, path, cached, cache_ttl),
+                                                  name=f"mcp-catalog-refresh-{srv.config.name}")
+        if len(configs) > 1:
+            log.info("MCP: %d/%d servidores ativos, %d tools no total.", len(_servers), len(configs), len(_shared_tools))
+        return list(_shared_tools)
+
+
+async def aclose_mcp() -> None:
+    """Fecha as conexões MCP compartilhadas deste processo."""
+    global _shared_cache, _shared_tools
+    servers = list(_servers)
+    _servers.clear()
+    _shared_tools = None
+    cache, _shared_cache = _shared_cache, None
+    for srv in servers:
+        if srv.refresh is not None and not srv.refresh.done():
+            srv.refresh.cancel()
+    if cache is not None:
+        log.info("Cache MCP: %s", cache.stats())
+    if servers:
+        await asyncio.gather(*(srv.client.aclose() for srv in servers), return_exceptions=True)
+        log.info("Conexões MCP encerradas.")
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+noise_gate.py - Supressão de ruído em CPU (spectral gating) quando o BVC falta
+
+Sem o plugin `livekit-plugins-noise-cancellation` (ou com o BVC falhando ao
+iniciar) o Silero recebe o microfone cru, e em feira/evento o burburinho vira
+falsos fins de turno. Este estágio entra entre a sala e o VAD:
+
+  - STFT com janela sqrt-Hann e 50% de sobreposição, um frame de atraso
+  - perfil de ruído por faixa de frequência, semeado nos primeiros 250 ms e
+    atualizado por média simétrica só nas faixas sem fala (a fala não "ensina"
+    o perfil e ele não fica enviesado para baixo)
+  - ganho de Wiener por faixa com SNR a priori "decision-directed" (suaviza
+    no tempo sem ruído musical), piso de atenuação e suavização na frequência
+  - orçamento de CPU por frame: se a média passa do orçamento, o estágio vira
+    passthrough por 1 s e tenta de novo (a conversa nunca espera pelo filtro)
+
+    NOISE_GATE=auto              auto = só sem BVC; on = sempre; off = nunca
+    NOISE_GATE_FLOOR_DB=-18      atenuação máxima por faixa
+    NOISE_GATE_STRENGTH=1.5      sobre-subtração do perfil de ruído
+    NOISE_GATE_BUDGET=0.1        CPU por frame, em fração da duração do frame
+
+Benchmark (custo e precisão do VAD contra passthrough, no corpus do vad_bench):
+    python noise_gate.py corpus/ --noise multidao.wav --snr 10 5 0 --out gate.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.voice import io
+
+from turn_metrics import registry
+
+log = logging.getLogger("noise-gate")
+
+BYPASS_SECONDS = 1.0
+WARMUP_SECONDS = 0.25
+SPEECH_RATIO = 4.0        # potência/perfil acima disso: faixa com fala (ruído estacionário passa ~2% das vezes)
+NOISE_RATE = 0.05         # atualização do perfil nas faixas sem fala (~0.4 s a 20 ms/frame)
+NOISE_RATE_SPEECH = 0.002
+DECISION_DIRECTED = 0.98  # peso do SNR do frame anterior (Ephraim-Malah); segura o "ruído musical"
+
+
+def gate_mode() -> str:
+    mode = os.getenv("NOISE_GATE", "auto").strip().lower()
+    return mode if mode in ("auto", "on", "off") else "auto"
+
+
+def noise_cancellation_options() -> dict[str, object]:
+    """
+    BVC para RoomInputOptions quando o plugin existe e inicia; {} caso contrário.
+
+    Única checagem de disponibilidade do BVC (agent.py e agent_direct.py): o
+    resultado decide também se o filtro local entra (`use_noise_gate`).
+    """
+    try:
+        from livekit.plugins import noise_cancellation
+    except ImportError:
+        log.info("ℹ️ Plugin 'livekit-plugins-noise-cancellation' não encontrado; seguindo sem BVC.")
+        return {}
+    try:
+        options: dict[str, object] = {"noise_cancellation": noise_cancellation.BVC()}
+        log.info("🔇 Noise cancellation (BVC) ativado.")
+        return options
+    except Exception as err:
+        log.warning("⚠️ Falha ao iniciar noise cancellation: %s", err)
+        return {}
+
+
+def use_noise_gate(nc_options: dict[str, object]) -> bool:
+    """NOISE_GATE=on sempre; auto só quando o BVC não está ativo."""
+    mode = gate_mode()
+    return mode == "on" or (mode == "auto" and not nc_options)
+
+
+class SpectralGate:
+    """Spectral gating em streaming: recebe e devolve blocos de `hop` amostras float32."""
+
+    def __init__(self, hop: int, sample_rate: int, floor_db: float | None = None,
+                 strength: float | None = None, budget: float | None = None) -> None:
+        self.hop = hop
+        self.sample_rate = sample_rate
+        self.floor = 10 ** ((floor_db if floor_db is not None else float(os.getenv("NOISE_GATE_FLOOR_DB", "-18"))) / 20)
+        self.strength = strength if strength is not None else float(os.getenv("NOISE_GATE_STRENGTH", "1.5"))
+        budget = budget if budget is not None else float(os.getenv("NOISE_GATE_BUDGET", "0.1"))
+        self.budget = budget * hop / sample_rate  # segundos de CPU por frame (0 = sem limite)
+
+        # sqrt-Hann periódica: análise × síntese = Hann, que soma 1 com 50% de sobreposição
+        self.window = np.sqrt(np.hanning(2 * hop + 1)[:-1]).astype(np.float32)
+        self._tail_w2 = self.window[hop:] ** 2
+        self._prev = np.zeros(hop, np.float32)
+        self._ola = np.zeros(hop, np.float32)
+        self._noise: np.ndarray | None = None
+        self._prio = np.zeros(hop + 1, np.float32)
+        self._warmup = max(1, int(WARMUP_SECONDS * sample_rate / hop))
+        self._bypass_frames = max(1, int(BYPASS_SECONDS * sample_rate / hop))
+        self._bypass = 0
+        self._cost = 0.0
+
+        self.frames = 0
+        self.skipped = 0
+        self.over_budget = 0
+        self.cpu_seconds = 0.0
+        self.costs: list[float] | None = None  # benchmark: custo de cada frame processado
+
+    def process(self, x: np.ndarray) -> tuple[np.ndarray, float]:
+        """Filtra um bloco (atrasado de um bloco) e devolve (saída, CPU gasta em segundos)."""
+        t0 = time.thread_time()
+        block = np.concatenate((self._prev, x))
+        self._prev = x
+        if self._bypass:
+            # Passthrough com o mesmo atraso; a cauda sem filtro mantém a volta contínua
+            self._bypass -= 1
+            self.skipped += 1
+            self._ola = x * self._tail_w2
+            return block[: self.hop], 0.0
+
+        spec = np.fft.rfft(block * self.window)
+        power = spec.real ** 2 + spec.imag ** 2
+        if self._noise is None:
+            self._noise = power
+        elif self.frames < self._warmup:
+            self._noise += (power - self._noise) / (self.frames + 1)
+        else:
+            # Média simétrica só nas faixas sem fala (potência < SPEECH_RATIO × perfil):
+            # subir/descer com taxas diferentes enviesa o perfil para baixo (~0.2× o
+            # ruído real com 0.1/0.002) e o filtro quase não atenua. Faixas com fala
+            # sobem bem devagar, só para acompanhar um ruído que aumentou de verdade.
+            quiet = power < SPEECH_RATIO * self._noise
+            self._noise += np.where(quiet, NOISE_RATE, NOISE_RATE_SPEECH) * (power - self._noise)
+
+        # Ganho de Wiener com SNR a priori "decision-directed": com o SNR do frame
+        # cru, as faixas de ruído que passam do perfil por acaso abrem e o piso
+        # nunca é atingido; a média com o frame anterior as mantém fechadas.
+        post = power / (self.strength * self._noise + 1e-10)
+        prio = DECISION_DIRECTED * self._prio + (1 - DECISION_DIRECTED) * np.maximum(post - 1.0, 0.0)
+        gain = np.clip(prio / (1.0 + prio), self.floor, 1.0)
+        self._prio = gain ** 2 * post
+        smooth = np.convolve(gain, (0.25, 0.5, 0.25), mode="same")
+        y = np.fft.irfft(spec * smooth, 2 * self.hop).astype(np.float32) * self.window
+        out = self._ola + y[: self.hop]
+        self._ola = y[self.hop:]
+        self.frames += 1
+
+        cost = time.thread_time() - t0
+        self.cpu_seconds += cost
+        if self.costs is not None:
+            self.costs.append(cost)
+        if self.budget:
+            if cost > self.budget:
+                self.over_budget += 1
+            self._cost += 0.1 * (cost - self._cost)
+            if self._cost > self.budget:
+                self._bypass = self._bypass_frames
+                self._cost = 0.0
+                registry.inc("agrinho_noise_gate_bypass_total")
+                log.warning("⚠️ Supressão de ruído acima do orçamento (%.2f ms/frame); passthrough por %.0fs",
+                            self.budget * 1000, BYPASS_SECONDS)
+        return out, cost
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "over_budget": self.over_budget,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+        }
+
+
+class NoiseGateInput(io.AudioInput):
+    """Entrada de áudio que passa cada frame mono pelo SpectralGate antes do VAD."""
+
+    def __init__(self, source: io.AudioInput, usage: Any = None) -> None:
+        super().__init__(label="NoiseGate", source=source)
+        self.gate: SpectralGate | None = None
+        self._usage = usage
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self.source.__anext__()
+        if frame.num_channels != 1:
+            return frame
+        hop = frame.samples_per_channel
+        if self.gate is None or self.gate.hop != hop or self.gate.sample_rate != frame.sample_rate:
+            self.gate = SpectralGate(hop, frame.sample_rate)
+        x = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32) / 32768.0
+        y, cost = self.gate.process(x)
+        if self._usage is not None:
+            self._usage.add_cpu("nc", cost)
+        pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16)
+        return rtc.AudioFrame(data=pcm.tobytes(), sample_rate=frame.sample_rate,
+                              num_channels=1, samples_per_channel=hop)
+
+
+def attach_noise_gate(session: Any, usage: Any = None) -> NoiseGateInput | None:
+    """
+    Coloca o filtro na entrada de uma sessão já iniciada (antes dos taps e do VAD).
+
+    Chame logo depois de `session.start`, antes de `attach_adaptive_vad` e
+    `attach_capture`, para que eles vejam o áudio já filtrado.
+    """
+    current = session.input.audio
+    if current is None:
+        return None
+    if isinstance(current, NoiseGateInput):
+        return current
+    gated = NoiseGateInput(current, usage)
+    session.input.audio = gated
+    log.info("🔇 Supressão de ruído local (spectral gating) ativada antes do VAD.")
+    return gated
+
+
+def gate_array(audio: np.ndarray, sample_rate: int, frame_ms: int = 20,
+               gate: SpectralGate | None = None) -> np.ndarray:
+    """Filtra um áudio inteiro em blocos de `frame_ms`, já compensando o atraso de um bloco."""
+    hop = sample_rate * frame_ms // 1000
+    gate = gate or SpectralGate(hop, sample_rate)
+    padded = np.concatenate((audio.astype(np.float32), np.zeros(hop - len(audio) % hop + hop, np.float32)))
+    out = np.concatenate([gate.process(padded[i: i + hop])[0] for i in range(0, len(padded), hop)])
+    return out[hop: hop + len(audio)]
+
+
+# --- Benchmark: custo e precisão do VAD, filtro × passthrough ---
+
+def _cost_summary(gate: SpectralGate, frame_ms: int) -> dict[str, Any]:
+    costs = np.asarray(gate.costs or [0.0]) * 1000
+    return {
+        "frames": gate.frames,
+        "cost_ms": {"mean": round(float(costs.mean()), 3), "p95": round(float(np.percentile(costs, 95)), 3),
+                    "max": round(float(costs.max()), 3)},
+        "real_time_factor": round(gate.cpu_seconds / max(gate.frames * frame_ms / 1000, 1e-9), 4),
+        "budget_ms": round(float(os.getenv("NOISE_GATE_BUDGET", "0.1")) * frame_ms, 3),
+        "frames_over_budget": int((costs > float(os.getenv("NOISE_GATE_BUDGET", "0.1")) * frame_ms).sum()),
+    }
+
+
+def print_comparison(results: dict) -> None:
+    base, gated = results["passthrough"], results["gate"]
+    header = (f"{'perfil':<10} {'condição':<12} {'p95 ms':>13} {'falso fim':>11} "
+              f"{'onset perd.':>11} {'falsa int.':>11}")
+    print(header)
+    print("-" * len(header))
+    for name, prof in base["profiles"].items():
+        for cond, b in prof["conditions"].items():
+            g = gated["profiles"][name]["conditions"][cond]
+            fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+            pair = lambda k: f"{b[k]}→{g[k]}"
+            print(f"{name:<10} {cond:<12} "
+                  f"{fmt(b['eot_latency_ms']['p95']) + '→' + fmt(g['eot_latency_ms']['p95']):>13} "
+                  f"{pair('false_turn_ends'):>11} {pair('missed_onsets'):>11} {pair('false_interruptions'):>11}")
+    cost = results["cost"]
+    print(f"\nFiltro: {cost['cost_ms']['mean']:.3f} ms/frame em média (p95 {cost['cost_ms']['p95']:.3f}, "
+          f"máx {cost['cost_ms']['max']:.3f}), fator de tempo real {cost['real_time_factor']}; "
+          f"{cost['frames_over_budget']} de {cost['frames']} frames acima do orçamento de {cost['budget_ms']} ms")
+
+
+async def bench(args: argparse.Namespace) -> dict:
+    from vad_bench import SAMPLE_RATE, FRAME_MS, load_corpus, read_wav, run_bench
+    from vad_config import VADConfig, load_vad
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"Nenhum WAV rotulado em {args.corpus}")
+    vad = load_vad()
+    if vad is None:
+        raise RuntimeError("Silero VAD indisponível")
+    profiles = {name: VADConfig.get_config(name) for name in args.profiles}
+    noise = read_wav(args.noise) if args.noise else None
+    hop = SAMPLE_RATE * FRAME_MS // 1000
+    meter = SpectralGate(hop, SAMPLE_RATE, budget=0.0)  # mede, mas nunca pula frames no benchmark
+    meter.costs = []
+
+    def _preprocess(audio: np.ndarray) -> np.ndarray:
+        # Perfil de ruído novo por arquivo, como uma sessão nova; custos somados no medidor
+        gate = SpectralGate(hop, SAMPLE_RATE, budget=0.0)
+        gate.costs = meter.costs
+        out = gate_array(audio, SAMPLE_RATE, FRAME_MS, gate)
+        meter.frames += gate.frames
+        meter.cpu_seconds += gate.cpu_seconds
+        return out
+
+    passthrough = await run_bench(corpus, profiles, noise, args.snr, vad=vad)
+    gated = await run_bench(corpus, profiles, noise, args.snr, vad=vad, preprocess=_preprocess)
+    return {"passthrough": passthrough, "gate": gated, "cost": _cost_summary(meter, FRAME_MS)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Supressão de ruído local × passthrough no corpus do vad_bench")
+    parser.add_argument("corpus", type=Path, help="pasta com .wav + .json de rótulos")
+    parser.add_argument("--profiles", nargs="+", default=["quiet", "moderate", "noisy"])
+    parser.add_argument("--noise", type=Path, help="WAV de ruído para misturar")
+    parser.add_argument("--snr", nargs="+", type=float, default=[20.0, 10.0, 5.0, 0.0])
+    parser.add_argument("--out", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    results = asyncio.run(bench(args))
+    print_comparison(results)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"Resultados gravados em {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,218 +1,117 @@
 # prompts.py
+#
+# Personas ficam em personas/<NOME>.md (texto livre, com a formatação que
+# ajudar quem escreve). Antes de ir para o modelo, cada uma é "compilada":
+# separadores decorativos, espaços e linhas em branco/duplicadas saem, porque
+# as instruções são enviadas em toda sessão e cada token de entrada custa
+# latência e dinheiro em todo turno realtime.
+#
+# Orçamento de tokens: PERSONA_TOKEN_BUDGET (padrão 2500) ou por persona em
+# PERSONA_TOKEN_BUDGETS="PROMPT_AGRINHO:2000,ASSISTANT:200". Estourou → erro.
+#
+#   python prompts.py    # relatório de tokens por persona (sai com 1 se estourar)
+
+import os
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+PERSONAS_DIR = Path(os.getenv("PERSONAS_DIR") or Path(__file__).resolve().parent / "personas")
+DEFAULT_PERSONA = "ASSISTANT"
+
+# Linha só com caracteres de enfeite (═══, ----, ****, ####...)
+_SEPARATOR = re.compile(r"^[\s═─━=\-_*#~·•.]{3,}$")
+
+
+class PersonaBudgetError(ValueError):
+    """A persona compilada passou do orçamento de tokens."""
+
+
+def _load_personas() -> dict[str, str]:
+    personas = {}
+    for path in sorted(PERSONAS_DIR.glob("*.md")):
+        personas[path.stem.upper()] = path.read_text(encoding="utf-8")
+    return personas
+
+
+# Mapa de seleção por nome (texto-fonte, antes de compilar)
+PERSONAS = _load_personas()
+
+# Nomes antigos, mantidos para quem importava as constantes
+PROMPT_ASSISTANT = PERSONAS.get("ASSISTANT", "")
+PROMPT_AGRINHO = PERSONAS.get("PROMPT_AGRINHO", "")
+PROMPT_VENDEDOR_GENTIL = PERSONAS.get("VENDEDOR_GENTIL", "")
+
+
+def compile_persona(text: str) -> str:
+    """Forma compacta: sem separadores, sem espaços sobrando, sem linhas vazias ou repetidas."""
+    seen: set[str] = set()
+    lines: list[str] = []
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line or _SEPARATOR.match(line):
+            continue
+        key = line.casefold()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def count_tokens(text: str) -> int:
+    """Tokens pelo tokenizer da OpenAI (tiktoken) se instalado; senão, estimativa ~4 caracteres/token."""
+    try:
+        import tiktoken
+    except ImportError:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def token_budget(name: str) -> int:
+    per_persona = {}
+    for item in os.getenv("PERSONA_TOKEN_BUDGETS", "").split(","):
+        persona, _, value = item.partition(":")
+        if persona.strip() and value.strip():
+            per_persona[persona.strip().upper()] = int(value)
+    return per_persona.get(name, int(os.getenv("PERSONA_TOKEN_BUDGET", "2500")))
+
+
+@lru_cache(maxsize=None)
+def compiled_persona(name: str) -> tuple[str, int]:
+    """(texto compilado, tokens) da persona; PersonaBudgetError se passar do orçamento."""
+    compiled = compile_persona(PERSONAS[name])
+    tokens = count_tokens(compiled)
+    budget = token_budget(name)
+    if tokens > budget:
+        raise PersonaBudgetError(f"persona {name}: {tokens} tokens compilados, orçamento {budget}")
+    return compiled, tokens
 
-# Personas pré-definidas
-PROMPT_ASSISTANT = (
-    "Você é um assistente de voz prestativo. "
-    "Fale em português (Brasil), de forma clara, objetiva e em frases curtas. "
-    "Se o usuário interromper, pare de falar imediatamente."
-)
-
-PROMPT_AGRINHO = (
-    """
-Você é Agrinho, um agricultor capixaba experiente, amigável e orgulhoso da terra do Espírito Santo.
-
-═══════════════════════════════════════════════
-PERSONALIDADE
-═══════════════════════════════════════════════
-
-Fale de forma SIMPLES, CLARA e ACOLHEDORA
-
-Use expressões naturais e típicas do Espírito Santo, mas de forma leve:
-
-"cê sabe né" (confirmação amistosa)
-
-"capaz" (surpresa ou concordância leve)
-
-"iá" (surpresa capixaba, de leve espanto)
-
-"pocar" (quando algo dá muito certo ou rende bem)
-
-"chapoca" (algo grande ou exagerado)
-
-"palha" (quando algo não é bom, de má qualidade)
-
-"gastura" (quando algo causa incômodo ou aflição)
-
-"tá bão demais" (satisfação genuína)
-
-Conte histórias curtas do campo capixaba quando fizer sentido
-
-Seja PACIENTE, DIDÁTICO e MOTIVADOR ao explicar
-
-Mostre PAIXÃO pela agricultura, pela educação e pela tecnologia que ajuda o campo
-
-Trate todos com RESPEITO, carinho e entusiasmo
-
-═══════════════════════════════════════════════
-CONHECIMENTO E EXPERIÊNCIA
-═══════════════════════════════════════════════
-
-40 anos de experiência com agricultura familiar e cooperativa
-
-Especialista em cultivos tradicionais do Espírito Santo:
-
-Café conilon, milho, feijão, tomate, mandioca
-
-Hortaliças (alface, couve, rúcula, etc.)
-
-Frutas tropicais (mamão, maracujá, abacaxi)
-
-Conhece PROFUNDAMENTE:
-
-Técnicas orgânicas e sustentáveis
-
-Manejo de solo e compostagem
-
-Controle natural de pragas
-
-Irrigação inteligente e boas práticas de economia de água
-
-Uso de tecnologia no campo (sensores, drones, aplicativos e maquinário moderno)
-
-Inteligência Artificial aplicada ao agro (monitoramento de lavouras, previsão de safras, análise de solo e clima)
-
-Entende o clima capixaba:
-
-Estações e períodos de plantio ideais
-
-Regiões de serra, litoral e norte do estado
-
-Épocas de chuva e seca
-
-Sabe que é uma INTELIGÊNCIA ARTIFICIAL criada pra conversar e ensinar de forma leve e educativa, mostrando como a tecnologia também pode ajudar o produtor rural e a sala de aula
-
-═══════════════════════════════════════════════
-REGRAS DE COMPORTAMENTO
-═══════════════════════════════════════════════
-
-BREVIDADE: Respostas com NO MÁXIMO 30 segundos de fala
-
-Seja objetivo, mas mantenha o carisma
-
-Vá direto ao ponto principal
-
-Ofereça mais detalhes se a pessoa pedir
-
-HONESTIDADE: Se não souber algo, ADMITE SEM VERGONHA
-
-Diga: "Olha, dessa aí eu não tenho certeza não, viu?"
-
-Sugira onde buscar informação
-
-Nunca invente dado técnico
-
-FERRAMENTAS: Use as tools disponíveis quando apropriado
-
-informacao_cultivo() → pra dados técnicos de plantio
-
-previsao_tempo() → pra clima e condições do estado
-
-tecnologia_agro() → pra novidades e inovações rurais
-
-SEMPRE prefira usar a tool a inventar dados
-
-INTERAÇÃO:
-
-Faça UMA pergunta por vez (sem bombardear)
-
-Escute com atenção (sem interromper)
-
-Adapte a linguagem conforme quem tá ouvindo:
-
-CRIANÇAS → use tom divertido e curioso, com exemplos simples e comparações criativas ("o drone é como um passarinho ajudante do agricultor")
-
-PROFESSORES → valorize o aprendizado e a conexão entre campo e educação
-
-PRODUTORES → use exemplos práticos e técnicos, mostrando como a tecnologia aumenta produtividade e sustentabilidade
-
-Seja encorajador e positivo com quem tá aprendendo
-
-TÓPICOS FORA DO ESCOPO:
-
-Se perguntarem sobre assuntos não agrícolas:
-
-Seja educado: "Rapaz, disso aí eu não entendo muito não, viu?"
-
-Redirecione com leveza: "Mas se quiser conversar sobre o campo, sustentabilidade ou as tecnologias que ajudam a gente, tamo junto!"
-
-Sempre traga a conversa de volta pro campo, pra tecnologia e pro aprendizado no agro
-
-Evite temas políticos, religiosos, polêmicos ou pessoais
-
-Mantenha o foco em agricultura, sustentabilidade, inovação e educação rural
-
-═══════════════════════════════════════════════
-CONHECIMENTO SOBRE TECNOLOGIA E IA NO AGRO
-═══════════════════════════════════════════════
-
-Entende que a tecnologia está transformando o campo com drones, sensores, irrigação automática, aplicativos e sistemas de gestão
-
-Sabe que a Inteligência Artificial (como ele mesmo) ajuda a analisar dados do clima, detectar pragas, melhorar a produtividade e ensinar práticas sustentáveis
-
-Valoriza a união entre o saber do campo e as inovações tecnológicas, mostrando que o futuro do agro depende da educação e da tecnologia trabalhando juntas
-
-Pode explicar esses conceitos de forma simples, especialmente pra crianças e jovens, mostrando como a tecnologia pode "pocar" de resultado no campo!
-
-═══════════════════════════════════════════════
-SOBRE O EVENTO
-═══════════════════════════════════════════════
-
-Você está na Cerimônia de Encerramento do Programa Agrinho Espírito Santo 2025
-
-Tema: "Tecnologia que transforma o campo"
-
-Local: Sesc Praia Formosa – Aracruz/ES
-
-Público: Estudantes, professores, produtores, gestores e convidados
-
-Realização: SENAR Espírito Santo
-
-Apoio: FAES / SENAR / Sindicatos Rurais
-
-Patrocínio: SEBRAE, SICOOB, Sistema OCB/ES
-
-O evento celebra o encerramento das atividades do Agrinho, reconhecendo os destaques estaduais e valorizando a integração entre tecnologia, inovação e sustentabilidade no campo capixaba
-
-Durante o evento há café da manhã, brincadeiras, scape rooms, entrevistas, robôs, plataforma 360, totem de fotos e premiações — um dia de alegria e aprendizado!
-
-═══════════════════════════════════════════════
-IMPORTANTE
-═══════════════════════════════════════════════
-
-Seja acolhedor, alegre e inspirador
-
-Mostre entusiasmo e orgulho da agricultura capixaba
-
-Fale sobre o futuro do campo e como a tecnologia e a educação podem transformá-lo
-
-Se a conversa fugir do tema, volte gentilmente para o agro e a importância da tecnologia rural
-
-Mantenha energia POSITIVA, linguagem simples e carisma natural
-
-Nunca fale como se estivesse vendo algo, você não consegue ver nada, apenas conversar. 
-
-Represente o SENAR-AR/ES e o Sistema FAES/SENAR/SINDICATOS com orgulho e entusiasmo
-
-Bora conversar sobre o futuro do campo, iá! 🌾✨
-"""
-
-
-)
-
-PROMPT_VENDEDOR_GENTIL = (
-    "Você é um consultor comercial gentil e objetivo. "
-    "Faça perguntas para entender a necessidade e recomende soluções de forma clara."
-)
-
-# Mapa de seleção por nome
-PERSONAS = {
-    "ASSISTANT": PROMPT_ASSISTANT,
-    "PROMPT_AGRINHO": PROMPT_AGRINHO,
-    "VENDEDOR_GENTIL": PROMPT_VENDEDOR_GENTIL,
-}
 
 def get_prompt(name: str | None) -> str:
-    """Retorna o prompt/persona pelo nome; fallback para ASSISTANT."""
-    if not name:
-        return PROMPT_ASSISTANT
-    return PERSONAS.get(name.upper(), PROMPT_ASSISTANT)
+    """Retorna o prompt/persona compilado pelo nome; fallback para ASSISTANT."""
+    key = (name or DEFAULT_PERSONA).upper()
+    if key not in PERSONAS:
+        key = DEFAULT_PERSONA
+    return compiled_persona(key)[0]
+
+
+def report() -> int:
+    """Imprime tokens por persona (fonte → compilado) e devolve 1 se alguma estourar o orçamento."""
+    status = 0
+    print(f"{'persona':<20} {'fonte':>7} {'compilado':>10} {'economia':>9} {'orçamento':>10}")
+    for name, text in PERSONAS.items():
+        raw = count_tokens(text)
+        compiled = count_tokens(compile_persona(text))
+        budget = token_budget(name)
+        flag = "" if compiled <= budget else "  ❌ acima do orçamento"
+        if flag:
+            status = 1
+        saved = 100 * (raw - compiled) / raw if raw else 0.0
+        print(f"{name:<20} {raw:>7} {compiled:>10} {saved:>8.0f}% {budget:>10}{flag}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(report())
@@ -1,17 +1,84 @@
 import os
+import json
+import logging
+import time
 import signal
 import sys
+import asyncio
 import subprocess
-import threading
+from collections import deque
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from settings import setup_logging
+from log_pipeline import bind as bind_log_context
+from turn_metrics import MetricsRegistry
+
+# Mesmo pipeline de log do agente (fila + thread, texto ou JSON)
+setup_logging()
+log = logging.getLogger("server")
+# Linhas do agente que não são protocolo (prints perdidos, avisos de bibliotecas)
+agent_log = logging.getLogger("server.agent")
 
 app = FastAPI(title="Agrinho Voice Agent Backend - Robusto")
 
-_process_lock = threading.Lock()
-_agent_proc: subprocess.Popen | None = None
+# Gestão de processos 100% asyncio: nada aqui bloqueia o event loop do FastAPI.
+# As rotas só registram a intenção (mandar um comando, agendar um encerramento)
+# e respondem na hora; esperas e escalonamento de sinais rodam em tasks, e o
+# supervisor (_supervise) repõe processos que caíram, com backoff exponencial.
+#
+# Pool de workers: AGENT_WORKERS processos agent_direct.py --standby (um por
+# core por padrão), todos pré-aquecidos — já importaram tudo e carregaram
+# VAD/MCP/persona. Cada sala nova vai para o worker menos carregado (salas e
+# CPU que ele reporta); salas em andamento nunca mudam de processo. Um worker
+# em reciclagem (idade, memória ou POST /drain) para de receber salas, ganha
+# substituto na hora e só sai quando a última conversa dele termina.
+#
+#   AGENT_WORKERS=0              processos no pool (0 = núcleos da máquina)
+#   AGENT_RECYCLE_AFTER=0        segundos de vida até reciclar (0 desliga)
+#   AGENT_RECYCLE_RSS_MB=0       RSS reportado acima do qual recicla (0 desliga)
+#   AGENT_DRAIN_TIMEOUT=20       segundos para um agente drenar antes do SIGTERM
+#   AGENT_TERM_TIMEOUT=5         segundos entre SIGTERM e SIGKILL
+#   AGENT_RESTART_BACKOFF=1      primeiro atraso de reinício após uma queda
+#   AGENT_RESTART_BACKOFF_MAX=30
+#   AGENT_STABLE_AFTER=60        processo que viveu mais que isso zera o backoff
+
+# Cada processo de agente hospeda várias salas (uma AgentSession por sala)
+MAX_ROOMS_PER_PROCESS = int(os.getenv("AGENT_MAX_ROOMS_PER_PROCESS", "8"))
+DEFAULT_ROOM = os.getenv("LIVEKIT_ROOM", "agrinho-demo")
+DEFAULT_IDENTITY = os.getenv("AGENT_IDENTITY", "agrinho-agent")
+
+POOL_SIZE = int(os.getenv("AGENT_WORKERS", "0")) or (os.cpu_count() or 1)
+RECYCLE_AFTER = float(os.getenv("AGENT_RECYCLE_AFTER", "0"))
+RECYCLE_RSS_MB = float(os.getenv("AGENT_RECYCLE_RSS_MB", "0"))
+
+DRAIN_TIMEOUT = float(os.getenv("AGENT_DRAIN_TIMEOUT", "20"))
+TERM_TIMEOUT = float(os.getenv("AGENT_TERM_TIMEOUT", "5"))
+RESTART_BACKOFF = float(os.getenv("AGENT_RESTART_BACKOFF", "1"))
+RESTART_BACKOFF_MAX = float(os.getenv("AGENT_RESTART_BACKOFF_MAX", "30"))
+STABLE_AFTER = float(os.getenv("AGENT_STABLE_AFTER", "60"))
+
+# Controle de admissão: cada processo reporta (evento "usage") CPU, RSS, atraso
+# do event loop e a conta de cada sala. Processo acima de um limite não recebe
+# salas novas; sem worker com folga, o /start recusa (503) ou redireciona (307
+# para ADMISSION_REDIRECT_URL) em vez de degradar as conversas em andamento.
+# Salas retomadas após queda não passam pela admissão.
+#
+#   ADMISSION_MAX_CPU=85         % de um core por processo
+#   ADMISSION_MAX_LOOP_LAG_MS=100  p95 do atraso do event loop do processo
+#   ADMISSION_MAX_RSS_MB=0       0 desliga
+#   ADMISSION_MAX_ROOMS=0        salas no total (0 = sem limite)
+#   ADMISSION_REDIRECT_URL=      outro backend para onde mandar o /start recusado
+ADMISSION_MAX_CPU = float(os.getenv("ADMISSION_MAX_CPU", "85"))
+ADMISSION_MAX_LOOP_LAG_MS = float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "100"))
+ADMISSION_MAX_RSS_MB = float(os.getenv("ADMISSION_MAX_RSS_MB", "0"))
+ADMISSION_MAX_ROOMS = int(os.getenv("ADMISSION_MAX_ROOMS", "0"))
+ADMISSION_REDIRECT_URL = os.getenv("ADMISSION_REDIRECT_URL", "")
+
+# Snapshots de métricas passam de 64 KiB (limite padrão do StreamReader)
+_STDOUT_LIMIT = 4 * 1024 * 1024
 
 BASE_DIR = Path(__file__).parent.resolve()
 
@@ -22,121 +89,591 @@ PYTHON_EXE = sys.executable or "python"
 AGENT_SCRIPT = str(BASE_DIR / "agent_direct.py")
 
 
-def _is_process_alive() -> bool:
-    global _agent_proc
+class AgentProc:
+    """Um worker (processo agent_direct.py --standby) e o que o backend sabe dele."""
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+        self.pid = proc.pid
+        self.state = "warming"        # warming → ready → draining → exited
+        self.rooms: dict[str, str] = {}  # sala -> identity (para reentrar após queda)
+        self.served = 0               # salas atribuídas desde que subiu
+        self.recycle_reason: str | None = None
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.expected_exit = False    # True quando fomos nós que pedimos para sair
+        self.exited = asyncio.Event()
+        self.returncode: int | None = None
+        self.reader: asyncio.Task | None = None
+
+    @property
+    def alive(self) -> bool:
+        return self.returncode is None and self.proc.returncode is None
+
+    @property
+    def uptime(self) -> float:
+        return time.monotonic() - self._started
+
+    async def send(self, cmd: str, **data) -> None:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write((json.dumps({"cmd": cmd, **data}) + "\n").encode("utf-8"))
+        await self.proc.stdin.drain()
+
+    @property
+    def usage(self) -> dict:
+        """Último relatório de uso do processo (vazio até o primeiro)."""
+        return (_usage_by_pid.get(self.pid) or {}).get("process") or {}
+
+    @property
+    def load(self) -> float:
+        """Fração da capacidade em uso: a maior entre salas e CPU reportada."""
+        # As salas contam na hora; a CPU chega a cada METRICS_INTERVAL
+        sessions = max(len(self.rooms), self.usage.get("sessions", 0))
+        return max(sessions / MAX_ROOMS_PER_PROCESS, self.usage.get("cpu_percent", 0.0) / ADMISSION_MAX_CPU)
+
+    def info(self) -> dict:
+        return {
+            "pid": self.pid,
+            "state": self.state,
+            "rooms": list(self.rooms),
+            "load": round(self.load, 2),
+            "served": self.served,
+            "recycle_reason": self.recycle_reason,
+            "uptime": round(self.uptime, 1),
+            "started_at": self.started_at,
+        }
+
+
+_workers: list[AgentProc] = []           # processos vivos do pool
+_rooms: dict[str, AgentProc] = {}        # sala -> processo que a hospeda
+_orphans: dict[str, str] = {}            # salas de um processo que caiu: sala -> identity
+_background: set[asyncio.Task] = set()
+
+# Supervisor: histórico de saídas, reinícios e janela de backoff
+_started_at = time.time()
+_exits: deque = deque(maxlen=50)
+_counters = {"spawned": 0, "crashes": 0, "restarts": 0, "recycled": 0}
+_pending_restarts = 0
+_crash_streak = 0
+_next_spawn_at = 0.0                     # time.monotonic() antes do qual não se reinicia
+_wakeup: asyncio.Event | None = None
+_supervisor_task: asyncio.Task | None = None
+_shutting_down = False
+
+# Último snapshot de métricas de turno de cada processo vivo; os de processos
+# que já saíram são somados em _retired_metrics para os contadores não voltarem.
+_metrics_by_pid: dict[int, dict] = {}
+_retired_metrics = MetricsRegistry()
+# Último relatório de uso de cada processo vivo e contagem de /start recusados
+_usage_by_pid: dict[int, dict] = {}
+_refused: dict[str, int] = {}
+
+
+def _spawn_task(coro, name: str) -> asyncio.Task:
+    """Dispara uma coroutine em background mantendo referência até terminar."""
+    task = asyncio.create_task(coro, name=name)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def _wake() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _spawn_worker() -> AgentProc:
+    """Inicia um worker em modo standby (pré-aquecido) e acompanha seu stdout."""
+    log.info("🚀 Iniciando worker: %s -u %s --standby", PYTHON_EXE, AGENT_SCRIPT)
+    # Inicia em nova sessão/grupo para facilitar encerramento em cascata
+    kwargs: dict = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+    else:
+        # POSIX: criar nova sessão
+        kwargs["start_new_session"] = True
+
+    proc = await asyncio.create_subprocess_exec(
+        PYTHON_EXE, "-u", AGENT_SCRIPT, "--standby",
+        cwd=str(BASE_DIR),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=None,
+        limit=_STDOUT_LIMIT,
+        **kwargs,
+    )
+    agent = AgentProc(proc)
+    _workers.append(agent)
+    _counters["spawned"] += 1
+    agent.reader = _spawn_task(_watch_stdout(agent), name=f"agent-{agent.pid}-stdout")
+    log.info("Worker iniciado com PID: %d", agent.pid)
+    return agent
+
+
+async def _watch_stdout(agent: AgentProc) -> None:
+    """Lê os eventos JSON do agente; linhas que não são protocolo viram log."""
+    assert agent.proc.stdout is not None
     try:
-        if _agent_proc is None:
-            return False
-        return _agent_proc.poll() is None
-    except Exception:
+        async for raw in agent.proc.stdout:
+            line = raw.decode("utf-8", errors="replace").rstrip("\n")
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                msg = None
+            if not isinstance(msg, dict) or "event" not in msg:
+                agent_log.info("[%d] %s", agent.pid, line)
+                continue
+            _on_event(agent, msg)
+    except Exception as e:
+        log.warning("⚠️ Leitura do stdout do PID %d falhou: %s", agent.pid, e)
+    # EOF: o processo terminou (ou fechou o stdout); espera o código de saída
+    code = await agent.proc.wait()
+    _on_exit(agent, code)
+
+
+def _on_event(agent: AgentProc, msg: dict) -> None:
+    event = msg["event"]
+    if event == "ready":
+        if agent.state == "warming":
+            agent.state = "ready"
+        log.info("✅ Worker PID %d pronto.", agent.pid)
+    elif event == "metrics":
+        _metrics_by_pid[agent.pid] = msg.get("data") or {}
+    elif event == "usage":
+        _usage_by_pid[agent.pid] = msg.get("data") or {}
+    elif event == "left":
+        room = msg.get("room")
+        agent.rooms.pop(room, None)
+        if _rooms.get(room) is agent:
+            del _rooms[room]
+        err = f" (erro: {msg['error']})" if msg.get("error") else ""
+        log.info("👋 PID %d saiu da sala '%s'%s.", agent.pid, room, err)
+        if agent.state == "draining" and not agent.rooms:
+            _wake()  # última conversa de um worker em reciclagem: o supervisor o encerra
+    elif event == "drained":
+        log.info("🚰 PID %d drenado; encerrando.", agent.pid)
+
+
+def _on_exit(agent: AgentProc, code: int) -> None:
+    """Tira o processo dos pools e, se não foi pedido, agenda o reinício com backoff."""
+    global _pending_restarts, _crash_streak, _next_spawn_at
+    agent.returncode = code
+    previous_state = agent.state
+    agent.state = "exited"
+    agent.exited.set()
+    if agent in _workers:
+        _workers.remove(agent)
+    lost = {room: identity for room, identity in agent.rooms.items() if _rooms.get(room) is agent}
+    for room in lost:
+        del _rooms[room]
+    _usage_by_pid.pop(agent.pid, None)
+    last_metrics = _metrics_by_pid.pop(agent.pid, None)
+    if last_metrics:
+        # Gauges de processo morto não fazem sentido; só histogramas/contadores
+        _retired_metrics.merge_snapshot({**last_metrics, "gauges": []})
+
+    crashed = not agent.expected_exit and not _shutting_down
+    _exits.append({
+        "pid": agent.pid,
+        "code": code,
+        "state": previous_state,
+        "uptime": round(agent.uptime, 1),
+        "at": time.time(),
+        "crashed": crashed,
+        "rooms": list(lost),
+    })
+    log.info("Processo PID %d saiu (código %s); salas perdidas: %s.", agent.pid, code, list(lost))
+    if not crashed:
+        _wake()
+        return
+
+    _counters["crashes"] += 1
+    _pending_restarts += 1
+    # Queda logo depois de subir = provavelmente vai cair de novo: espera mais a cada vez
+    _crash_streak = _crash_streak + 1 if agent.uptime < STABLE_AFTER else 1
+    delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF * 2 ** (_crash_streak - 1))
+    _next_spawn_at = time.monotonic() + delay
+    # Salas que estavam no ar voltam em outro processo depois do backoff
+    _orphans.update(lost)
+    log.warning("⚠️ Queda do PID %d; reinício em %.1fs (quedas seguidas: %d).",
+                agent.pid, delay, _crash_streak)
+    _wake()
+
+
+def _recycle(agent: AgentProc, reason: str) -> bool:
+    """Para de mandar salas ao worker; ele sai quando a última conversa terminar."""
+    if agent.state == "draining" or not agent.alive:
         return False
+    agent.state = "draining"
+    agent.recycle_reason = reason
+    _counters["recycled"] += 1
+    log.info("♻️ Reciclando PID %d (%s); %d sala(s) ainda em andamento.", agent.pid, reason, len(agent.rooms))
+    _wake()  # o substituto sobe já
+    return True
 
 
-def _start_agent() -> tuple[bool, str, int | None]:
-    global _agent_proc
-    with _process_lock:
-        if _is_process_alive():
-            return True, "already_running", _agent_proc.pid if _agent_proc else None
+def _check_recycle() -> None:
+    for agent in list(_workers):
+        if agent.state != "ready":
+            continue
+        if RECYCLE_AFTER and agent.uptime >= RECYCLE_AFTER:
+            _recycle(agent, "age")
+        elif RECYCLE_RSS_MB and agent.usage.get("rss_mb", 0.0) >= RECYCLE_RSS_MB:
+            _recycle(agent, "rss")
+
+
+async def _supervise() -> None:
+    """Mantém o pool cheio, recicla workers e devolve salas órfãs a um processo vivo."""
+    global _pending_restarts
+    assert _wakeup is not None
+    while not _shutting_down:
+        delay = _next_spawn_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue
         try:
-            print(f"[Server.py Robusto] Tentando iniciar: {PYTHON_EXE} -u {AGENT_SCRIPT}")
-            # Inicia em nova sessão/grupo para facilitar encerramento em cascata
-            creationflags = 0
-            preexec_fn = None
-            start_new_session = False
-            if os.name == "nt":
-                creationflags = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
-            else:
-                # POSIX: criar nova sessão
-                start_new_session = True
-
-            _agent_proc = subprocess.Popen(
-                [PYTHON_EXE, "-u", AGENT_SCRIPT],
-                cwd=str(BASE_DIR),
-                stdout=None,
-                stderr=None,
-                creationflags=creationflags,
-                start_new_session=start_new_session,
-                preexec_fn=preexec_fn,
-            )
-            print(f"[Server.py Robusto] Processo iniciado com PID: {_agent_proc.pid}")
-            return True, "started", _agent_proc.pid
+            _check_recycle()
+            # Worker em reciclagem que já não tem conversas: sai agora
+            for agent in [a for a in _workers if a.state == "draining" and not a.rooms and not a.expected_exit]:
+                _spawn_task(_retire(agent), name=f"retire-{agent.pid}")
+            active = sum(1 for a in _workers if a.state in ("warming", "ready"))
+            for _ in range(max(0, POOL_SIZE - active)):
+                await _spawn_worker()
+                if _pending_restarts:
+                    _pending_restarts -= 1
+                    _counters["restarts"] += 1
+            for room, identity in list(_orphans.items()):
+                _orphans.pop(room, None)
+                if room in _rooms:
+                    continue
+                ok, status, pid = await _start_room(room, identity)
+                log.info("♻️ Sala '%s' retomada após queda: %s (PID %s).", room, status, pid)
+                if ok and _pending_restarts:
+                    _pending_restarts -= 1
+                    _counters["restarts"] += 1
         except Exception as e:
-            print(f"[Server.py Robusto] ERRO ao iniciar processo: {e}")
-            _agent_proc = None
-            return False, f"error:{e}", None
-
-
-def _kill_agent() -> tuple[bool, str]:
-    global _agent_proc
-    with _process_lock:
-        if not _is_process_alive() or _agent_proc is None:
-            print("[Server.py Robusto] Agente já não estava rodando.")
-            _agent_proc = None
-            return True, "not_running"
-        pid_to_kill = _agent_proc.pid
-        print(f"[Server.py Robusto] Tentando encerrar processo com PID: {pid_to_kill}")
+            log.error("❌ ERRO no supervisor: %s", e)
+            _wakeup.clear()
+            await asyncio.sleep(RESTART_BACKOFF)
+            continue
+        _wakeup.clear()
         try:
-            if os.name == "nt":
-                print("[Server.py Robusto] Windows: tentando CTRL_BREAK_EVENT...")
-                try:
-                    _agent_proc.send_signal(getattr(signal, "CTRL_BREAK_EVENT", signal.SIGTERM))
-                except Exception:
-                    print("[Server.py Robusto] CTRL_BREAK_EVENT indisponível. Usando terminate().")
-                    _agent_proc.terminate()
-                try:
-                    _agent_proc.wait(timeout=5)
-                    print("[Server.py Robusto] Processo encerrou no Windows.")
-                except subprocess.TimeoutExpired:
-                    print("[Server.py Robusto] Timeout no Windows. Forçando kill().")
-                    _agent_proc.kill()
-                    _agent_proc.wait(timeout=5)
-                    print("[Server.py Robusto] Processo encerrado via kill().")
+            # Acorda em cada saída e reciclagem; de tempos em tempos confere idade e RSS
+            await asyncio.wait_for(_wakeup.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _saturation(agent: AgentProc) -> str | None:
+    """Motivo pelo qual o worker não deve receber outra sala (None = tem folga)."""
+    if agent.state == "draining":
+        return "draining"
+    if len(agent.rooms) >= MAX_ROOMS_PER_PROCESS:
+        return "rooms"
+    proc = agent.usage
+    if proc.get("cpu_percent", 0.0) >= ADMISSION_MAX_CPU:
+        return "cpu"
+    if (proc.get("loop_lag_ms") or {}).get("p95", 0.0) >= ADMISSION_MAX_LOOP_LAG_MS:
+        return "loop_lag"
+    if ADMISSION_MAX_RSS_MB and proc.get("rss_mb", 0.0) >= ADMISSION_MAX_RSS_MB:
+        return "rss"
+    return None
+
+
+def _available_workers() -> list[AgentProc]:
+    """Workers com folga, do menos para o mais carregado (prontos antes dos que aquecem)."""
+    workers = [a for a in _workers if a.alive and a.state in ("ready", "warming") and _saturation(a) is None]
+    return sorted(workers, key=lambda a: (a.state != "ready", a.load, -a.uptime))
+
+
+def _admission(room: str) -> str | None:
+    """None se a sala pode entrar agora; senão o motivo da recusa."""
+    owner = _rooms.get(room)
+    if owner is not None and owner.alive:
+        return None
+    if ADMISSION_MAX_ROOMS and len(_rooms) >= ADMISSION_MAX_ROOMS:
+        return "max_rooms"
+    if _available_workers():
+        return None
+    active = [a for a in _workers if a.alive and a.state != "draining"]
+    if not active:
+        return None  # pool vazio (subindo ou em backoff): _start_room faz cold start
+    return "saturated:" + ",".join(sorted({_saturation(a) or "unknown" for a in active}))
+
+
+async def _start_room(room: str, identity: str) -> tuple[bool, str, int | None]:
+    owner = _rooms.get(room)
+    if owner is not None and owner.alive:
+        return True, "already_running", owner.pid
+    try:
+        workers = _available_workers()
+        if not workers:
+            # Só chega aqui sala retomada após queda (sem admissão): vai para o menos carregado
+            workers = sorted((a for a in _workers if a.alive and a.state in ("ready", "warming")),
+                             key=lambda a: (a.state != "ready", a.load))
+        if workers:
+            agent = workers[0]
+            if agent.state == "warming":
+                status = "started_warming"  # lê o comando assim que terminar de aquecer
             else:
-                pgid = os.getpgid(pid_to_kill)
-                print(f"[Server.py Robusto] Encontrado PGID: {pgid}. Enviando SIGTERM...")
-                os.killpg(pgid, signal.SIGTERM)
-                try:
-                    _agent_proc.wait(timeout=5)
-                    print("[Server.py Robusto] Processo encerrou com SIGTERM.")
-                except subprocess.TimeoutExpired:
-                    print("[Server.py Robusto] Timeout com SIGTERM. Enviando SIGKILL...")
-                    os.killpg(pgid, signal.SIGKILL)
-                    try:
-                        _agent_proc.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        print("[Server.py Robusto] Ainda vivo após SIGKILL. Chamando kill() direto no processo.")
-                        _agent_proc.kill()
-                        _agent_proc.wait(timeout=5)
-                    print("[Server.py Robusto] Processo encerrou com SIGKILL/kill().")
-            _agent_proc = None
-            return True, f"killed:{pid_to_kill}"
-        except Exception as e:
-            print(f"[Server.py Robusto] ERRO ao encerrar processo: {e}")
+                status = "started_shared" if agent.rooms else "started_warm"
+        else:
+            agent = await _spawn_worker()
+            status = "started_cold"
+        _rooms[room] = agent
+        agent.rooms[room] = identity
+        agent.served += 1
+        await agent.send("join", room=room, identity=identity)
+        log.info("🎬 Sala '%s' atribuída ao PID %d (%s, carga %.2f).", room, agent.pid, status, agent.load)
+    except Exception as e:
+        log.error("❌ ERRO ao iniciar sala '%s': %s", room, e)
+        return False, f"error:{e}", None
+    return True, status, agent.pid
+
+
+async def _close_room(room: str) -> tuple[bool, str]:
+    _orphans.pop(room, None)
+    owner = _rooms.pop(room, None)
+    if owner is None or not owner.alive:
+        log.info("Sala '%s' já não estava ativa.", room)
+        return True, "not_running"
+    owner.rooms.pop(room, None)
+    try:
+        # Só esta sala é encerrada; o agente termina a fala em andamento e sai
+        await owner.send("leave", room=room)
+        log.info("🚪 Pedido de saída da sala '%s' enviado ao PID %d.", room, owner.pid)
+        return True, f"leaving:{owner.pid}"
+    except Exception as e:
+        log.error("❌ ERRO ao encerrar sala '%s': %s", room, e)
+        return False, f"error:{e}"
+
+
+async def _wait_exit(agent: AgentProc, timeout: float) -> bool:
+    try:
+        await asyncio.wait_for(agent.exited.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def _signal(agent: AgentProc, sig: int) -> None:
+    """Sinal para o grupo do processo (POSIX) ou para o processo (Windows)."""
+    if os.name == "nt":
+        if sig == signal.SIGTERM:
             try:
-                if _agent_proc:
-                    _agent_proc.kill()
+                agent.proc.send_signal(getattr(signal, "CTRL_BREAK_EVENT", signal.SIGTERM))
             except Exception:
-                pass
-            _agent_proc = None
-            return False, f"error:{e}"
+                log.warning("⚠️ CTRL_BREAK_EVENT indisponível. Usando terminate().")
+                agent.proc.terminate()
+        else:
+            agent.proc.kill()
+        return
+    try:
+        os.killpg(os.getpgid(agent.pid), sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _retire(agent: AgentProc, drain: bool = True) -> None:
+    """
+    Encerra o processo sem travar ninguém: drena (as salas terminam a fala em
+    andamento e saem), depois escala SIGTERM → SIGKILL se não sair a tempo.
+    """
+    agent.expected_exit = True
+    if not agent.alive:
+        return
+    agent.state = "draining"
+    if drain:
+        try:
+            await agent.send("drain")
+            if await _wait_exit(agent, DRAIN_TIMEOUT):
+                log.info("PID %d encerrou após drenar.", agent.pid)
+                return
+            log.warning("⚠️ PID %d não drenou em %.0fs; enviando SIGTERM...", agent.pid, DRAIN_TIMEOUT)
+        except Exception as e:
+            log.warning("⚠️ Falha ao pedir drenagem ao PID %d (%s); enviando SIGTERM...", agent.pid, e)
+    _signal(agent, signal.SIGTERM)
+    if await _wait_exit(agent, TERM_TIMEOUT):
+        log.info("PID %d encerrou com SIGTERM.", agent.pid)
+        return
+    log.warning("⚠️ Timeout com SIGTERM no PID %d. Enviando SIGKILL...", agent.pid)
+    _signal(agent, signal.SIGKILL)
+    if not await _wait_exit(agent, TERM_TIMEOUT):
+        log.error("❌ PID %d ainda vivo após SIGKILL. Chamando kill() direto no processo.", agent.pid)
+        try:
+            agent.proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+@app.on_event("startup")
+async def _on_startup() -> None:
+    global _wakeup, _supervisor_task
+    log.info("🔥 Pré-aquecendo pool de %d worker(s)...", POOL_SIZE)
+    _wakeup = asyncio.Event()
+    _supervisor_task = asyncio.create_task(_supervise(), name="agent-supervisor")
+
+
+@app.on_event("shutdown")
+async def _on_shutdown() -> None:
+    global _shutting_down
+    _shutting_down = True
+    _wake()
+    if _supervisor_task is not None:
+        _supervisor_task.cancel()
+    agents = list(_workers)
+    _orphans.clear()
+    # Worker sem conversa vai direto para o SIGTERM; os com salas drenam em paralelo
+    await asyncio.gather(
+        *(_retire(a, drain=bool(a.rooms)) for a in agents),
+        return_exceptions=True,
+    )
+    _rooms.clear()
+
+
+async def _read_body(request: Request) -> dict:
+    """Corpo JSON opcional (o proxy do frontend pode mandar vazio)."""
+    raw = await request.body()
+    if not raw.strip():
+        return {}
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
 
 
 # --- Rotas da API ---
 @app.post("/start")
-async def start() -> JSONResponse:
-    print("[Server.py Robusto] Recebida requisição POST /start")
-    ok, status, pid = _start_agent()
-    return JSONResponse({"ok": ok, "status": status, "pid": pid})
+async def start(request: Request) -> JSONResponse:
+    log.info("Recebida requisição POST /start")
+    body = await _read_body(request)
+    room = str(body.get("room") or DEFAULT_ROOM)
+    bind_log_context(room=room)
+    identity = str(body.get("identity") or DEFAULT_IDENTITY)
+    refusal = _admission(room)
+    if refusal is not None:
+        _refused[refusal] = _refused.get(refusal, 0) + 1
+        payload = {"ok": False, "status": "refused", "reason": refusal, "room": room, "identity": identity}
+        if ADMISSION_REDIRECT_URL:
+            log.warning("↪️ Sala '%s' recusada (%s); redirecionando para %s.", room, refusal, ADMISSION_REDIRECT_URL)
+            return JSONResponse({**payload, "redirect": ADMISSION_REDIRECT_URL}, status_code=307,
+                                headers={"Location": ADMISSION_REDIRECT_URL})
+        log.warning("⛔ Sala '%s' recusada: %s.", room, refusal)
+        return JSONResponse(payload, status_code=503, headers={"Retry-After": "10"})
+    ok, status, pid = await _start_room(room, identity)
+    return JSONResponse({"ok": ok, "status": status, "pid": pid, "room": room, "identity": identity})
+
+
+@app.post("/drain")
+async def drain(request: Request) -> JSONResponse:
+    """Recicla um worker (`{"pid": 123}`): sem salas novas, substituto já, sai ao esvaziar."""
+    body = await _read_body(request)
+    agent = next((a for a in _workers if a.pid == body.get("pid")), None)
+    if agent is None:
+        return JSONResponse({"ok": False, "status": "unknown_pid", "pid": body.get("pid")}, status_code=404)
+    recycled = _recycle(agent, "manual")
+    return JSONResponse({"ok": True, "status": "draining" if recycled else "already_draining", **agent.info()})
 
 
 @app.post("/close")
-async def close() -> JSONResponse:
-    print("[Server.py Robusto] Recebida requisição POST /close")
-    ok, status = _kill_agent()
-    return JSONResponse({"ok": ok, "status": status})
+async def close(request: Request) -> JSONResponse:
+    log.info("Recebida requisição POST /close")
+    body = await _read_body(request)
+    room = str(body.get("room") or DEFAULT_ROOM)
+    bind_log_context(room=room)
+    ok, status = await _close_room(room)
+    return JSONResponse({"ok": ok, "status": status, "room": room})
+
+
+def _collect_metrics() -> MetricsRegistry:
+    merged = MetricsRegistry()
+    merged.merge_snapshot(_retired_metrics.snapshot())
+    for pid, snap in _metrics_by_pid.items():
+        merged.merge_snapshot(snap, pid=str(pid))
+    for pid, usage in _usage_by_pid.items():
+        proc = usage.get("process") or {}
+        merged.set_gauge("agrinho_process_cpu_percent", proc.get("cpu_percent", 0.0), pid=str(pid))
+        merged.set_gauge("agrinho_process_rss_mb", proc.get("rss_mb", 0.0), pid=str(pid))
+        merged.set_gauge("agrinho_event_loop_lag_ms", (proc.get("loop_lag_ms") or {}).get("p95", 0.0), pid=str(pid))
+        for room, s in (usage.get("sessions") or {}).items():
+            for kind, seconds in (s.get("audio_cpu_seconds") or {}).items():
+                merged.set_gauge("agrinho_session_audio_cpu_seconds", seconds, room=room, kind=kind)
+            merged.set_gauge("agrinho_session_audio_bytes", s.get("bytes_in", 0), room=room, direction="in")
+            merged.set_gauge("agrinho_session_audio_bytes", s.get("bytes_out", 0), room=room, direction="out")
+            merged.set_gauge("agrinho_session_tool_seconds", s.get("tool_seconds", 0.0), room=room)
+            merged.set_gauge("agrinho_session_context_bytes", s.get("context_bytes", 0), room=room)
+    for reason, count in _refused.items():
+        merged.inc("agrinho_admission_refused_total", count, reason=reason)
+    return merged
+
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    """Latência por turno agregada de todos os processos (Prometheus ou ?format=json)."""
+    merged = _collect_metrics()
+    if format == "json":
+        return JSONResponse({"ok": True, "summary": merged.summary()})
+    return PlainTextResponse(merged.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/status")
+async def status() -> JSONResponse:
+    """Estado do supervisor: uptime, reinícios, processos vivos e últimos códigos de saída."""
+    backoff = max(0.0, _next_spawn_at - time.monotonic())
+    return JSONResponse({
+        "ok": True,
+        "uptime": round(time.time() - _started_at, 1),
+        "supervisor": {
+            **_counters,
+            "crash_streak": _crash_streak,
+            "restart_in": round(backoff, 1),
+            "orphan_rooms": list(_orphans),
+        },
+        "pool_size": POOL_SIZE,
+        "workers": [a.info() for a in _workers],
+        "exits": list(_exits)[-20:],
+    })
+
+
+@app.get("/usage")
+async def usage() -> JSONResponse:
+    """Uso de recursos por processo e por sala, limites de admissão e recusas."""
+    processes = []
+    for agent in _workers:
+        report = _usage_by_pid.get(agent.pid) or {}
+        processes.append({
+            **agent.info(),
+            "usage": report.get("process"),
+            "sessions": report.get("sessions") or {},
+            "saturated": _saturation(agent),
+        })
+    return JSONResponse({
+        "ok": True,
+        "admission": {
+            "accepting": _admission("") is None,
+            "limits": {
+                "cpu_percent": ADMISSION_MAX_CPU,
+                "loop_lag_ms": ADMISSION_MAX_LOOP_LAG_MS,
+                "rss_mb": ADMISSION_MAX_RSS_MB or None,
+                "rooms": ADMISSION_MAX_ROOMS or None,
+                "rooms_per_process": MAX_ROOMS_PER_PROCESS,
+                "processes": POOL_SIZE,
+            },
+            "refused": dict(_refused),
+        },
+        "processes": processes,
+    })
 
 
 @app.get("/")
 async def root() -> JSONResponse:
-    print("[Server.py Robusto] Recebida requisição GET /")
-    return JSONResponse({"ok": True, "status": "running"})
+    log.info("Recebida requisição GET /")
+    pool = {
+        "ready": sum(1 for a in _workers if a.state == "ready"),
+        "warming": sum(1 for a in _workers if a.state == "warming"),
+        "draining": sum(1 for a in _workers if a.state == "draining"),
+        "target": POOL_SIZE,
+    }
+    workers = [{"pid": a.pid, "state": a.state, "rooms": list(a.rooms), "load": round(a.load, 2)} for a in _workers]
+    return JSONResponse({"ok": True, "status": "running", "pool": pool, "workers": workers})
@@ -0,0 +1,297 @@
+# session_usage.py - Quanto cada sessão custa ao processo
+#
+# Várias salas dividem o mesmo processo (RoomHost) e uma sala barulhenta podia
+# tomar o core das outras sem ninguém ver. Cada sessão acumula aqui:
+#   - CPU do caminho de áudio: inferência do VAD (medida pelo Silero em cada
+#     janela) e supressão de ruído feita em Python (quem fizer chama add_cpu)
+#   - bytes de áudio recebidos do visitante e enviados para a sala
+#   - tempo gasto em tools (chamadas MCP)
+#   - memória do contexto de conversa (texto guardado no chat_ctx)
+# O processo soma CPU total, RSS e atraso do event loop. Tudo vai para o
+# server.py no evento "usage" e alimenta o controle de admissão do /start.
+#
+# O BVC roda no código nativo do LiveKit, fora do Python: não entra na conta.
+# A sessão vigente vive numa ContextVar (como o contexto de log), então as
+# tasks da AgentSession — e as tools que elas executam — sabem a quem cobrar.
+
+import os
+import sys
+import time
+import asyncio
+import contextvars
+from typing import Any
+
+from livekit.agents import vad
+from livekit.agents.metrics import VADMetrics
+from livekit.agents.metrics.base import Metadata
+
+from audio_io import tap_session_audio, tap_session_output
+
+_current: contextvars.ContextVar["SessionUsage | None"] = contextvars.ContextVar("session_usage", default=None)
+_sessions: dict[str, "SessionUsage"] = {}
+
+
+class SessionUsage:
+    """Contadores de recursos de uma sessão (uma sala)."""
+
+    def __init__(self, room: str) -> None:
+        self.room = room
+        self.cpu: dict[str, float] = {"vad": 0.0, "nc": 0.0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.tool_calls = 0
+        self.tool_seconds = 0.0
+        self._agent: Any = None
+        self._session: Any = None
+        self._started = time.monotonic()
+        self._last = (self._started, 0.0, 0, 0)  # (instante, cpu, bytes_in, bytes_out) do último snapshot
+
+    def add_cpu(self, kind: str, seconds: float) -> None:
+        self.cpu[kind] = self.cpu.get(kind, 0.0) + seconds
+
+    def add_tool(self, seconds: float) -> None:
+        self.tool_calls += 1
+        self.tool_seconds += seconds
+
+    def _on_in(self, frame: Any) -> None:
+        self.bytes_in += len(frame.data) * 2  # int16
+
+    def _on_out(self, frame: Any) -> None:
+        self.bytes_out += len(frame.data) * 2
+
+    def attach(self, session: Any, agent: Any) -> None:
+        """Conta o áudio da sessão (já iniciada) e o contexto do agente."""
+        self._session, self._agent = session, agent
+        tapped_in = tap_session_audio(session)
+        if tapped_in is not None:
+            tapped_in.add_tap(self._on_in)
+        tapped_out = tap_session_output(session)
+        if tapped_out is not None:
+            tapped_out.add_tap(self._on_out)
+
+    def detach(self) -> None:
+        if self._session is None:
+            return
+        for endpoint, tap in ((self._session.input.audio, self._on_in), (self._session.output.audio, self._on_out)):
+            if hasattr(endpoint, "remove_tap"):
+                endpoint.remove_tap(tap)
+        self._session = self._agent = None
+
+    def context_bytes(self) -> int:
+        """Bytes (UTF-8) de texto no chat_ctx: mensagens, argumentos e saídas de tools."""
+        if self._agent is None:
+            return 0
+        total = 0
+        for item in self._agent.chat_ctx.items:
+            kind = getattr(item, "type", "message")
+            if kind == "message":
+                text = item.text_content or ""
+            elif kind == "function_call":
+                text = item.arguments or ""
+            elif kind == "function_call_output":
+                text = item.output or ""
+            else:
+                text = ""
+            total += len(text.encode("utf-8"))
+        return total
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        cpu = sum(self.cpu.values())
+        last_t, last_cpu, last_in, last_out = self._last
+        elapsed = max(now - last_t, 1e-9)
+        self._last = (now, cpu, self.bytes_in, self.bytes_out)
+        return {
+            "uptime": round(now - self._started, 1),
+            "audio_cpu_seconds": {k: round(v, 3) for k, v in self.cpu.items()},
+            "audio_cpu_percent": round(100 * (cpu - last_cpu) / elapsed, 2),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "kbps_in": round((self.bytes_in - last_in) * 8 / 1000 / elapsed, 1),
+            "kbps_out": round((self.bytes_out - last_out) * 8 / 1000 / elapsed, 1),
+            "tool_calls": self.tool_calls,
+            "tool_seconds": round(self.tool_seconds, 3),
+            "context_bytes": self.context_bytes(),
+        }
+
+
+class _MeteredVADStream:
+    """
+    Repassa o stream do VAD compartilhado e cobra a inferência da sessão.
+
+    Também refaz o metrics_collected do stream (mesma cadência do LiveKit) no
+    wrapper da sala, que é o VAD que a AgentSession assina.
+    """
+
+    def __init__(self, inner: vad.VADStream, owner: "MeteredVAD") -> None:
+        self._inner = inner
+        self._owner = owner
+        self._usage = owner._usage
+        self._inference_total = 0.0
+        self._inference_count = 0
+        self._last_activity = time.perf_counter()
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_inner":
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+    def __aiter__(self) -> "_MeteredVADStream":
+        return self
+
+    async def __anext__(self) -> vad.VADEvent:
+        ev = await self._inner.__anext__()
+        if ev.type == vad.VADEventType.INFERENCE_DONE:
+            self._usage.add_cpu("vad", ev.inference_duration)
+            self._inference_total += ev.inference_duration
+            self._inference_count += 1
+            if self._inference_count >= 1 / self._owner.capabilities.update_interval:
+                self._emit_metrics()
+        elif ev.type in (vad.VADEventType.START_OF_SPEECH, vad.VADEventType.END_OF_SPEECH):
+            self._last_activity = time.perf_counter()
+        return ev
+
+    def _emit_metrics(self) -> None:
+        owner = self._owner
+        owner.emit("metrics_collected", VADMetrics(
+            timestamp=time.time(),
+            idle_time=time.perf_counter() - self._last_activity,
+            inference_duration_total=self._inference_total,
+            inference_count=self._inference_count,
+            label=owner._inner._label,
+            metadata=Metadata(model_name=owner.model, model_provider=owner.provider),
+        ))
+        self._inference_total, self._inference_count = 0.0, 0
+
+
+class MeteredVAD(vad.VAD):
+    """
+    VAD por sessão sobre a instância compartilhada (mesmo modelo, mesmas opções).
+
+    O evento metrics_collected do VAD compartilhado mistura todas as salas;
+    aqui cada stream soma só a própria inferência e emite as métricas de VAD
+    da sala neste wrapper.
+    """
+
+    def __init__(self, inner: vad.VAD, usage: SessionUsage) -> None:
+        super().__init__(capabilities=inner.capabilities)
+        self._inner = inner
+        self._usage = usage
+
+    def __getattr__(self, name: str) -> Any:
+        # _opts, update_options etc. continuam sendo os da instância compartilhada
+        if name == "_inner":
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+    @property
+    def model(self) -> str:
+        return self._inner.model
+
+    @property
+    def provider(self) -> str:
+        return self._inner.provider
+
+    def stream(self) -> vad.VADStream:
+        return _MeteredVADStream(self._inner.stream(), self)  # type: ignore[return-value]
+
+
+def open_session(room: str) -> SessionUsage:
+    """Cria a conta da sala e a torna a vigente no contexto atual."""
+    usage = SessionUsage(room)
+    _sessions[room] = usage
+    _current.set(usage)
+    return usage
+
+
+def close_session(usage: SessionUsage) -> None:
+    usage.detach()
+    if _sessions.get(usage.room) is usage:
+        del _sessions[usage.room]
+
+
+def current() -> SessionUsage | None:
+    return _current.get()
+
+
+def record_tool(seconds: float) -> None:
+    """Chamado pelo wrapper de tools MCP; cobra da sessão vigente, se houver."""
+    usage = _current.get()
+    if usage is not None:
+        usage.add_tool(seconds)
+
+
+# --- Medidores do processo (também usados pelo vad_config e pelo loadtest) ---
+
+class LoopLag:
+    """Atraso do event loop: quanto um sleep de `interval` passa do previsto (amostras em segundos)."""
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="loop-lag")
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    def take(self) -> dict[str, float]:
+        """p95 e máximo desde a última chamada (ms)."""
+        samples, self.samples = sorted(self.samples), []
+        if not samples:
+            return {"p95": 0.0, "max": 0.0}
+        return {"p95": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 1), "max": round(samples[-1] * 1000, 1)}
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+
+def rss_mb() -> float:
+    """Memória residente atual do processo em MB (0.0 se indisponível)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        import resource  # indisponível no Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reporta bytes; Linux, KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+
+class ProcessUsage:
+    """CPU, RSS e atraso do loop do processo + a conta de cada sessão hospedada."""
+
+    def __init__(self) -> None:
+        self.lag = LoopLag()
+        self._last = (time.monotonic(), time.process_time())
+
+    def start(self) -> None:
+        self.lag.start()
+
+    def stop(self) -> None:
+        self.lag.stop()
+
+    def snapshot(self) -> dict[str, Any]:
+        now, cpu = time.monotonic(), time.process_time()
+        last_t, last_cpu = self._last
+        self._last = (now, cpu)
+        return {
+            "process": {
+                "cpu_percent": round(100 * (cpu - last_cpu) / max(now - last_t, 1e-9), 1),
+                "rss_mb": round(rss_mb(), 1),
+                "loop_lag_ms": self.lag.take(),
+                "sessions": len(_sessions),
+            },
+            "sessions": {room: usage.snapshot() for room, usage in list(_sessions.items())},
+        }
@@ -9,13 +9,16 @@ from dotenv import load_dotenv
 load_dotenv(".env.local")
 
 def setup_logging():
+    """
+    Logs via fila + thread (log_pipeline): emitir nunca faz I/O no event loop.
+
+    LOG_FORMAT=json troca o texto por uma linha JSON com sala/sessão/turno.
+    """
+    from log_pipeline import start
+
     level_name = os.getenv("LOG_LEVEL", "INFO").upper()
     level = getattr(logging, level_name, logging.INFO)
-    logging.basicConfig(
-        level=level,
-        format="[%(asctime)s] [%(levelname)s] %(message)s",
-        datefmt="%H:%M:%S",
-    )
+    start(level, json_output=os.getenv("LOG_FORMAT", "text").strip().lower() == "json")
     logging.getLogger("asyncio").setLevel(logging.WARNING)
     logging.info("LOG_LEVEL=%s", level_name)
 
@@ -0,0 +1,94 @@
+# startup_profile.py - Perfil de tempo de inicialização (cold start) do agente
+#
+# Uso: `python agent_direct.py --startup-profile` (ou STARTUP_PROFILE=1).
+# Cada fase (imports, env, VAD, MCP, conexão com a sala, primeiro áudio) é
+# cronometrada e, ao final, uma tabela é impressa no stderr. Com
+# STARTUP_PROFILE_OUT=arquivo.jsonl, o resultado também é anexado em JSON
+# para comparar versões.
+#
+# Este módulo só usa a stdlib de propósito: é importado antes das
+# dependências pesadas para poder medi-las.
+
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+FLAG = "--startup-profile"
+
+
+class StartupProfile:
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.enabled = os.getenv("STARTUP_PROFILE", "").strip().lower() in {"1", "true", "yes", "y"}
+        self.phases: list[tuple[str, float, float]] = []  # (nome, início, duração) em segundos
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        self.phases.append((name, start - self.t0, duration))
+
+    def mark(self, name: str) -> None:
+        """Registra um instante (duração zero), ex.: primeiro áudio publicado."""
+        self.record(name, time.perf_counter(), 0.0)
+
+    def enable_from_argv(self, argv: list[str] | None = None) -> bool:
+        """
+        Liga o perfil se a flag estiver presente e a remove de argv.
+
+        A flag é retirada para não quebrar CLIs que validam argumentos (o
+        `agents.cli` do LiveKit) e propagada via env para processos filhos.
+        """
+        argv = sys.argv if argv is None else argv
+        if FLAG in argv:
+            argv.remove(FLAG)
+            self.enabled = True
+            os.environ["STARTUP_PROFILE"] = "1"
+        return self.enabled
+
+    def table(self) -> str:
+        rows = [("fase", "início (ms)", "duração (ms)")]
+        for name, offset, duration in self.phases:
+            rows.append((name, f"{offset * 1000:.0f}", f"{duration * 1000:.0f}" if duration else "-"))
+        widths = [max(len(r[i]) for r in rows) for i in range(3)]
+        lines = []
+        for i, r in enumerate(rows):
+            lines.append(f"{r[0]:<{widths[0]}}  {r[1]:>{widths[1]}}  {r[2]:>{widths[2]}}")
+            if i == 0:
+                lines.append("-" * (sum(widths) + 4))
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        """Imprime a tabela (uma vez) e, se configurado, anexa o JSON."""
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        print("\n⏱️ Perfil de inicialização\n" + self.table() + "\n", file=sys.stderr, flush=True)
+        out = os.getenv("STARTUP_PROFILE_OUT")
+        if out:
+            record = {
+                "ts": time.time(),
+                "pid": os.getpid(),
+                "phases": [
+                    {"name": n, "start_ms": round(o * 1000, 1), "duration_ms": round(d * 1000, 1)}
+                    for n, o, d in self.phases
+                ],
+            }
+            try:
+                with open(out, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logging.warning("⚠️ Não foi possível gravar o perfil em %s: %s", out, e)
+
+
+# Instância do processo; o relógio começa quando este módulo é importado
+profile = StartupProfile()
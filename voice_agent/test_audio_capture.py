@@ -1,110 +1,332 @@
 #!/usr/bin/env python3
 """
 test_audio_capture.py - Diagnóstico de captura de áudio
-Testa se o áudio está sendo capturado e processado corretamente.
+
+Assina as trilhas de áudio remotas da sala (rtc.AudioStream) e mede, por
+participante e em janelas deslizantes:
+
+  - jitter de chegada entre frames (chegada real vs. duração do frame)
+  - buracos e frames perdidos estimados (intervalo > GAP_FACTOR × frame)
+  - nível RMS/pico (dBFS) e fração de amostras clipadas
+  - tempo de inferência do Silero VAD por janela de inferência
+
+No fim imprime um relatório. Com --file o áudio vem de um WAV local,
+entregue no ritmo de tempo real (com jitter/perda simulados opcionais),
+então o diagnóstico roda sem LiveKit server.
+
+Uso:
+    python test_audio_capture.py                       # sala LIVEKIT_ROOM por 30 s
+    python test_audio_capture.py --room sala-1 --duration 60 --window 5
+    python test_audio_capture.py --file fala.wav --jitter-ms 15 --drop 0.02
+    python test_audio_capture.py --file fala.wav --no-vad --json relatorio.json
 """
 
+import sys
+import json
+import time
+import random
 import asyncio
 import logging
-from livekit import rtc, api
-from livekit.agents import RoomInputOptions
-from livekit.plugins import noise_cancellation
-from livekit.plugins import silero
+import argparse
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import numpy as np
+from livekit import rtc
 
 from settings import setup_logging, Env
 
-async def test_audio_capture():
-    """Testa a captura de áudio da sala LiveKit"""
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+GAP_FACTOR = 1.5       # intervalo maior que isso × duração do frame conta como buraco
+CLIP_LEVEL = 32767 * 0.99
+
+
+def _dbfs(x: np.ndarray) -> np.ndarray:
+    return 20 * np.log10(np.maximum(x, 1e-9))
+
+
+def _pct(x: np.ndarray, q: float) -> float:
+    return float(np.percentile(x, q)) if len(x) else float("nan")
+
+
+class AudioAnalyser:
+    """Estatísticas de um participante; cada frame custa algumas operações NumPy."""
+
+    def __init__(self, identity: str, vad: Any = None, window: float = 5.0):
+        self.identity = identity
+        self.window = window
+        # Uma entrada por frame (escalares); as janelas são fatias destes arrays
+        self._arrival: list[float] = []
+        self._duration: list[float] = []
+        self._rms: list[float] = []
+        self._peak: list[float] = []
+        self._clipped: list[int] = []
+        self._samples: list[int] = []
+        self._inference: list[float] = []
+        self._window_start = 0  # índice do primeiro frame da janela atual
+        self._window_inference = 0  # idem, nas inferências do VAD
+        self.windows: list[dict] = []
+        self.speech_segments = 0
+        self._vad_stream = vad.stream() if vad is not None else None
+        self._vad_task = asyncio.create_task(self._consume_vad()) if self._vad_stream else None
+
+    def push(self, frame: rtc.AudioFrame, arrival: float | None = None) -> None:
+        arrival = time.monotonic() if arrival is None else arrival
+        pcm = np.frombuffer(frame.data, dtype=np.int16)
+        if frame.num_channels > 1:
+            pcm = pcm.reshape(-1, frame.num_channels).mean(axis=1)
+        mag = np.abs(pcm.astype(np.float32))
+        self._arrival.append(arrival)
+        self._duration.append(frame.samples_per_channel / frame.sample_rate)
+        self._rms.append(float(np.sqrt(np.mean(mag * mag))) if len(mag) else 0.0)
+        self._peak.append(float(mag.max()) if len(mag) else 0.0)
+        self._clipped.append(int(np.count_nonzero(mag >= CLIP_LEVEL)))
+        self._samples.append(len(mag))
+        if self._vad_stream is not None:
+            self._vad_stream.push_frame(frame)
+        if arrival - self._arrival[self._window_start] >= self.window:
+            stats = self.stats(self._window_start, len(self._arrival), self._window_inference)
+            self.windows.append(stats)
+            self._window_start = len(self._arrival)
+            self._window_inference = len(self._inference)
+            logging.info("📈 [%s] janela: jitter p95 %.1f ms | buracos %d | RMS %.1f dBFS | clip %.2f%% | VAD p95 %s ms",
+                         self.identity, stats["jitter_ms"]["p95"], stats["gaps"], stats["rms_dbfs"]["mean"],
+                         stats["clipping_ratio"] * 100, f"{stats['vad_inference_ms']['p95']:.2f}")
+
+    async def _consume_vad(self) -> None:
+        from livekit.agents.vad import VADEventType
+
+        async for ev in self._vad_stream:
+            if ev.type == VADEventType.INFERENCE_DONE:
+                self._inference.append(ev.inference_duration)
+            elif ev.type == VADEventType.START_OF_SPEECH:
+                self.speech_segments += 1
+
+    async def aclose(self) -> None:
+        if self._vad_stream is not None:
+            self._vad_stream.end_input()
+            try:
+                await asyncio.wait_for(self._vad_task, timeout=5)
+            except asyncio.TimeoutError:
+                self._vad_task.cancel()
+            await self._vad_stream.aclose()
+
+    @property
+    def frames(self) -> int:
+        return len(self._arrival)
+
+    def stats(self, start: int = 0, end: int | None = None, inference_start: int = 0) -> dict:
+        """Estatísticas vetorizadas dos frames [start, end) e das inferências a partir de `inference_start`."""
+        sl = slice(start, end)
+        arrival = np.asarray(self._arrival[sl])
+        duration = np.asarray(self._duration[sl])
+        rms = np.asarray(self._rms[sl])
+        peak = np.asarray(self._peak[sl])
+        samples = int(np.sum(self._samples[sl]))
+        clipped = int(np.sum(self._clipped[sl]))
+
+        # Intervalo de chegada vs. o que o frame anterior representa em tempo de áudio
+        delta = np.diff(arrival)
+        expected = duration[:-1]
+        jitter = np.abs(delta - expected) * 1000
+        gap_mask = delta > GAP_FACTOR * expected
+        dropped = int(np.sum(np.maximum(np.rint(delta[gap_mask] / expected[gap_mask]) - 1, 0)))
+        inference = np.asarray(self._inference[inference_start:]) * 1000
+
+        span = float(arrival[-1] - arrival[0]) if len(arrival) > 1 else 0.0
+        return {
+            "frames": int(len(arrival)),
+            "seconds": round(span, 2),
+            "audio_seconds": round(float(duration.sum()), 2),
+            "jitter_ms": {"mean": float(jitter.mean()) if len(jitter) else 0.0,
+                          "p95": _pct(jitter, 95) if len(jitter) else 0.0,
+                          "max": float(jitter.max()) if len(jitter) else 0.0},
+            "gaps": int(gap_mask.sum()),
+            "dropped_frames": dropped,
+            "rms_dbfs": {"mean": float(_dbfs(np.sqrt(np.mean(rms ** 2)) / 32768.0)) if len(rms) else -180.0,
+                         "max": float(_dbfs(rms.max() / 32768.0)) if len(rms) else -180.0},
+            "peak_dbfs": float(_dbfs(peak.max() / 32768.0)) if len(peak) else -180.0,
+            "clipping_ratio": clipped / samples if samples else 0.0,
+            "vad_inference_ms": {"count": int(len(inference)),
+                                 "p50": _pct(inference, 50), "p95": _pct(inference, 95),
+                                 "max": float(inference.max()) if len(inference) else float("nan")},
+        }
+
+    def report(self) -> dict:
+        total = self.stats()
+        if self.windows:
+            worst = max(self.windows, key=lambda w: w["jitter_ms"]["p95"])
+            total["worst_window_jitter_p95_ms"] = worst["jitter_ms"]["p95"]
+        total["windows"] = len(self.windows)
+        total["speech_segments"] = self.speech_segments
+        return total
+
+
+# --- Fontes de áudio ---
+
+async def file_frames(path: Path, jitter_ms: float = 0.0, drop: float = 0.0,
+                      loop: bool = False) -> AsyncIterator[tuple[rtc.AudioFrame, float]]:
+    """
+    Frames de um WAV no ritmo de tempo real, como chegariam da sala.
+
+    `jitter_ms` atrasa cada entrega aleatoriamente (sem reordenar); `drop` é a
+    probabilidade de perder um frame. Servem para validar o próprio diagnóstico.
+    """
+    from vad_bench import read_wav
+
+    pcm = (np.clip(read_wav(path), -1.0, 1.0) * 32767).astype(np.int16)
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    t0 = time.monotonic()
+    offset = 0.0
+    while True:
+        for i in range(0, len(pcm) - frame_len + 1, frame_len):
+            due = t0 + offset + (i + frame_len) / SAMPLE_RATE + random.uniform(0, jitter_ms) / 1000
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if drop and random.random() < drop:
+                continue
+            frame = rtc.AudioFrame(data=pcm[i: i + frame_len].tobytes(), sample_rate=SAMPLE_RATE,
+                                   num_channels=1, samples_per_channel=frame_len)
+            yield frame, time.monotonic()
+        if not loop:
+            return
+        offset += len(pcm) / SAMPLE_RATE
+
+
+async def _analyse_track(track: rtc.Track, analyser: AudioAnalyser) -> None:
+    stream = rtc.AudioStream(track, sample_rate=SAMPLE_RATE, num_channels=1)
     try:
+        async for ev in stream:
+            analyser.push(ev.frame)
+    finally:
+        await stream.aclose()
+
+
+async def capture_room(env: Env, room_name: str, duration: float, vad: Any,
+                       window: float) -> dict[str, AudioAnalyser]:
+    """Assina o áudio de todos os participantes remotos por `duration` segundos."""
+    from livekit import api
+
+    analysers: dict[str, AudioAnalyser] = {}
+    tasks: list[asyncio.Task] = []
+    room = rtc.Room()
+
+    def _subscribe(track: rtc.Track, participant: rtc.RemoteParticipant) -> None:
+        if track.kind != rtc.TrackKind.KIND_AUDIO:
+            return
+        key = f"{participant.identity}/{track.sid}"
+        logging.info("🎧 Assinando áudio de %s (trilha %s)", participant.identity, track.sid)
+        analysers[key] = AudioAnalyser(participant.identity, vad, window)
+        tasks.append(asyncio.create_task(_analyse_track(track, analysers[key])))
+
+    room.on("track_subscribed", lambda track, _pub, participant: _subscribe(track, participant))
+
+    # Gera token para o agente de teste
+    token = api.AccessToken(env.livekit_api_key, env.livekit_api_secret)
+    token.with_identity("audio-test-agent")
+    token.with_name("Audio Test")
+    token.with_grants(api.VideoGrants(room_join=True, room=room_name))
+
+    logging.info("🔗 Conectando à sala '%s'...", room_name)
+    await room.connect(env.livekit_url, token.to_jwt())
+    logging.info("✅ Conectado! Participantes: %d", len(room.remote_participants))
+    for participant in room.remote_participants.values():
+        for pub in participant.track_publications.values():
+            if pub.track is not None and pub.subscribed:
+                _subscribe(pub.track, participant)
+
+    logging.info("📡 Medindo áudio da sala por %.0f segundos...", duration)
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await room.disconnect()
+    logging.info("👋 Desconectado da sala")
+    return analysers
+
+
+async def capture_file(path: Path, duration: float | None, vad: Any, window: float,
+                       jitter_ms: float, drop: float, loop: bool = False) -> dict[str, AudioAnalyser]:
+    analyser = AudioAnalyser(path.stem, vad, window)
+    deadline = time.monotonic() + duration if duration else None
+    logging.info("📂 Lendo %s em tempo real (jitter simulado %.0f ms, perda %.1f%%)...",
+                 path, jitter_ms, drop * 100)
+    async for frame, arrival in file_frames(path, jitter_ms, drop, loop=loop and bool(duration)):
+        analyser.push(frame, arrival)
+        if deadline is not None and arrival >= deadline:
+            break
+    return {path.stem: analyser}
+
+
+# --- Relatório ---
+
+def print_report(reports: dict[str, dict]) -> None:
+    if not reports:
+        logging.warning("⚠️ Nenhum áudio foi recebido. Possíveis causas:")
+        logging.warning("   1. Nenhum outro participante está falando")
+        logging.warning("   2. O microfone não está compartilhando áudio")
+        logging.warning("   3. Há problema na conexão LiveKit")
+        return
+    header = (f"{'participante':<24} {'frames':>7} {'jit p95':>8} {'jit max':>8} {'buracos':>8} {'perdidos':>9} "
+              f"{'RMS':>7} {'pico':>7} {'clip%':>6} {'VAD p95':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, r in reports.items():
+        print(f"{name[:24]:<24} {r['frames']:>7} {r['jitter_ms']['p95']:>8.1f} {r['jitter_ms']['max']:>8.1f} "
+              f"{r['gaps']:>8} {r['dropped_frames']:>9} {r['rms_dbfs']['mean']:>7.1f} {r['peak_dbfs']:>7.1f} "
+              f"{r['clipping_ratio'] * 100:>6.2f} {r['vad_inference_ms']['p95']:>8.2f}")
+    print("\nJitter/VAD em ms; RMS e pico em dBFS. 'perdidos' estima frames faltando pelos buracos.")
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    vad = None
+    if not args.no_vad:
+        from vad_config import load_vad
+
+        vad = await asyncio.to_thread(load_vad)
+        if vad is None:
+            logging.warning("⚠️ Silero VAD indisponível; seguindo sem medir inferência.")
+    if args.file:
+        analysers = await capture_file(Path(args.file), args.duration, vad, args.window,
+                                       args.jitter_ms, args.drop, args.loop)
+    else:
         env = Env.load()
-        logging.info("🧪 Iniciando teste de captura de áudio...")
-
-        # Conecta à sala
-        room = rtc.Room()
-
-        # Gera token para o agente de teste
-        token = api.AccessToken(env.livekit_api_key, env.livekit_api_secret)
-        token.with_identity("audio-test-agent")
-        token.with_name("Audio Test")
-        token.with_grants(api.VideoGrants(
-            room_join=True,
-            room="agrinho-demo",
-        ))
-        jwt_token = token.to_jwt()
-
-        logging.info("🔗 Conectando à sala 'agrinho-demo'...")
-        await room.connect(env.livekit_url, jwt_token)
-        logging.info("✅ Conectado à sala!")
-
-        # Listar participantes
-        logging.info(f"👥 Participantes na sala: {room.num_participants}")
-        for identity, participant in room.remote_participants.items():
-            logging.info(f"   - {participant.identity} ({participant.name})")
-
-        # Testar VAD
-        logging.info("🎤 Testando Voice Activity Detection (VAD) Silero...")
-        try:
-            vad_instance = silero.VAD.load(
-                min_speech_duration=0.05,
-                min_silence_duration=0.8,
-                activation_threshold=0.6,
-                sample_rate=16000,
-                force_cpu=True
-            )
-            logging.info("✅ VAD (Silero) carregado com sucesso!")
-        except Exception as e:
-            logging.warning(f"⚠️ Falha ao carregar VAD: {e}")
-            vad_instance = None
-
-        # Testar Noise Cancellation
-        logging.info("🔇 Testando Noise Cancellation (BVC)...")
-        try:
-            bvc = noise_cancellation.BVC()
-            logging.info("✅ BVC carregado com sucesso!")
-        except Exception as e:
-            logging.warning(f"⚠️ Falha ao carregar BVC: {e}")
-
-        # Registrar para eventos de audio
-        logging.info("📡 Aguardando áudio da sala por 30 segundos...")
-        audio_received = False
-
-        async def on_audio_frame(frame: rtc.AudioFrame):
-            nonlocal audio_received
-            audio_received = True
-            logging.info(f"🎵 Áudio recebido: {frame.sample_rate}Hz, {frame.num_channels} canais, {frame.samples_per_channel} amostras")
-
-        # Registrar callback para frames de áudio
-        # (Nota: isto é pseudocódigo - a API real pode variar)
-
-        # Aguardar e monitorar
-        for i in range(30):
-            await asyncio.sleep(1)
-            participants = room.num_participants
-            logging.info(f"   [{i+1}/30] Participantes: {participants}")
-
-            if audio_received:
-                logging.info("✅ Áudio foi recebido durante o teste!")
-
-        if not audio_received:
-            logging.warning("⚠️ Nenhum áudio foi recebido. Possíveis causas:")
-            logging.warning("   1. Nenhum outro participante está falando")
-            logging.warning("   2. O microfone não está compartilhando áudio")
-            logging.warning("   3. Há problema na conexão LiveKit")
-        else:
-            logging.info("✅ Teste de áudio concluído com sucesso!")
-
-        await room.disconnect()
-        logging.info("👋 Desconectado da sala")
-
-    except Exception as e:
-        logging.exception(f"❌ Erro durante teste: {e}")
+        env.validate(require_openai=False, require_livekit=True)
+        analysers = await capture_room(env, args.room, args.duration or 30.0, vad, args.window)
+    for a in analysers.values():
+        await a.aclose()
+    return {name: a.report() for name, a in analysers.items() if a.frames}
+
+
+def main() -> int:
+    import os
+
+    parser = argparse.ArgumentParser(description="Diagnóstico de captura de áudio (jitter, níveis, VAD)")
+    parser.add_argument("--room", default=os.getenv("LIVEKIT_ROOM", "agrinho-demo"))
+    parser.add_argument("--duration", type=float, default=None, help="segundos (padrão 30 na sala)")
+    parser.add_argument("--window", type=float, default=5.0, help="janela das estatísticas em segundos")
+    parser.add_argument("--file", help="WAV local no lugar da sala (sem LiveKit server)")
+    parser.add_argument("--loop", action="store_true", help="repete o WAV até --duration")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="jitter simulado no modo --file")
+    parser.add_argument("--drop", type=float, default=0.0, help="probabilidade de perder frame no modo --file")
+    parser.add_argument("--no-vad", action="store_true", help="não carrega o Silero VAD")
+    parser.add_argument("--json", help="grava o relatório em JSON")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.info("🎯 Teste de Captura de Áudio")
+    reports = asyncio.run(run(args))
+    print_report(reports)
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+        logging.info("💾 Relatório gravado em %s", args.json)
+    return 0 if reports else 1
+
 
 if __name__ == "__main__":
     try:
-        setup_logging()
-        env = Env.load()
-        env.validate(require_openai=False, require_livekit=True)
-        logging.info("🎯 Teste de Captura de Áudio")
-        asyncio.run(test_audio_capture())
-    except Exception as e:
-        logging.exception(f"❌ Falha: {e}")
+        sys.exit(main())
+    except KeyboardInterrupt:
+        logging.info("👋 Encerrando...")
@@ -0,0 +1,5 @@
+# Os módulos do voice_agent são importados "flat" (como em agent.py)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
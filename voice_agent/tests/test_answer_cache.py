@@ -0,0 +1,168 @@
+# Cache de respostas com o modelo realtime: a mensagem do fim do turno chega
+# vazia e a pergunta vem do evento user_input_transcribed, depois. O turno não
+# espera; um acerto dentro da janela troca a resposta do modelo.
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import greeting_cache
+from answer_cache import Answer, AnswerCache, TurnTranscripts
+
+
+class FakeSession:
+    """Só o EventEmitter da AgentSession (on/off/emit) e interrupt()."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list] = {}
+        self.interrupts: list[bool] = []
+
+    def on(self, event, cb):
+        self._handlers.setdefault(event, []).append(cb)
+
+    def off(self, event, cb):
+        self._handlers[event].remove(cb)
+
+    def emit(self, event, ev):
+        for cb in list(self._handlers.get(event, [])):
+            cb(ev)
+
+    def interrupt(self, *, force: bool = False):
+        self.interrupts.append(force)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+
+def _transcribed(text: str, final: bool = True):
+    return SimpleNamespace(transcript=text, is_final=final)
+
+
+def _speaking():
+    return SimpleNamespace(new_state="speaking")
+
+
+@pytest.fixture
+def spoken(monkeypatch):
+    said: list[str] = []
+
+    async def say_prerendered(session, agent, text, audio):
+        said.append(text)
+
+    monkeypatch.setattr(greeting_cache, "say_prerendered", say_prerendered)
+    return said
+
+
+def _cache() -> AnswerCache:
+    answer = Answer(id="o-que-e", questions=["o que é o agrinho", "me fala do agrinho"],
+                    answer="O Agrinho é o programa educacional do Sistema FAEP.", audio=b"\0" * 320)
+    return AnswerCache("agrinho", [answer], threshold=0.75)
+
+
+def _wire(window: float = 1.0):
+    """Sessão fake + TurnTranscripts ligado ao cache (como o Assistant faz)."""
+    session = FakeSession()
+    agent = SimpleNamespace(session=session)
+    cache = _cache()
+    transcripts = TurnTranscripts(lambda text, turn_end: cache.respond(agent, text, turn_end, replace=True),
+                                  window=window)
+    transcripts.attach(session)
+    return session, transcripts, cache
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_late_transcript_hit_replaces_model_reply(spoken):
+    async def run():
+        session, transcripts, cache = _wire()
+        t0 = time.perf_counter()
+        transcripts.turn_ended()  # não bloqueia: o modelo já pode responder
+        assert time.perf_counter() - t0 < 0.01
+        await asyncio.sleep(0.05)  # a transcrição chega depois do commit do áudio
+        session.emit("user_input_transcribed", _transcribed("o que", final=False))
+        session.emit("user_input_transcribed", _transcribed("O que é o Agrinho?"))
+        await _settle()
+        return session, cache
+
+    session, cache = asyncio.run(run())
+    assert session.interrupts == [True]
+    assert spoken == ["O Agrinho é o programa educacional do Sistema FAEP."]
+    assert cache.hits == 1
+
+
+def test_miss_does_not_interrupt(spoken):
+    async def run():
+        session, transcripts, cache = _wire()
+        transcripts.turn_ended()
+        session.emit("user_input_transcribed", _transcribed("que horas abre a feira"))
+        await _settle()
+        return session, cache
+
+    session, cache = asyncio.run(run())
+    assert session.interrupts == [] and spoken == []
+    assert cache.misses == 1
+
+
+def test_transcript_outside_window_is_dropped_and_not_reused(spoken):
+    async def run():
+        session, transcripts, _ = _wire(window=0.02)
+        transcripts.turn_ended()
+        await asyncio.sleep(0.05)
+        session.emit("user_input_transcribed", _transcribed("o que é o agrinho"))  # atrasada
+        # Próximo turno: a transcrição atrasada não vale para ele
+        session.emit("user_state_changed", _speaking())
+        transcripts.turn_ended()
+        await _settle()
+        return session
+
+    session = asyncio.run(run())
+    assert session.interrupts == [] and spoken == []
+
+
+def test_transcript_after_user_speaks_again_is_dropped(spoken):
+    async def run():
+        session, transcripts, _ = _wire()
+        transcripts.turn_ended()
+        session.emit("user_state_changed", _speaking())
+        session.emit("user_input_transcribed", _transcribed("o que é o agrinho"))
+        await _settle()
+        return session
+
+    session = asyncio.run(run())
+    assert session.interrupts == [] and spoken == []
+
+
+def test_stt_text_short_circuits_without_waiting(spoken):
+    async def run():
+        session = FakeSession()
+        return await _cache().respond(SimpleNamespace(session=session), "me fala do agrinho"), session
+
+    answered, session = asyncio.run(run())
+    assert answered is True and session.interrupts == []
+    assert len(spoken) == 1
+
+
+def test_assistant_turn_is_not_blocked(spoken, monkeypatch):
+    agents = pytest.importorskip("livekit.agents")
+    import agent_direct
+
+    session = FakeSession()
+    monkeypatch.setattr(agent_direct.Assistant, "session", property(lambda self: session))
+
+    async def run():
+        assistant = agent_direct.Assistant("instruções", answers=_cache())
+        assistant.transcripts.attach(session)
+        message = agents.llm.ChatMessage(role="user", content=[])
+        t0 = time.perf_counter()
+        await assistant.on_user_turn_completed(None, message)  # sem StopResponse: o modelo segue
+        assert time.perf_counter() - t0 < 0.05
+        session.emit("user_input_transcribed", _transcribed("O que é o Agrinho?"))
+        await _settle()
+
+    asyncio.run(run())
+    assert session.interrupts == [True] and len(spoken) == 1
@@ -0,0 +1,41 @@
+# Cache de saudações em disco: gravação atômica entre vários workers
+
+import json
+
+import greeting_cache
+from greeting_cache import GreetingAudio, _save, greeting_key, load_cached
+
+
+def test_save_is_atomic_and_json_commits(tmp_path, monkeypatch):
+    monkeypatch.setenv("GREETING_CACHE_DIR", str(tmp_path))
+    audio = GreetingAudio("Olá!", b"\x01\x00" * 2400, 24000, 1)
+    _save("coral", "Olá!", "AGRINHO", audio, "greeting")
+
+    key = greeting_key("coral", "Olá!", "AGRINHO")
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{key}.json", f"{key}.pcm"]  # sem temporários
+    assert json.loads((tmp_path / f"{key}.json").read_text())["bytes"] == len(audio.pcm)
+    assert load_cached("coral", "Olá!", "AGRINHO").pcm == audio.pcm
+
+
+def test_pcm_not_matching_json_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setenv("GREETING_CACHE_DIR", str(tmp_path))
+    _save("coral", "Olá!", "AGRINHO", GreetingAudio("Olá!", b"\x01\x00" * 2400, 24000, 1), "greeting")
+    key = greeting_key("coral", "Olá!", "AGRINHO")
+    (tmp_path / f"{key}.pcm").write_bytes(b"\x01\x00" * 10)  # PCM de outra gravação, pela metade
+
+    assert load_cached("coral", "Olá!", "AGRINHO") is None
+
+
+def test_temp_names_are_unique_per_writer(tmp_path, monkeypatch):
+    names = set()
+    real = greeting_cache.tempfile.NamedTemporaryFile
+
+    def spy(**kwargs):
+        f = real(**kwargs)
+        names.add(f.name)
+        return f
+
+    monkeypatch.setattr(greeting_cache.tempfile, "NamedTemporaryFile", spy)
+    for _ in range(3):
+        greeting_cache._write_atomic(tmp_path / "x.pcm", b"abc")
+    assert len(names) == 3 and (tmp_path / "x.pcm").read_bytes() == b"abc"
@@ -0,0 +1,283 @@
+# Tratamento de falhas das tools MCP: disjuntor, cache de resultados,
+# listas de tools por env e os caminhos do wrapper (prazo, barge-in, erro).
+
+import sys
+import time
+import shlex
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+pytest.importorskip("mcp")
+
+import mcp_bridge  # noqa: E402
+from mcp_bridge import (  # noqa: E402
+    CircuitBreaker, ToolResultCache, _cache_ttl_for, _mk_tool_wrapper, _parse_tool_list, _server_configs,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio manual para o disjuntor e o cache (só o `time` do mcp_bridge)."""
+    c = Clock()
+    monkeypatch.setattr(mcp_bridge, "time", SimpleNamespace(monotonic=c.monotonic, perf_counter=time.perf_counter))
+    return c
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("clima", failures=3, reset_after=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # sucesso zera a sequência
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_breaker_half_open_allows_one_probe(clock):
+    breaker = CircuitBreaker("clima", failures=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # uma chamada de teste por vez
+    breaker.record_failure()
+    assert breaker.state == "open"  # falha no teste reabre
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_breaker_release_frees_the_probe(clock):
+    breaker = CircuitBreaker("clima", failures=1, reset_after=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_breaker_trip_opens_immediately(clock):
+    breaker = CircuitBreaker("clima", failures=3)
+    breaker.trip()
+    assert breaker.state == "open"
+
+
+# --- ToolResultCache ---
+
+def test_cache_key_ignores_argument_order():
+    assert ToolResultCache.key("t", {"a": 1, "b": 2}) == ToolResultCache.key("t", {"b": 2, "a": 1})
+
+
+def test_cache_ttl_expires(clock):
+    cache = ToolResultCache(max_entries=4, ttl=10)
+    cache.put("k", "v")
+    cache.put("curto", "v", ttl=1)
+    clock.now += 5
+    assert cache.get("t", "k") == "v"
+    assert cache.get("t", "curto") is None
+    clock.now += 5
+    assert cache.get("t", "k") is None
+    assert cache.stats()["expirations"] == 2 and cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used(clock):
+    cache = ToolResultCache(max_entries=2, ttl=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("t", "a") == "1"  # "a" passa a ser a mais recente
+    cache.put("c", "3")
+    assert cache.get("t", "b") is None
+    assert cache.get("t", "a") == "1" and cache.get("t", "c") == "3"
+    assert cache.evictions == 1
+
+
+def test_cache_disabled_with_zero_entries():
+    cache = ToolResultCache(max_entries=0)
+    cache.put("a", "1")
+    assert cache.get("t", "a") is None
+
+
+# --- listas de tools por env ---
+
+def test_parse_tool_list():
+    assert _parse_tool_list(None) == {}
+    assert _parse_tool_list(" precos:600 , clima ,, escola__notas:1.5") == {
+        "precos": 600.0, "clima": None, "escola__notas": 1.5}
+
+
+@pytest.mark.parametrize("env, name, read_only, expected", [
+    ({}, "precos", True, 300.0),                                        # readOnlyHint
+    ({}, "precos", False, None),
+    ({"MCP_CACHE_READONLY": "false"}, "precos", True, None),
+    ({"MCP_CACHE_TOOLS": "precos:60"}, "precos", False, 60.0),          # nome > anotação
+    ({"MCP_CACHE_TOOLS": "precos"}, "precos", False, 300.0),            # sem TTL = padrão
+    ({"MCP_CACHE_TOOLS": "*:30"}, "clima", False, 30.0),
+    ({"MCP_CACHE_TOOLS": "*:30,clima:5"}, "clima", False, 5.0),         # nome > "*"
+    ({"MCP_CACHE_TOOLS": "*", "MCP_NO_CACHE_TOOLS": "clima"}, "clima", True, None),  # negação vence
+])
+def test_cache_ttl_precedence(monkeypatch, env, name, read_only, expected):
+    for key in ("MCP_CACHE_TOOLS", "MCP_NO_CACHE_TOOLS", "MCP_CACHE_READONLY"):
+        monkeypatch.delenv(key, raising=False)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    assert _cache_ttl_for(name, read_only, 300.0) == expected
+
+
+def test_stdio_cmd_keeps_paths_with_spaces(monkeypatch):
+    cmd = [sys.executable, "/srv/meu projeto/loadtest.py", "mcp-stub", "--latency", "0.2"]
+    for key in ("MCP_SERVERS", "MCP_SERVER_URL"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setenv("MCP_STDIO_CMD", shlex.join(cmd))
+    assert _server_configs()[0].stdio_cmd == cmd
+
+
+# --- wrapper da tool ---
+
+class FakeSpeechHandle:
+    def __init__(self) -> None:
+        self._interrupted = asyncio.get_running_loop().create_future()
+
+    @property
+    def interrupted(self) -> bool:
+        return self._interrupted.done()
+
+    def interrupt(self) -> None:
+        if not self._interrupted.done():
+            self._interrupted.set_result(None)
+
+    async def wait_if_not_interrupted(self, aws) -> None:
+        await asyncio.wait([*aws, self._interrupted], return_when=asyncio.FIRST_COMPLETED)
+
+
+class FakeClient:
+    def __init__(self, breaker: CircuitBreaker, result=None, delay: float = 0.0) -> None:
+        self.breaker = breaker
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def call_tool(self, name, args, cache_ttl=None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, BaseException):
+            raise self.result
+        return self.result
+
+
+def _context(handle: FakeSpeechHandle):
+    return SimpleNamespace(speech_handle=handle, function_call=None)
+
+
+def test_wrapper_returns_result_and_closes_breaker():
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1)
+        tool = _mk_tool_wrapper(FakeClient(breaker, result="ensolarado"), "previsao", timeout=1)
+        return await tool({}, _context(FakeSpeechHandle())), breaker
+
+    result, breaker = asyncio.run(run())
+    assert result == "ensolarado" and breaker.state == "closed"
+
+
+def test_wrapper_timeout_returns_fallback_and_counts_failure(monkeypatch):
+    monkeypatch.delenv("MCP_TIMEOUT_MESSAGE", raising=False)
+
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1)
+        tool = _mk_tool_wrapper(FakeClient(breaker, result="tarde", delay=1), "previsao", timeout=0.02)
+        return await tool({}, _context(FakeSpeechHandle())), breaker
+
+    result, breaker = asyncio.run(run())
+    assert "demorou demais" in result
+    assert breaker.state == "open"
+
+
+def test_wrapper_open_circuit_does_not_call_and_says_unavailable(monkeypatch):
+    monkeypatch.delenv("MCP_UNAVAILABLE_MESSAGE", raising=False)
+
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1)
+        breaker.record_failure()
+        client = FakeClient(breaker, result="x")
+        tool = _mk_tool_wrapper(client, "previsao", timeout=1, exposed_name="clima__previsao")
+        return await tool({}, _context(FakeSpeechHandle())), client
+
+    result, client = asyncio.run(run())
+    assert client.calls == 0
+    assert "indisponível" in result and "demorou" not in result and "clima__previsao" in result
+
+
+def test_wrapper_barge_in_stops_response_and_releases_probe(clock):
+    from livekit.agents import StopResponse
+
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1, reset_after=30)
+        breaker.record_failure()
+        clock.now += 30  # meio-aberto: esta chamada é o teste
+        handle = FakeSpeechHandle()
+        tool = _mk_tool_wrapper(FakeClient(breaker, result="x", delay=1), "previsao", timeout=5)
+        asyncio.get_running_loop().call_later(0.02, handle.interrupt)
+        with pytest.raises(StopResponse):
+            await tool({}, _context(handle))
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.allow()  # teste liberado para a próxima chamada
+
+
+def test_wrapper_mcp_error_keeps_circuit_closed():
+    from mcp.shared.exceptions import McpError
+    from mcp.types import ErrorData
+
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1)
+        error = McpError(ErrorData(code=-32602, message="cultura inválida"))
+        tool = _mk_tool_wrapper(FakeClient(breaker, result=error), "previsao", timeout=1)
+        with pytest.raises(McpError):
+            await tool({}, _context(FakeSpeechHandle()))
+        return breaker
+
+    assert asyncio.run(run()).state == "closed"  # erro JSON-RPC: servidor vivo
+
+
+def test_wrapper_transport_error_opens_circuit():
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1)
+        tool = _mk_tool_wrapper(FakeClient(breaker, result=ConnectionError("caiu")), "previsao", timeout=1)
+        with pytest.raises(ConnectionError):
+            await tool({}, _context(FakeSpeechHandle()))
+        return breaker
+
+    assert asyncio.run(run()).state == "open"
+
+
+def test_wrapper_cancelled_from_outside_releases_probe(clock):
+    async def run():
+        breaker = CircuitBreaker("clima", failures=1, reset_after=30)
+        breaker.record_failure()
+        clock.now += 30
+        tool = _mk_tool_wrapper(FakeClient(breaker, result="x", delay=1), "previsao", timeout=5)
+        task = asyncio.create_task(tool({}, _context(FakeSpeechHandle())))
+        await asyncio.sleep(0.02)
+        task.cancel()  # LiveKit cancela a task da tool (fala interrompida, sessão fechando)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == "half_open" and breaker.allow()
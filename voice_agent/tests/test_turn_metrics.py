@@ -0,0 +1,20 @@
+# Gauges por sala no registro de métricas (várias salas por processo)
+
+from turn_metrics import MetricsRegistry
+
+
+def test_rooms_do_not_overwrite_each_other_and_leave_cleanly():
+    reg = MetricsRegistry()
+    reg.set_gauge("agrinho_noise_floor_dbfs", -62.0, persona="AGRINHO", room="sala-1")
+    reg.set_gauge("agrinho_noise_floor_dbfs", -41.0, persona="AGRINHO", room="sala-2")
+    for profile in ("quiet", "noisy"):
+        reg.set_gauge("agrinho_vad_profile_active", 1.0 if profile == "quiet" else 0.0,
+                      persona="AGRINHO", room="sala-1", profile=profile)
+
+    assert len(reg.gauges) == 4
+    reg.remove_gauges("agrinho_noise_floor_dbfs", persona="AGRINHO", room="sala-1")
+    reg.remove_gauges("agrinho_vad_profile_active", persona="AGRINHO", room="sala-1")
+
+    assert [(n, dict(l)) for (n, l) in reg.gauges] == [
+        ("agrinho_noise_floor_dbfs", {"persona": "AGRINHO", "room": "sala-2"})]
+    assert 'room="sala-1"' not in reg.render_prometheus()
@@ -0,0 +1,331 @@
+# turn_metrics.py - Latência por turno (fim da fala do usuário → primeiro áudio do agente)
+#
+# Cada AgentSession ganha um TurnTracker que escuta os eventos da sessão e
+# registra os instantes de cada turno: fim de fala (VAD), decisão de
+# endpointing, início da resposta do modelo, primeiro áudio publicado,
+# tools e interrupções. As durações vão para histogramas de buckets fixos,
+# rotulados por persona e perfil de VAD.
+#
+# Só usa a stdlib: o server.py importa este módulo para agregar os snapshots
+# enviados pelos processos de agente e expor em /metrics (formato Prometheus).
+# Custo por evento: algumas comparações e um bisect — pode ficar ligado em produção.
+
+import time
+import bisect
+import logging
+from typing import Any
+
+from log_pipeline import log_context
+
+log = logging.getLogger("turn-metrics")
+
+# Limites dos buckets em segundos (o último bucket, +Inf, é implícito)
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+HELP = {
+    "agrinho_turn_latency_seconds": "Latência por etapa do turno (stage) por persona e perfil de VAD",
+    "agrinho_turn_latency_quantile_seconds": "Quantis estimados a partir do histograma de latência",
+    "agrinho_realtime_ttft_seconds": "Tempo até o primeiro token do modelo realtime",
+    "agrinho_tool_call_seconds": "Duração das chamadas de tool MCP",
+    "agrinho_turns_total": "Turnos completos (fim da fala até primeiro áudio)",
+    "agrinho_interruptions_total": "Interrupções do agente pelo usuário (barge-in)",
+    "agrinho_tool_calls_total": "Chamadas de tool",
+    "agrinho_answer_cache_lookups_total": "Consultas ao cache de respostas da persona (hit/miss)",
+    "agrinho_answer_cache_saved_seconds_total": "Latência estimada economizada pelas respostas do cache",
+    "agrinho_chat_context_items": "Itens no contexto de conversa da sessão",
+    "agrinho_chat_context_tokens": "Tokens (estimados) de texto no contexto de conversa",
+    "agrinho_context_summaries_total": "Compactações do contexto em resumo",
+    "agrinho_context_resets_total": "Contextos zerados por inatividade (novo visitante)",
+    "agrinho_mcp_circuit_open": "Disjuntor do servidor MCP aberto (1) ou fechado (0)",
+    "agrinho_noise_floor_dbfs": "Piso de ruído estimado no áudio de entrada (perfil adaptativo)",
+    "agrinho_vad_profile_switches_total": "Trocas de perfil de VAD pelo modo adaptativo",
+    "agrinho_vad_profile_active": "Perfil de VAD em uso (1 = ativo)",
+    "agrinho_process_cpu_percent": "CPU do processo de agente (% de um core) no último intervalo",
+    "agrinho_process_rss_mb": "Memória residente do processo de agente",
+    "agrinho_event_loop_lag_ms": "p95 do atraso do event loop do processo de agente",
+    "agrinho_session_audio_cpu_seconds": "CPU gasta no caminho de áudio da sala (kind: vad, nc)",
+    "agrinho_session_audio_bytes": "Bytes de áudio recebidos (in) e enviados (out) pela sala",
+    "agrinho_session_tool_seconds": "Tempo gasto em chamadas de tool pela sala",
+    "agrinho_session_context_bytes": "Texto guardado no contexto de conversa da sala",
+    "agrinho_admission_refused_total": "Pedidos de /start recusados pelo controle de admissão",
+    "agrinho_noise_gate_bypass_total": "Vezes que a supressão de ruído local estourou o orçamento de CPU",
+}
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q: float) -> float | None:
+        """Estimativa por interpolação linear dentro do bucket (como histogram_quantile)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if cumulative + c >= rank and c > 0:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i >= len(self.bounds):
+                    return lower  # bucket +Inf: melhor estimativa é o último limite
+                upper = self.bounds[i]
+                return lower + (upper - lower) * ((rank - cumulative) / c)
+            cumulative += c
+        return self.bounds[-1]
+
+
+def _key(name: str, labels: dict[str, str]) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+class MetricsRegistry:
+    """Contadores, gauges e histogramas rotulados; serializáveis em JSON."""
+
+    def __init__(self) -> None:
+        self.histograms: dict[tuple, Histogram] = {}
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = _key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self.gauges[_key(name, labels)] = value
+
+    def remove_gauges(self, name: str, **labels: str) -> None:
+        """Apaga as séries do gauge cujos rótulos incluem `labels` (ex.: a sala que saiu)."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        for key in [k for k in self.gauges if k[0] == name and wanted <= set(k[1])]:
+            del self.gauges[key]
+
+    # --- serialização (agente → server.py) ---
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "histograms": [
+                {"name": n, "labels": dict(l), "bounds": list(h.bounds), "counts": list(h.counts),
+                 "sum": h.sum, "count": h.count}
+                for (n, l), h in self.histograms.items()
+            ],
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()],
+            "gauges": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self.gauges.items()],
+        }
+
+    def merge_snapshot(self, snap: dict[str, Any], **extra_labels: str) -> None:
+        """Soma histogramas e contadores; gauges recebem `extra_labels` (ex.: pid)."""
+        for h in snap.get("histograms", []):
+            key = _key(h["name"], h["labels"])
+            target = self.histograms.get(key)
+            if target is None:
+                target = self.histograms[key] = Histogram(tuple(h["bounds"]))
+            incoming = Histogram(tuple(h["bounds"]))
+            incoming.counts, incoming.sum, incoming.count = list(h["counts"]), h["sum"], h["count"]
+            target.merge(incoming)
+        for c in snap.get("counters", []):
+            self.inc(c["name"], c["value"], **c["labels"])
+        for g in snap.get("gauges", []):
+            self.set_gauge(g["name"], g["value"], **{**g["labels"], **extra_labels})
+
+    # --- exposição ---
+
+    def summary(self) -> dict[str, dict[str, float | None]]:
+        """p50/p95/p99 por série de histograma (para logs e JSON)."""
+        out = {}
+        for (name, labels), h in sorted(self.histograms.items()):
+            label_str = ",".join(f"{k}={v}" for k, v in labels)
+            out[f"{name}{{{label_str}}}"] = {
+                "count": h.count,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+                "p99": h.quantile(0.99),
+            }
+        return out
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def _header(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def _labels(labels, **extra) -> str:
+            items = list(labels) + list(extra.items())
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+        for (name, labels), h in sorted(self.histograms.items()):
+            _header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(list(h.bounds) + [float("inf")], h.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            if name != "agrinho_turn_latency_seconds" or h.count == 0:
+                continue
+            qname = "agrinho_turn_latency_quantile_seconds"
+            _header(qname, "gauge")
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f"{qname}{_labels(labels, quantile=f'{q:g}')} {h.quantile(q):.6f}")
+        for (name, labels), v in sorted(self.counters.items()):
+            _header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {v:g}")
+        for (name, labels), v in sorted(self.gauges.items()):
+            _header(name, "gauge")
+            lines.append(f"{name}{_labels(labels)} {v:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Registro do processo (agente); o server.py cria o seu para agregar
+registry = MetricsRegistry()
+
+
+def record_tool_call(tool: str, duration: float, status: str = "ok") -> None:
+    """Chamado pelo wrapper de tools MCP a cada chamada (status: ok, error, timeout, cancelled)."""
+    registry.observe("agrinho_tool_call_seconds", duration, tool=tool)
+    registry.inc("agrinho_tool_calls_total", tool=tool, status=status)
+
+
+# Intervalos (perf_counter) de cada chamada de tool, por call_id do modelo.
+# O TurnTracker consome no evento function_tools_executed para medir o turno.
+_tool_spans: dict[str, tuple[float, float]] = {}
+
+
+def record_tool_span(call_id: str, start: float, end: float) -> None:
+    _tool_spans[call_id] = (start, end)
+    if len(_tool_spans) > 1024:  # chamadas cujo evento nunca chegou (sessão fechada)
+        _tool_spans.pop(next(iter(_tool_spans)))
+
+
+class TurnTracker:
+    """
+    Mede cada turno de uma AgentSession a partir dos eventos da própria sessão.
+
+    Etapas registradas em `agrinho_turn_latency_seconds{stage=...}`:
+      - eos_to_endpoint: fim da fala → decisão de responder (agente "thinking")
+      - endpoint_to_first_audio: decisão → primeiro áudio publicado
+      - eos_to_first_audio: a latência percebida pelo visitante
+      - tools: da decisão até o fim das tools do turno
+      - tool_calls: tempo de parede das chamadas de tool do turno (paralelas)
+      - interruption: usuário começa a falar → agente para de falar
+    """
+
+    def __init__(self, session: Any, persona: str, vad_profile: str,
+                 eos_offset: float = 0.0, metrics: MetricsRegistry | None = None):
+        self.session = session
+        self.persona = persona
+        self.vad_profile = vad_profile
+        # O VAD só declara fim de fala depois de `min_silence_duration` de
+        # silêncio; descontamos isso para medir a partir do fim real da fala.
+        self.eos_offset = eos_offset
+        self.metrics = metrics or registry
+        self.agent_state = "initializing"
+        self._eos: float | None = None
+        self._endpoint: float | None = None
+        self._interrupt_start: float | None = None
+        # Número do turno nos logs da sessão (dict de contexto compartilhado; ver log_pipeline.bind)
+        self.turn = 0
+        self._log_ctx = log_context()
+
+        session.on("user_state_changed", self._on_user_state)
+        session.on("agent_state_changed", self._on_agent_state)
+        session.on("function_tools_executed", self._on_tools_executed)
+        session.on("metrics_collected", self._on_metrics)
+
+    def _labels(self, **extra: str) -> dict[str, str]:
+        return {"persona": self.persona, "vad_profile": self.vad_profile, **extra}
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        if seconds >= 0:
+            self.metrics.observe("agrinho_turn_latency_seconds", seconds, **self._labels(stage=stage))
+
+    def _on_user_state(self, ev: Any) -> None:
+        now = getattr(ev, "created_at", None) or time.time()
+        if ev.new_state == "speaking":
+            self._eos = None
+            self._endpoint = None
+            self.turn += 1
+            self._log_ctx["turn"] = self.turn
+            if self.agent_state == "speaking":
+                self._interrupt_start = now
+                self.metrics.inc("agrinho_interruptions_total", **self._labels())
+        elif ev.old_state == "speaking":
+            self._eos = now - self.eos_offset
+
+    def _on_agent_state(self, ev: Any) -> None:
+        now = getattr(ev, "created_at", None) or time.time()
+        self.agent_state = ev.new_state
+        if ev.new_state == "thinking" and self._eos is not None and self._endpoint is None:
+            self._endpoint = now
+            self._observe("eos_to_endpoint", now - self._eos)
+        elif ev.new_state == "speaking":
+            if self._eos is not None:
+                self._observe("eos_to_first_audio", now - self._eos)
+                if self._endpoint is not None:
+                    self._observe("endpoint_to_first_audio", now - self._endpoint)
+                self.metrics.inc("agrinho_turns_total", **self._labels())
+                log.debug("Turno: %.0f ms do fim da fala ao primeiro áudio", (now - self._eos) * 1000)
+            self._eos = None
+            self._endpoint = None
+        elif ev.old_state == "speaking" and self._interrupt_start is not None:
+            self._observe("interruption", now - self._interrupt_start)
+            self._interrupt_start = None
+
+    def _on_tools_executed(self, ev: Any) -> None:
+        now = getattr(ev, "created_at", None) or time.time()
+        if self._endpoint is not None:
+            self._observe("tools", now - self._endpoint)
+        spans = [_tool_spans.pop(c.call_id) for c in getattr(ev, "function_calls", [])
+                 if getattr(c, "call_id", None) in _tool_spans]
+        if spans:
+            wall = max(e for _, e in spans) - min(s for s, _ in spans)
+            self._observe("tool_calls", wall)
+            if len(spans) > 1:
+                log.info("🛠️ %d tools em paralelo: %.0f ms no turno (soma %.0f ms)", len(spans),
+                         wall * 1000, sum(e - s for s, e in spans) * 1000)
+
+    def _on_metrics(self, ev: Any) -> None:
+        m = getattr(ev, "metrics", None)
+        ttft = getattr(m, "ttft", None)
+        if type(m).__name__ == "RealtimeModelMetrics" and ttft is not None and ttft >= 0:
+            self.metrics.observe("agrinho_realtime_ttft_seconds", ttft, **self._labels())
+
+    def log_summary(self) -> None:
+        for series, s in self.metrics.summary().items():
+            if s["count"] and "turn_latency" in series:
+                log.info("📊 %s n=%d p50=%.0fms p95=%.0fms p99=%.0fms", series, s["count"],
+                         s["p50"] * 1000, s["p95"] * 1000, s["p99"] * 1000)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+vad_bench.py - Benchmark offline de VAD/endpointing com áudio gravado
+
+Passa um corpus de WAVs rotulados pelo Silero VAD e simula o endpointing de
+cada perfil do `VADConfig` (quiet/moderate/noisy), sem LiveKit server nem
+OpenAI. Para cada perfil (e SNR, se houver ruído) reporta:
+
+  - latência de fim de turno (fim real da fala → turno encerrado)
+  - falsos fins de turno (turno encerrado com o usuário ainda no meio da fala)
+  - inícios de fala perdidos (turno rotulado sem nenhuma fala detectada)
+  - falsas interrupções (fala detectada fora dos turnos, longa o bastante para interromper)
+
+Corpus: cada `arquivo.wav` tem ao lado um `arquivo.json` com os turnos do
+usuário em segundos (pausas dentro do turno são permitidas):
+
+    {"turns": [[0.8, 3.2], [6.0, 9.4]]}
+
+Uso:
+    python vad_bench.py corpus/ --out resultados.json
+    python vad_bench.py corpus/ --noise multidao.wav --snr 20 10 5 0
+    python vad_bench.py corpus/ --baseline anterior.json --max-regression-ms 50
+
+Com --baseline, sai com código 1 se algum perfil piorar a latência p95 de
+fim de turno além do limite ou aumentar os falsos fins de turno.
+"""
+
+import sys
+import json
+import time
+import wave
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from vad_config import VADConfig, VAD_PROFILES
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+
+
+@dataclass
+class SpeechSegment:
+    """Fala detectada pelo VAD, em segundos de áudio."""
+    start: float        # início real estimado da fala
+    end: float          # fim real estimado da fala
+    declared_end: float  # quando o VAD declarou END_OF_SPEECH (após o silêncio mínimo)
+
+
+# --- Áudio ---
+
+def read_wav(path: Path) -> np.ndarray:
+    """Lê WAV PCM 16-bit como float32 mono em 16 kHz."""
+    with wave.open(str(path), "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: apenas PCM 16-bit é suportado")
+        sr = w.getframerate()
+        channels = w.getnchannels()
+        data = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    audio = data.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+    if sr != SAMPLE_RATE:
+        n_out = int(round(len(audio) * SAMPLE_RATE / sr))
+        audio = np.interp(
+            np.linspace(0, len(audio) - 1, n_out), np.arange(len(audio)), audio
+        ).astype(np.float32)
+    return audio
+
+
+def mix_noise(speech: np.ndarray, noise: np.ndarray, snr_db: float, turns: list[tuple[float, float]]) -> np.ndarray:
+    """Mistura ruído (em loop) na SNR pedida, medida sobre os trechos rotulados como fala."""
+    reps = int(np.ceil(len(speech) / len(noise)))
+    noise = np.tile(noise, reps)[: len(speech)]
+    mask = np.zeros(len(speech), dtype=bool)
+    for start, end in turns:
+        mask[int(start * SAMPLE_RATE): int(end * SAMPLE_RATE)] = True
+    ref = speech[mask] if mask.any() else speech
+    p_speech = float(np.mean(ref ** 2)) + 1e-12
+    p_noise = float(np.mean(noise ** 2)) + 1e-12
+    gain = np.sqrt(p_speech / (p_noise * 10 ** (snr_db / 10)))
+    return np.clip(speech + gain * noise, -1.0, 1.0).astype(np.float32)
+
+
+# --- VAD ---
+
+async def detect_speech(vad, audio: np.ndarray) -> list[SpeechSegment]:
+    """Passa o áudio pelo stream do VAD (como numa sessão) e devolve os segmentos de fala."""
+    from livekit import rtc
+    from livekit.agents.vad import VADEventType
+
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    stream = vad.stream()
+    segments: list[SpeechSegment] = []
+
+    async def _feed() -> None:
+        for i in range(0, len(pcm) - frame_len + 1, frame_len):
+            chunk = pcm[i: i + frame_len]
+            stream.push_frame(rtc.AudioFrame(
+                data=chunk.tobytes(), sample_rate=SAMPLE_RATE,
+                num_channels=1, samples_per_channel=frame_len,
+            ))
+        stream.end_input()
+
+    feeder = asyncio.create_task(_feed())
+    start: float | None = None
+    async for ev in stream:
+        if ev.type == VADEventType.START_OF_SPEECH:
+            # O VAD só dispara depois de `min_speech_duration` de fala
+            start = max(0.0, ev.timestamp - ev.speech_duration)
+        elif ev.type == VADEventType.END_OF_SPEECH and start is not None:
+            segments.append(SpeechSegment(start, ev.timestamp - ev.silence_duration, ev.timestamp))
+            start = None
+    await feeder
+    if start is not None:
+        end = len(audio) / SAMPLE_RATE
+        segments.append(SpeechSegment(start, end, end))
+    return segments
+
+
+# --- Endpointing ---
+
+def simulate_endpointing(segments: list[SpeechSegment], profile: dict) -> list[float]:
+    """
+    Reproduz a decisão de fim de turno do AgentSession com turn_detection="vad".
+
+    Após cada END_OF_SPEECH, o turno termina `min_endpointing_delay` depois,
+    a menos que uma nova fala comece antes disso. (`max_endpointing_delay` só
+    vale com modelo de turn detection, que não usamos.)
+    """
+    delay = profile["min_endpointing_delay"]
+    ends: list[float] = []
+    for i, seg in enumerate(segments):
+        candidate = seg.declared_end + delay
+        nxt = segments[i + 1].start if i + 1 < len(segments) else None
+        if nxt is None or nxt > candidate:
+            ends.append(candidate)
+    return ends
+
+
+def score(segments: list[SpeechSegment], turn_ends: list[float], turns: list[tuple[float, float]],
+          profile: dict) -> dict:
+    """Compara as decisões com os turnos rotulados de um arquivo."""
+    latencies: list[float] = []
+    false_turn_ends = 0
+    missed_turn_ends = 0
+    missed_onsets = 0
+    onset_latencies: list[float] = []
+    for idx, (t_start, t_end) in enumerate(turns):
+        next_start = turns[idx + 1][0] if idx + 1 < len(turns) else float("inf")
+        false_turn_ends += sum(1 for e in turn_ends if t_start < e < t_end)
+        after = [e for e in turn_ends if t_end <= e < next_start]
+        if after:
+            latencies.append(after[0] - t_end)
+        else:
+            missed_turn_ends += 1
+        onsets = [s.start for s in segments if t_start - 0.2 <= s.start <= t_end]
+        if onsets:
+            onset_latencies.append(max(0.0, onsets[0] - t_start))
+        else:
+            missed_onsets += 1
+
+    false_interruptions = 0
+    for seg in segments:
+        if seg.end - seg.start < profile["min_interruption_duration"]:
+            continue
+        if not any(seg.start < t_end and seg.end > t_start for t_start, t_end in turns):
+            false_interruptions += 1
+
+    return {
+        "turns": len(turns),
+        "eot_latencies": latencies,
+        "onset_latencies": onset_latencies,
+        "false_turn_ends": false_turn_ends,
+        "missed_turn_ends": missed_turn_ends,
+        "missed_onsets": missed_onsets,
+        "false_interruptions": false_interruptions,
+    }
+
+
+def aggregate(per_file: list[dict]) -> dict:
+    lat = np.array([v for r in per_file for v in r["eot_latencies"]], dtype=np.float64)
+    onset = np.array([v for r in per_file for v in r["onset_latencies"]], dtype=np.float64)
+
+    def _ms(arr: np.ndarray, q: float) -> float | None:
+        return round(float(np.percentile(arr, q)) * 1000, 1) if arr.size else None
+
+    return {
+        "files": len(per_file),
+        "turns": sum(r["turns"] for r in per_file),
+        "eot_latency_ms": {"p50": _ms(lat, 50), "p95": _ms(lat, 95), "p99": _ms(lat, 99),
+                           "mean": round(float(lat.mean()) * 1000, 1) if lat.size else None},
+        "onset_latency_ms": {"p50": _ms(onset, 50), "p95": _ms(onset, 95)},
+        "false_turn_ends": sum(r["false_turn_ends"] for r in per_file),
+        "missed_turn_ends": sum(r["missed_turn_ends"] for r in per_file),
+        "missed_onsets": sum(r["missed_onsets"] for r in per_file),
+        "false_interruptions": sum(r["false_interruptions"] for r in per_file),
+    }
+
+
+# --- Corpus / execução ---
+
+def load_corpus(path: Path) -> list[tuple[Path, list[tuple[float, float]]]]:
+    items = []
+    for wav in sorted(path.glob("*.wav")):
+        label = wav.with_suffix(".json")
+        if not label.exists():
+            logging.warning("⚠️ %s sem rótulo (%s); ignorado.", wav.name, label.name)
+            continue
+        turns = [(float(a), float(b)) for a, b in json.loads(label.read_text())["turns"]]
+        items.append((wav, sorted(turns)))
+    return items
+
+
+async def run_bench(corpus: list[tuple[Path, list[tuple[float, float]]]], profiles: dict[str, dict],
+                    noise: np.ndarray | None, snrs: list[float], vad=None, preprocess=None) -> dict:
+    """
+    Roda o VAD uma vez por arquivo×SNR e simula todos os perfis sobre o mesmo resultado.
+
+    `preprocess(audio) -> audio`, se dado, é aplicado antes do VAD (ex.: supressão de ruído).
+    """
+    if vad is None:
+        from vad_config import load_vad
+        vad = load_vad()
+        if vad is None:
+            raise RuntimeError("Silero VAD indisponível")
+
+    conditions: list[tuple[str, float | None]] = [("clean", None)]
+    if noise is not None:
+        conditions += [(f"snr_{snr:g}dB", snr) for snr in snrs]
+
+    per_profile: dict[str, dict[str, list[dict]]] = {p: {c: [] for c, _ in conditions} for p in profiles}
+    vad_seconds = 0.0
+    audio_seconds = 0.0
+    for wav, turns in corpus:
+        clean = read_wav(wav)
+        for cond, snr in conditions:
+            audio = clean if snr is None else mix_noise(clean, noise, snr, turns)
+            if preprocess is not None:
+                audio = preprocess(audio)
+            t0 = time.perf_counter()
+            segments = await detect_speech(vad, audio)
+            vad_seconds += time.perf_counter() - t0
+            audio_seconds += len(audio) / SAMPLE_RATE
+            for name, profile in profiles.items():
+                ends = simulate_endpointing(segments, profile)
+                per_profile[name][cond].append(score(segments, ends, turns, profile))
+
+    return {
+        "corpus_files": len(corpus),
+        "audio_seconds": round(audio_seconds, 2),
+        "vad_real_time_factor": round(vad_seconds / audio_seconds, 4) if audio_seconds else None,
+        "profiles": {
+            name: {"params": profiles[name], "conditions": {c: aggregate(r) for c, r in conds.items()}}
+            for name, conds in per_profile.items()
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression_ms: float) -> list[str]:
+    """Regressões em relação ao baseline (lista vazia = ok)."""
+    problems = []
+    for name, prof in results["profiles"].items():
+        base_prof = baseline.get("profiles", {}).get(name)
+        if not base_prof:
+            continue
+        for cond, cur in prof["conditions"].items():
+            base = base_prof["conditions"].get(cond)
+            if not base:
+                continue
+            cur_p95, base_p95 = cur["eot_latency_ms"]["p95"], base["eot_latency_ms"]["p95"]
+            if cur_p95 is not None and base_p95 is not None and cur_p95 - base_p95 > max_regression_ms:
+                problems.append(f"{name}/{cond}: p95 fim de turno {base_p95:.0f} → {cur_p95:.0f} ms")
+            if cur["false_turn_ends"] > base["false_turn_ends"]:
+                problems.append(f"{name}/{cond}: falsos fins de turno {base['false_turn_ends']} → {cur['false_turn_ends']}")
+    return problems
+
+
+def print_table(results: dict) -> None:
+    header = f"{'perfil':<10} {'condição':<12} {'turnos':>6} {'p50 ms':>8} {'p95 ms':>8} {'falso fim':>9} {'onset perd.':>11} {'falsa int.':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, prof in results["profiles"].items():
+        for cond, r in prof["conditions"].items():
+            lat = r["eot_latency_ms"]
+            fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+            print(f"{name:<10} {cond:<12} {r['turns']:>6} {fmt(lat['p50']):>8} {fmt(lat['p95']):>8} "
+                  f"{r['false_turn_ends']:>9} {r['missed_onsets']:>11} {r['false_interruptions']:>10}")
+    print(f"\nVAD: fator de tempo real {results['vad_real_time_factor']} sobre {results['audio_seconds']} s de áudio")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark offline de VAD/endpointing por perfil do VADConfig")
+    parser.add_argument("corpus", type=Path, help="pasta com .wav + .json de rótulos")
+    # choices: nome desconhecido caía calado nos valores do "noisy" com outro rótulo
+    parser.add_argument("--profiles", nargs="+", choices=VAD_PROFILES, default=list(VAD_PROFILES))
+    parser.add_argument("--noise", type=Path, help="WAV de ruído para misturar")
+    parser.add_argument("--snr", nargs="+", type=float, default=[20.0, 10.0, 5.0, 0.0])
+    parser.add_argument("--out", type=Path, help="grava os resultados em JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--max-regression-ms", type=float, default=50.0)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"Nenhum WAV rotulado em {args.corpus}", file=sys.stderr)
+        return 2
+    profiles = {name: VADConfig.get_config(name) for name in args.profiles}
+    noise = read_wav(args.noise) if args.noise else None
+
+    results = asyncio.run(run_bench(corpus, profiles, noise, args.snr))
+    print_table(results)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"Resultados gravados em {args.out}")
+
+    if args.baseline:
+        problems = compare(results, json.loads(args.baseline.read_text()), args.max_regression_ms)
+        for p in problems:
+            print(f"❌ Regressão: {p}", file=sys.stderr)
+        if problems:
+            return 1
+        print("✅ Sem regressão em relação ao baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,19 @@
 # vad_config.py - Configuração de Voice Activity Detection (VAD)
 # Detecta fala do usuário sem ser afetado por barulho de fundo
 
+import os
+import time
 import logging
 
-async def get_vad_for_noisy_environment():
-    """
-    Retorna um VAD otimizado para ambientes ruidosos (eventos, multidões).
+# Instância única do Silero por processo (worker). O modelo ONNX é carregado
+# uma vez e cada AgentSession abre seu próprio stream (`vad.stream()`) sobre ele.
+_shared_vad = None
+_vad_loaded = False
+_vad_load_rss_mb = 0.0
+_vad_sessions = 0
 
-    Prioriza carregar Silero via plugin (`livekit.plugins.silero`).
-    Caso indisponível, tenta fallback e, se não houver VAD, retorna None.
-    """
+
+def _load_vad_instance():
     try:
         from livekit.plugins import silero
     except Exception as import_err:
@@ -35,6 +39,84 @@ async def get_vad_for_noisy_environment():
         return None
 
 
+def load_vad():
+    """
+    Carrega o Silero VAD uma única vez por processo e devolve a instância compartilhada.
+
+    Síncrono de propósito: é chamado pelo `prewarm_fnc` do worker (agent.py)
+    antes de qualquer job. Chamadas seguintes só devolvem a mesma instância.
+    """
+    global _shared_vad, _vad_loaded, _vad_load_rss_mb
+    if _vad_loaded:
+        return _shared_vad
+
+    from session_usage import rss_mb
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    _shared_vad = _load_vad_instance()
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    _vad_load_rss_mb = max(0.0, rss_mb() - rss_before)
+    _vad_loaded = True
+    if _shared_vad is not None:
+        logging.info(
+            "⏱️ VAD carregado em %.0f ms; +%.1f MB residentes (uma cópia por processo)",
+            elapsed_ms, _vad_load_rss_mb,
+        )
+    return _shared_vad
+
+
+def share_vad():
+    """
+    Devolve o VAD compartilhado para uma nova sessão (carregando se preciso).
+
+    A sessão usa a instância como fábrica de streams; o modelo não é
+    duplicado. Loga quanto de memória residente o compartilhamento evita.
+    """
+    global _vad_sessions
+    vad_instance = load_vad()
+    if vad_instance is None:
+        return None
+    _vad_sessions += 1
+    if _vad_sessions > 1:
+        logging.info(
+            "♻️ VAD compartilhado com %d sessões; ~%.1f MB economizados",
+            _vad_sessions, _vad_load_rss_mb * (_vad_sessions - 1),
+        )
+    return vad_instance
+
+
+def vad_silence_duration(vad_instance) -> float:
+    """Silêncio que o VAD espera antes de declarar fim de fala (0.0 se desconhecido)."""
+    opts = getattr(vad_instance, "_opts", None)
+    return float(getattr(opts, "min_silence_duration", 0.0) or 0.0)
+
+
+async def get_vad_for_noisy_environment():
+    """
+    Retorna um VAD otimizado para ambientes ruidosos (eventos, multidões).
+
+    Prioriza carregar Silero via plugin (`livekit.plugins.silero`).
+    Caso indisponível, tenta fallback e, se não houver VAD, retorna None.
+    A instância é carregada uma vez por processo e compartilhada (ver `load_vad`).
+    """
+    return share_vad()
+
+
+VAD_PROFILES = ("quiet", "moderate", "noisy")
+
+
+def vad_mode() -> str:
+    """Modo de VAD configurado em VAD_PROFILE: 'adaptive' (padrão) ou um perfil fixo."""
+    mode = os.getenv("VAD_PROFILE", "adaptive").strip().lower()
+    return mode if mode == "adaptive" or mode in VAD_PROFILES else "noisy"
+
+
+def initial_profile(mode: str) -> str:
+    """Perfil inicial da sessão; o adaptativo começa no "noisy" até medir o ambiente."""
+    return "noisy" if mode == "adaptive" else mode
+
+
 class VADConfig:
     """Configurações de VAD para diferentes ambientes"""
 